@@ -3,9 +3,10 @@ import random
 from pykmn.engine.gen1 import Battle, Player, Choice, ChoiceType
 from pykmn.engine.common import ResultType, Result
 from src.ai.modifiers import mod1, mod2, mod3
-from functools import partial
+from functools import lru_cache, partial
 from json import load
 from src.models.pokemon import Trainer
+from src.utils import instrumentation
 
 with open("data/moves.json") as f:
     moves_data = load(f)
@@ -17,70 +18,151 @@ modifier_map = {
 }  # Ideally pack this data higher up
 
 
+# Priority of every slot before the AI looks at the moves: unusable slots stay far above any usable one
+UNAVAILABLE = [100, 100, 100, 100]
+MOVE_PRIORITY = 10
+
+# Per-player buffers reused every turn instead of allocating a priority list and a slot -> choice map.
+# Each worker process plays one battle at a time, so they are never shared between battles.
+_priorities = ([100] * 4, [100] * 4)
+_move_choices = ([None] * 4, [None] * 4)
+
+# What each modifier reads besides the active moveset: the opponent's status, whether it's turn 2,
+# and the opponent's primary type. AIs using a modifier that isn't listed aren't memoised.
+MODIFIER_READS = {
+    modifier_map[1]: "status",
+    modifier_map[2]: "turn",
+    modifier_map[3]: "type",
+}
+
+# Decision memo: (AI, slot availability, moveset, observed state) -> best move slots.
+# Bounded, dropping the oldest entries first.
+DECISION_CACHE_SIZE = 65536
+_decisions: dict[tuple, tuple[int, ...]] = {}
+
+
+@lru_cache(maxsize=None)
+def trainer_ai(modifiers: tuple[int, ...]) -> tuple[Callable, ...]:
+    """
+    The modifier functions for a trainer's AI, resolved once per distinct set of modifiers.
+    """
+    return tuple(modifier_map[val] for val in modifiers)
+
+
+@lru_cache(maxsize=None)
+def _ai_reads(move_ai: tuple[Callable, ...]) -> frozenset[str] | None:
+    if not all(move_mod in MODIFIER_READS for move_mod in move_ai):
+        return None
+    return frozenset(MODIFIER_READS[move_mod] for move_mod in move_ai)
+
+
+def decision_key(
+    battle: Battle, current_player: Player, move_ai: tuple[Callable, ...], move_priorities: list[int]
+) -> tuple | None:
+    """
+    The observed state that `move_ai`'s modifiers are a pure function of, or `None` if it can't be memoised.
+    Only the observations the AI actually reads are taken from the engine.
+    """
+    if not isinstance(move_ai, tuple) or (reads := _ai_reads(move_ai)) is None:
+        return None
+    opponent = 1 - current_player
+    return (
+        move_ai,
+        tuple(move_priorities),
+        tuple(battle.moves(current_player, "Active")),
+        "status" in reads and battle.status(opponent, 1).healthy(),
+        "turn" in reads and battle.turn() == 2,
+        "type" in reads and battle.active_pokemon_types(opponent)[0],
+    )
+
+
+def best_moves(battle: Battle, current_player: Player, move_ai, move_priorities: list[int]) -> tuple[int, ...]:
+    """
+    Runs the modifiers over `move_priorities` and returns the tied best slots (lowest priority value).
+    """
+    for move_mod in move_ai:
+        move_mod(battle, current_player, move_priorities)
+    best = min(move_priorities)
+    return tuple(idx for idx, move_prio in enumerate(move_priorities) if move_prio == best)
+
+
 def decide_action(
-    battle: Battle, current_player: Player, result, move_ai: tuple[Callable]
+    battle: Battle,
+    current_player: Player,
+    result,
+    move_ai: tuple[Callable],
+    rng: random.Random = random,
 ) -> Choice:
     """
     Does player turn selection through FFI using blah blah
     Check if we have any choices (pass battle)
     Then check if we can only switch out
 
+    Ties between equally good moves are broken with `rng`, which should be the battle's own
+    stream (see `src.sim.seeding`) for reproducible runs. The tie-break draws exactly what
+    `rng.choice` over the tied slots would, so recorded seeds replay the same battles.
     """
-    move_priorities = [100 for _ in range(4)]  # initialise with all very very high prio
-    moves_available = False
     choices = battle.possible_choices(current_player, result)
-    move_choices = {}
 
     if len(choices) == 1:
         return choices[0]
 
+    move_priorities = _priorities[current_player]
+    move_choices = _move_choices[current_player]
+    move_priorities[:] = UNAVAILABLE
+    moves_available = 0
     for choice in choices:
-        match choice.type():
-            case ChoiceType.MOVE:
-                if choice.data() == 0:
-                    return choice
-                move_priorities[choice.data() - 1] = (
-                    10  # If we can use it, set it back to normal prio
-                )
-                move_choices[choice.data() - 1] = choice
-                moves_available = True
-
-            case (
-                ChoiceType.SWITCH
-            ):  # Could be implementation detail for some NPC/extension
-                pass
-            case _:  # No options
-                pass
+        # Switches are never picked voluntarily, so only moves need looking at
+        if choice.type() == ChoiceType.MOVE:
+            slot = choice.data()
+            if slot == 0:
+                return choice
+            move_priorities[slot - 1] = MOVE_PRIORITY
+            move_choices[slot - 1] = choice
+            moves_available += 1
 
+    # Forced switch: no moves to pick from
     if not moves_available:
         return choices[0]
 
-    # Now determine modifiers
-    for move_mod in move_ai:
-        move_mod(battle, current_player, move_priorities)
+    if move_ai:
+        # The modifiers only depend on a little observable state, so their verdict is memoised
+        key = decision_key(battle, current_player, move_ai, move_priorities)
+        best = _decisions.get(key) if key is not None else None
+        if best is None:
+            best = best_moves(battle, current_player, move_ai, move_priorities)
+            if key is not None:
+                instrumentation.increment("ai.decision_cache.misses")
+                if len(_decisions) >= DECISION_CACHE_SIZE:
+                    del _decisions[next(iter(_decisions))]
+                _decisions[key] = best
+        else:
+            instrumentation.increment("ai.decision_cache.hits")
+        # Randomly choose the moves with the highest priority (read min value)
+        return move_choices[best[rng.randrange(len(best))]]
 
-    # Randomly choose the moves with the highest priority (read min value)
-    max_prio = min(move_priorities)
-    return move_choices[
-        random.choice(
-            [
-                idx
-                for idx, move_prio in enumerate(move_priorities)
-                if move_prio == max_prio
-            ]
-        )
-    ]
+    # Without modifiers every usable move ties at the normal priority. Pick one without building a list.
+    pick = rng.randrange(moves_available)
+    for idx, move_prio in enumerate(move_priorities):
+        if move_prio == MOVE_PRIORITY:
+            if pick == 0:
+                return move_choices[idx]
+            pick -= 1
 
 
 def advance_battle(
-    battle: Battle, result: ResultType, trainer1: Trainer, trainer2: Trainer
+    battle: Battle,
+    result: ResultType,
+    trainer1: Trainer,
+    trainer2: Trainer,
+    rng: random.Random = random,
+    telemetry=None,
 ) -> tuple[Result, list[int]]:
 
-    p1_choice = decide_action(
-        battle, Player.P1, result, (modifier_map[val] for val in trainer1.modifiers)
-    )
-    p2_choice = decide_action(
-        battle, Player.P2, result, (modifier_map[val] for val in trainer2.modifiers)
-    )
+    p1_choice = decide_action(battle, Player.P1, result, trainer_ai(trainer1.modifiers), rng)
+    p2_choice = decide_action(battle, Player.P2, result, trainer_ai(trainer2.modifiers), rng)
+    if telemetry is not None:
+        telemetry.record_choice(Player.P1, p1_choice)
+        telemetry.record_choice(Player.P2, p2_choice)
 
     return battle.update(p1_choice, p2_choice)
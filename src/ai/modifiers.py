@@ -164,6 +164,10 @@ BETTER_MOVES = {
     "Fly",
 }
 
+# Modifiers with an entry in `src.ai.choice.modifier_map`. Kept here so checking a roster doesn't need
+# `src.ai.choice`, which loads data/moves.json on import
+IMPLEMENTED_MODIFIERS = frozenset({1, 2, 3})
+
 # Set move_pp = 999
 
 
@@ -0,0 +1,141 @@
+"""
+Per-turn cost of `decide_action`.
+
+Times the current decision path against the original implementation (kept below as
+`reference_decide_action`) on a stub battle, so only the AI's own overhead is measured, not the engine's.
+Each case is one kind of turn:
+
+- single choice: only one legal option (e.g. passing while the opponent switches)
+- forced switch: the active Pokémon fainted, only switches are legal
+- no modifiers: four moves, an AI without modifiers
+- modifiers 1, 2, 3: four moves, the full vanilla AI
+
+The benchmark also checks both paths pick the same moves from the same RNG stream.
+
+    python -m src.bench.decide --turns 100000
+"""
+
+import random
+import time
+import click
+from pykmn.engine.gen1 import ChoiceType
+from src.ai.choice import decide_action, modifier_map, trainer_ai
+
+
+class StubChoice:
+    __slots__ = ("kind", "slot")
+
+    def __init__(self, kind: ChoiceType, slot: int):
+        self.kind = kind
+        self.slot = slot
+
+    def type(self) -> ChoiceType:
+        return self.kind
+
+    def data(self) -> int:
+        return self.slot
+
+
+class StubStatus:
+    def healthy(self) -> bool:
+        return False
+
+
+class StubBattle:
+    """
+    Answers the calls the AI makes with fixed values.
+    """
+
+    def __init__(self, choices: list[StubChoice]):
+        self.choices = choices
+
+    def possible_choices(self, player, result) -> list[StubChoice]:
+        return self.choices
+
+    def moves(self, player, slot) -> tuple[str, ...]:
+        return ("Thunder Wave", "Growl", "Ember", "Water Gun")
+
+    def status(self, player, slot) -> StubStatus:
+        return StubStatus()
+
+    def turn(self) -> int:
+        return 2
+
+    def active_pokemon_types(self, player) -> tuple[str, str]:
+        return ("Grass", "Poison")
+
+
+def reference_decide_action(battle, current_player, result, move_ai, rng=random):
+    """
+    `decide_action` as it was before the fast paths, for comparison.
+    """
+    move_priorities = [100 for _ in range(4)]
+    moves_available = False
+    choices = battle.possible_choices(current_player, result)
+    move_choices = {}
+
+    if len(choices) == 1:
+        return choices[0]
+
+    for choice in choices:
+        match choice.type():
+            case ChoiceType.MOVE:
+                if choice.data() == 0:
+                    return choice
+                move_priorities[choice.data() - 1] = 10
+                move_choices[choice.data() - 1] = choice
+                moves_available = True
+            case ChoiceType.SWITCH:
+                pass
+            case _:
+                pass
+
+    if not moves_available:
+        return choices[0]
+
+    for move_mod in move_ai:
+        move_mod(battle, current_player, move_priorities)
+
+    max_prio = min(move_priorities)
+    return move_choices[
+        rng.choice([idx for idx, move_prio in enumerate(move_priorities) if move_prio == max_prio])
+    ]
+
+
+MOVES = [StubChoice(ChoiceType.MOVE, slot) for slot in range(1, 5)]
+SWITCHES = [StubChoice(ChoiceType.SWITCH, slot) for slot in range(2, 7)]
+
+CASES = {
+    "single choice": (StubBattle([StubChoice(ChoiceType.PASS, 0)]), ()),
+    "forced switch": (StubBattle(SWITCHES), ()),
+    "no modifiers": (StubBattle(SWITCHES + MOVES), ()),
+    "modifiers 1, 2, 3": (StubBattle(SWITCHES + MOVES), (1, 2, 3)),
+}
+
+
+def time_turns(decide, battle: StubBattle, modifiers: tuple[int, ...], turns: int, fast: bool) -> tuple[float, list]:
+    """
+    Seconds per decision over `turns` decisions, and the slots picked.
+    """
+    rng = random.Random(0)
+    picked = []
+    start = time.perf_counter()
+    for _ in range(turns):
+        # Mirrors how `advance_battle` passes the AI in each version
+        move_ai = trainer_ai(modifiers) if fast else (modifier_map[val] for val in modifiers)
+        picked.append(decide(battle, 0, None, move_ai, rng).data())
+    return (time.perf_counter() - start) / turns, picked
+
+
+@click.command()
+@click.option("--turns", default=100_000, type=int)
+def decide_benchmark_cmd(turns: int):
+    for name, (battle, modifiers) in CASES.items():
+        before, reference_picks = time_turns(reference_decide_action, battle, modifiers, turns, fast=False)
+        after, picks = time_turns(decide_action, battle, modifiers, turns, fast=True)
+        assert picks == reference_picks, f"{name}: decisions differ from the reference"
+        print(f"{name:>18}: before {before * 1e9:7.0f} ns, after {after * 1e9:7.0f} ns ({before / after:.2f}x)")
+
+
+if __name__ == "__main__":
+    decide_benchmark_cmd()
@@ -0,0 +1,61 @@
+"""
+Battle throughput per engine backend.
+
+Plays the same seeded battles between random pairs of trainers on a backend (see `src.engine`) and reports
+battles and turns per second, with the AI and telemetry running as in a tournament. `--record` saves the
+battles as traces, which `--engine trace:<path>` replays without the engine: the difference between the two
+is the engine's share of the cost, and a replay also checks the AI still makes the recorded choices.
+
+    python -m src.bench.engine trainer_path --engine pykmn --battles 2000 --record traces.pkl
+    python -m src.bench.engine trainer_path --engine trace:traces.pkl --battles 2000
+    python -m src.bench.engine trainer_path --engine reference --battles 2000
+"""
+
+import random
+import time
+import click
+from src.engine import set_engine
+from src.engine.trace import RecordingEngine
+from src.models.pokemon import deserialize_trainerclasses
+from src.models.results import flatten_trainers
+from src.sim.run_tournament import simulate_battle
+from src.sim.seeding import battle_seed, trainer_keys
+from src.sim.telemetry import BattleTelemetry
+
+
+@click.command()
+@click.argument("trainer_data_path")
+@click.option("--engine", default="pykmn", help="Backend spec, e.g. pykmn, reference or trace:traces.pkl.")
+@click.option("--battles", default=2000, type=int)
+@click.option("--seed", default=0, type=int, help="Seed for the pairs and battles, so runs are comparable.")
+@click.option("--record", "record_path", default=None, help="Save the battles as traces for trace:<path>.")
+def engine_benchmark_cmd(trainer_data_path: str, engine: str, battles: int, seed: int, record_path: str | None):
+    trainers = flatten_trainers(deserialize_trainerclasses(trainer_data_path))
+    recorder = set_engine(RecordingEngine(engine)) if record_path else None
+    if recorder is None:
+        set_engine(engine)
+
+    rng = random.Random(seed)
+    pairs = [(rng.randrange(len(trainers)), rng.randrange(len(trainers))) for _ in range(battles)]
+    keys = trainer_keys(trainers)
+
+    turns = 0
+    start = time.perf_counter()
+    for sample, (t1_idx, t2_idx) in enumerate(pairs):
+        telemetry = BattleTelemetry()
+        battle = battle_seed(seed, keys[t1_idx], keys[t2_idx], sample)
+        simulate_battle(trainers[t1_idx], trainers[t2_idx], False, battle, telemetry)
+        turns += telemetry.turns
+    elapsed = time.perf_counter() - start
+
+    print(
+        f"{engine}: {battles / elapsed:,.0f} battles/s, {turns / elapsed:,.0f} turns/s "
+        f"({elapsed / battles * 1e3:.3f} ms per battle, {turns / battles:.1f} turns per battle)"
+    )
+    if recorder is not None:
+        recorder.save(record_path)
+        print(f"Recorded {len(recorder.traces)} battles to {record_path}")
+
+
+if __name__ == "__main__":
+    engine_benchmark_cmd()
@@ -0,0 +1,53 @@
+"""
+Rating precision against simulation budget, for the binary and margin-aware models.
+
+Subsamples an existing tournament to a fraction of its battles, refits both models, and reports the Spearman
+correlation of each with its own fit on all battles. If the margin model reaches the same correlation at a
+smaller fraction, that fraction is roughly how much of the simulation budget it needs.
+
+    python -m src.bench.margin trainer_path battle_path --fractions 0.1 --fractions 0.25 --repeats 5
+"""
+
+import numpy as np
+import click
+from scipy import stats
+from src.models.pokemon import deserialize_trainerclasses
+from src.models.results import flatten_trainers, load_result_columns
+from src.utils.elo_calculator import generate_lr_elo
+from src.utils.margin_elo import generate_margin_elo
+
+
+@click.command()
+@click.argument("trainer_data_path")
+@click.argument("battle_results_path")
+@click.option("--fractions", type=float, multiple=True, default=(0.1, 0.25, 0.5))
+@click.option("--repeats", default=5, type=int)
+@click.option("--seed", default=0, type=int)
+def margin_benchmark_cmd(
+    trainer_data_path: str, battle_results_path: str, fractions: tuple[float, ...], repeats: int, seed: int
+):
+    trainers = flatten_trainers(deserialize_trainerclasses(trainer_data_path))
+    columns = load_result_columns(battle_results_path, trainers)
+    rng = np.random.default_rng(seed)
+
+    reference = {
+        "binary": generate_lr_elo(columns, trainers)[0],
+        "margin": generate_margin_elo(columns, trainers)[0],
+    }
+    for fraction in fractions:
+        correlations = {"binary": [], "margin": []}
+        for _ in range(repeats):
+            keep = rng.random(len(columns["outcome"])) < fraction
+            subset = {key: column[keep] for key, column in columns.items()}
+            correlations["binary"].append(stats.spearmanr(generate_lr_elo(subset, trainers)[0], reference["binary"])[0])
+            correlations["margin"].append(
+                stats.spearmanr(generate_margin_elo(subset, trainers)[0], reference["margin"])[0]
+            )
+        print(
+            f"{fraction:>5.0%} of battles: binary {np.mean(correlations['binary']):.4f}, "
+            f"margin {np.mean(correlations['margin']):.4f} (Spearman vs full fit, {repeats} repeats)"
+        )
+
+
+if __name__ == "__main__":
+    margin_benchmark_cmd()
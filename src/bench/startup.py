@@ -0,0 +1,54 @@
+"""
+Startup-time benchmark for the CLI.
+
+Times `python -m src.main <command> --help` in fresh interpreters against an interpreter that imports every
+subcommand module (and sklearn) up front, which is what the CLI used to do before commands were loaded lazily.
+
+    python -m src.bench.startup --runs 10
+"""
+
+import statistics
+import subprocess
+import sys
+import time
+import click
+
+EAGER_IMPORTS = (
+    "import sklearn.linear_model, src.sim.run_tournament, src.utils.elo_calculator, "
+    "src.utils.gen_trainer_data, src.utils.analytics"
+)
+
+CASES = {
+    "eager imports": [sys.executable, "-c", EAGER_IMPORTS],
+    "--help": [sys.executable, "-m", "src.main", "--help"],
+    "gen --help": [sys.executable, "-m", "src.main", "gen", "--help"],
+    "elo --help": [sys.executable, "-m", "src.main", "elo", "--help"],
+    "tourney --help": [sys.executable, "-m", "src.main", "tourney", "--help"],
+}
+
+
+def time_command(command: list[str], runs: int) -> list[float]:
+    """
+    Wall time of `runs` fresh interpreter runs of `command`, in seconds.
+    """
+    timings = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        subprocess.run(command, check=True, stdout=subprocess.DEVNULL)
+        timings.append(time.perf_counter() - start)
+    return timings
+
+
+@click.command()
+@click.option("--runs", default=10, type=int)
+def startup_benchmark_cmd(runs: int):
+    for name, command in CASES.items():
+        timings = time_command(command, runs)
+        print(
+            f"{name:>16}: median {statistics.median(timings) * 1000:7.1f} ms, "
+            f"min {min(timings) * 1000:7.1f} ms over {runs} runs"
+        )
+
+
+if __name__ == "__main__":
+    startup_benchmark_cmd()
@@ -0,0 +1,77 @@
+"""
+Battle engine backends.
+
+The AI and the simulator only use a narrow slice of an engine, which every backend provides:
+
+- construct: `engine.new_battle(p1_team, p2_team, seed)` from `src.models.pokemon.Pokemon` teams
+- step: `battle.update(p1_choice, p2_choice) -> (result, trace)`, starting with `engine.pass_choice()` for both
+- `battle.possible_choices(player, result)`, where each choice has `type()` (a `ChoiceType`) and `data()`
+- the active Pokémon: `battle.moves(player, "Active")`, `battle.active_pokemon_types(player)`,
+  `battle.status(player, slot).healthy()` and `battle.turn()`
+- telemetry: `battle.current_hp(player, slot)` and `battle.stats(player, slot)["hp"]`
+- `engine.snapshot(battle)` / `engine.restore(snapshot)`, for seeded battles created with `snapshots=True`
+- `engine.describe(trace, p1_team, p2_team)`: readable log lines for a step's trace
+
+pykmn's `Battle` already is this interface, so the pykmn backend hands out its battles unwrapped and costs
+nothing over calling pykmn directly. Players, choice types and results are pykmn's `Player`, `ChoiceType`
+and `ResultType` in every backend.
+
+Backends, by spec:
+- "pykmn": the gen 1 engine (libpkmn)
+- "reference": a small pure-Python battle with toy mechanics, deterministic per seed, for exercising and
+  benchmarking everything around the engine without its cost
+- "trace:<path>": replays battles recorded with `src.engine.trace.RecordingEngine`, and fails if the AI
+  makes a different choice than it did when recording
+
+The engine is per process, like the pool's other worker state: `set_engine` picks it and `current_engine`
+is what the simulator plays on.
+"""
+
+import importlib
+from src.engine.base import Engine
+
+# Backend name -> (module, class). Modules are only imported when the backend is used.
+ENGINES = {
+    "pykmn": ("src.engine.pykmn_backend", "PykmnEngine"),
+    "reference": ("src.engine.reference", "ReferenceEngine"),
+    "trace": ("src.engine.trace", "TraceEngine"),
+}
+
+_engines: dict[str, Engine] = {}
+_current = "pykmn"
+
+
+def get_engine(spec: str = "pykmn") -> Engine:
+    """
+    The backend for a spec such as "pykmn" or "trace:traces.pkl", created once per process.
+    """
+    if spec not in _engines:
+        name, _, argument = spec.partition(":")
+        if name not in ENGINES:
+            raise ValueError(f"Unknown engine {name!r}, expected one of {', '.join(ENGINES)}")
+        module, attribute = ENGINES[name]
+        backend = getattr(importlib.import_module(module), attribute)
+        engine = backend(argument) if argument else backend()
+        engine.spec = spec
+        _engines[spec] = engine
+    return _engines[spec]
+
+
+def set_engine(engine: str | Engine) -> Engine:
+    """
+    Makes `engine` the one battles in this process are played on. Given an `Engine` instance (such as a
+    `RecordingEngine`) rather than a spec, it is only known to this process, not to pool workers.
+    """
+    global _current
+    if isinstance(engine, Engine):
+        engine.spec = engine.spec or engine.name
+        _engines[engine.spec] = engine
+        _current = engine.spec
+        return engine
+    resolved = get_engine(engine)
+    _current = engine
+    return resolved
+
+
+def current_engine() -> Engine:
+    return get_engine(_current)
@@ -0,0 +1,103 @@
+"""
+Base class for battle engine backends. See `src.engine` for the interface.
+"""
+
+import pickle
+from abc import ABC, abstractmethod
+from pykmn.engine.gen1 import Player
+from src.models.pokemon import Pokemon
+
+
+class LoggedBattle:
+    """
+    Forwards to a backend's battle, logging every step's choices so `Engine.restore` can replay them.
+    """
+
+    def __init__(self, battle, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None):
+        self.battle = battle
+        self.p1_team = p1_team
+        self.p2_team = p2_team
+        self.seed = seed
+        self.steps = []
+
+    def update(self, p1_choice, p2_choice):
+        self.steps.append(((p1_choice.type(), p1_choice.data()), (p2_choice.type(), p2_choice.data())))
+        return self.battle.update(p1_choice, p2_choice)
+
+    def __getattr__(self, name: str):
+        return getattr(self.battle, name)
+
+
+class Engine(ABC):
+    """
+    A battle engine backend.
+
+    Backends implement `create` and `pass_choice`. Snapshots default to replaying the logged choices from the
+    seed, which works for any backend that is deterministic per seed; backends with a cheaper way to copy
+    their state override `snapshot`/`restore`.
+    """
+
+    name = "engine"
+    # Spec the engine was created from, set by `src.engine.get_engine`
+    spec = ""
+
+    def version(self) -> str:
+        """
+        Identifies the backend and its build, so cached results from another engine are never reused.
+        """
+        return self.name
+
+    @abstractmethod
+    def create(self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None):
+        """
+        The backend's own battle at turn 0, seeded with `seed` (unseeded if `None`).
+        """
+
+    @abstractmethod
+    def pass_choice(self):
+        """
+        The choice both players make on the first update.
+        """
+
+    def new_battle(
+        self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None, snapshots: bool = False
+    ):
+        """
+        A new battle at turn 0, seeded with `seed` (unseeded if `None`). `snapshots` logs its steps so it can
+        be snapshotted, which costs a little per step.
+        """
+        battle = self.create(p1_team, p2_team, seed)
+        return LoggedBattle(battle, p1_team, p2_team, seed) if snapshots else battle
+
+    def describe(self, trace, p1_team: list[Pokemon], p2_team: list[Pokemon]) -> list[str]:
+        return [str(message) for message in trace]
+
+    def snapshot(self, battle) -> bytes:
+        if not isinstance(battle, LoggedBattle):
+            raise ValueError("Only battles created with snapshots=True can be snapshotted")
+        if battle.seed is None:
+            raise ValueError("Unseeded battles can't be restored by replaying their choices")
+        return pickle.dumps((battle.p1_team, battle.p2_team, battle.seed, battle.steps))
+
+    def restore(self, snapshot: bytes):
+        """
+        Rebuilds a snapshotted battle by replaying its choices, picking each from `possible_choices`
+        so backends never need to construct choices themselves.
+        """
+        p1_team, p2_team, seed, steps = pickle.loads(snapshot)
+        battle = self.new_battle(p1_team, p2_team, seed, snapshots=True)
+        result = None
+        for p1_step, p2_step in steps:
+            if result is None:
+                choices = (self.pass_choice(), self.pass_choice())
+            else:
+                choices = tuple(
+                    next(
+                        choice
+                        for choice in battle.possible_choices(player, result)
+                        if (choice.type(), choice.data()) == step
+                    )
+                    for player, step in ((Player.P1, p1_step), (Player.P2, p2_step))
+                )
+            result, _ = battle.update(*choices)
+        return battle
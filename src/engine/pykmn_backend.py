@@ -0,0 +1,34 @@
+"""
+The pykmn (libpkmn) gen 1 engine. Its `Battle` already is the `src.engine` interface, so battles are
+handed out as they are.
+"""
+
+from importlib import metadata
+from pykmn.engine.gen1 import Battle, Choice
+from pykmn.engine.common import Slots
+from pykmn.engine.protocol import parse_protocol
+from src.engine.base import Engine
+from src.models.pokemon import Pokemon
+
+
+class PykmnEngine(Engine):
+    name = "pykmn"
+
+    def version(self) -> str:
+        try:
+            pykmn_version = metadata.version("pykmn")
+        except metadata.PackageNotFoundError:
+            pykmn_version = "unknown"
+        return f"pykmn-{pykmn_version}"
+
+    def create(self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None) -> Battle:
+        if seed is None:
+            return Battle(p1_team=p1_team, p2_team=p2_team)
+        return Battle(p1_team=p1_team, p2_team=p2_team, rng_seed=seed)
+
+    def pass_choice(self) -> Choice:
+        return Choice.PASS()
+
+    def describe(self, trace, p1_team: list[Pokemon], p2_team: list[Pokemon]) -> list[str]:
+        slots: Slots = Slots(([p.species for p in p1_team], [p.species for p in p2_team]))
+        return list(parse_protocol(trace, slots))
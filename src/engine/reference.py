@@ -0,0 +1,185 @@
+"""
+A pure-Python reference backend.
+
+These are not gen 1 mechanics. Every turn, switches happen first, then both active Pokémon use their move,
+the higher level one first (player 1 on a tie). A move hits with its accuracy and deals damage from its power
+and the user's level, with a random roll. Every Pokémon has $2L + 10$ HP and is typed Normal. There is no PP
+and no status. A fainted Pokémon must be replaced before the next turn, and a side with none left loses.
+
+Battles are deterministic per seed, cheap and picklable, which is what testing and benchmarking the
+pipeline around the engine (scheduling, caching, telemetry, snapshots) needs. Choices and results use
+pykmn's enums like every backend, so pykmn must still be installed, but no battle is played on it.
+"""
+
+import json
+import pickle
+import random
+from pykmn.engine.gen1 import ChoiceType
+from pykmn.engine.common import ResultType
+from src.engine.base import Engine
+from src.models.pokemon import Pokemon
+
+
+class ReferenceChoice:
+    __slots__ = ("kind", "slot")
+
+    def __init__(self, kind: ChoiceType, slot: int = 0):
+        self.kind = kind
+        self.slot = slot
+
+    def type(self) -> ChoiceType:
+        return self.kind
+
+    def data(self) -> int:
+        return self.slot
+
+
+class ReferenceResult:
+    __slots__ = ("kind",)
+
+    def __init__(self, kind: ResultType):
+        self.kind = kind
+
+    def type(self) -> ResultType:
+        return self.kind
+
+
+class Healthy:
+    def healthy(self) -> bool:
+        return True
+
+
+PASS = ReferenceChoice(ChoiceType.PASS)
+HEALTHY = Healthy()
+TYPES = ("Normal", "Normal")
+
+
+class ReferenceBattle:
+    def __init__(self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None, moves_data: dict):
+        self.rng = random.Random(seed)
+        self.moves_data = moves_data
+        self.teams = (p1_team, p2_team)
+        self.levels = tuple([pokemon.extra.get("level", 1) for pokemon in team] for team in self.teams)
+        self.max_hp = tuple([2 * level + 10 for level in levels] for levels in self.levels)
+        self.hp = tuple(list(max_hp) for max_hp in self.max_hp)
+        self.active = [0, 0]
+        self.must_switch = [False, False]
+        self._turn = 0
+
+    def __getstate__(self) -> dict:
+        # The move table is the engine's, not part of the battle's state
+        state = self.__dict__.copy()
+        del state["moves_data"]
+        return state
+
+    def turn(self) -> int:
+        return self._turn
+
+    def moves(self, player: int, slot: str) -> tuple[str, ...]:
+        return tuple(self.teams[player][self.active[player]].moves)
+
+    def status(self, player: int, slot: int) -> Healthy:
+        return HEALTHY
+
+    def active_pokemon_types(self, player: int) -> tuple[str, str]:
+        return TYPES
+
+    def current_hp(self, player: int, slot: int) -> int:
+        return self.hp[player][slot - 1]
+
+    def stats(self, player: int, slot: int) -> dict[str, int]:
+        return {"hp": self.max_hp[player][slot - 1]}
+
+    def _switches(self, player: int) -> list[ReferenceChoice]:
+        return [
+            ReferenceChoice(ChoiceType.SWITCH, slot + 1)
+            for slot, hp in enumerate(self.hp[player])
+            if hp > 0 and slot != self.active[player]
+        ]
+
+    def possible_choices(self, player: int, result: ReferenceResult | None) -> list[ReferenceChoice]:
+        if self._turn == 0:
+            return [PASS]
+        if self.must_switch[player]:
+            return self._switches(player)
+        if self.must_switch[1 - player]:
+            return [PASS]
+        moves = [ReferenceChoice(ChoiceType.MOVE, slot + 1) for slot in range(len(self.moves(player, "Active")))]
+        return moves + self._switches(player)
+
+    def _use_move(self, player: int, slot: int, trace: list[str]) -> None:
+        user = self.teams[player][self.active[player]]
+        move = user.moves[slot - 1]
+        data = self.moves_data.get(move, {})
+        target = 1 - player
+        if not data.get("power") or self.rng.random() * 100 >= (data.get("accuracy") or 100):
+            trace.append(f"P{player + 1} {user.species} used {move}, no damage")
+            return
+        level = self.levels[player][self.active[player]]
+        damage = int(((2 * level / 5 + 2) * data["power"] / 50 + 2) * self.rng.uniform(0.85, 1.0))
+        defender = self.active[target]
+        self.hp[target][defender] = max(0, self.hp[target][defender] - max(damage, 1))
+        trace.append(f"P{player + 1} {user.species} used {move} for {damage}")
+
+    def update(self, p1_choice: ReferenceChoice, p2_choice: ReferenceChoice) -> tuple[ReferenceResult, list[str]]:
+        self._turn += 1
+        trace = []
+        choices = (p1_choice, p2_choice)
+        for player, choice in enumerate(choices):
+            if choice.type() == ChoiceType.SWITCH:
+                self.active[player] = choice.data() - 1
+                self.must_switch[player] = False
+                trace.append(f"P{player + 1} sent out {self.teams[player][self.active[player]].species}")
+
+        order = (0, 1) if self.levels[0][self.active[0]] >= self.levels[1][self.active[1]] else (1, 0)
+        for player in order:
+            # Pokémon that fainted earlier in the turn don't get to move
+            if choices[player].type() == ChoiceType.MOVE and self.hp[player][self.active[player]] > 0:
+                self._use_move(player, choices[player].data(), trace)
+
+        for player in (0, 1):
+            if self.hp[player][self.active[player]] == 0:
+                self.must_switch[player] = True
+
+        p1_alive, p2_alive = any(self.hp[0]), any(self.hp[1])
+        if p1_alive and p2_alive:
+            return ReferenceResult(ResultType.NONE), trace
+        if p1_alive:
+            return ReferenceResult(ResultType.PLAYER_1_WIN), trace
+        if p2_alive:
+            return ReferenceResult(ResultType.PLAYER_2_WIN), trace
+        return ReferenceResult(ResultType.TIE), trace
+
+
+class ReferenceEngine(Engine):
+    """
+    Snapshots pickle the whole battle, RNG included, rather than replaying it.
+    """
+
+    name = "reference"
+
+    def __init__(self, moves_path: str = "data/moves.json"):
+        with open(moves_path) as f:
+            self.moves_data = json.load(f)
+
+    def version(self) -> str:
+        return "reference-1"
+
+    def create(self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None) -> ReferenceBattle:
+        return ReferenceBattle(p1_team, p2_team, seed, self.moves_data)
+
+    def new_battle(
+        self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None, snapshots: bool = False
+    ) -> ReferenceBattle:
+        return self.create(p1_team, p2_team, seed)
+
+    def pass_choice(self) -> ReferenceChoice:
+        return PASS
+
+    def snapshot(self, battle: ReferenceBattle) -> bytes:
+        return pickle.dumps(battle)
+
+    def restore(self, snapshot: bytes) -> ReferenceBattle:
+        battle = pickle.loads(snapshot)
+        battle.moves_data = self.moves_data
+        return battle
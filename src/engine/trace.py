@@ -0,0 +1,205 @@
+"""
+Recorded-trace backend.
+
+`RecordingEngine` wraps another backend and records, step by step, every answer the battle gave: the possible
+choices, the active moves, types and status, the turn and the HP read by telemetry, along with the choices both
+players made and the result. `TraceEngine` then replays those battles with no engine at all: queries are
+answered from the recording, and a step whose choices differ from the recorded ones raises `TraceMismatch`.
+
+Replaying a tournament recorded with the real engine therefore checks an AI change picks exactly the same moves,
+and times the simulator and AI on their own.
+
+    python -m src.bench.engine trainer_path --engine pykmn --record traces.pkl
+    python -m src.bench.engine trainer_path --engine trace:traces.pkl
+"""
+
+import hashlib
+import pickle
+from pykmn.engine.gen1 import ChoiceType
+from pykmn.engine.common import ResultType
+from src.engine import get_engine
+from src.engine.base import Engine
+from src.engine.reference import ReferenceChoice, ReferenceResult
+from src.models.pokemon import Pokemon
+
+
+class TraceMismatch(Exception):
+    """
+    Raised when a replayed battle diverges from its recording.
+    """
+
+
+def trace_key(p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None) -> str:
+    """
+    Hash of a battle's teams and seed, which is what a recording is looked up by.
+    """
+    teams = tuple(
+        tuple((pokemon.species, pokemon.extra.get("level"), tuple(pokemon.moves)) for pokemon in team)
+        for team in (p1_team, p2_team)
+    )
+    return hashlib.sha256(repr((teams, seed)).encode()).hexdigest()
+
+
+def _step(p1_choice, p2_choice) -> tuple[tuple[int, int], tuple[int, int]]:
+    return (int(p1_choice.type()), p1_choice.data()), (int(p2_choice.type()), p2_choice.data())
+
+
+class Healthy:
+    __slots__ = ("value",)
+
+    def __init__(self, value: bool):
+        self.value = value
+
+    def healthy(self) -> bool:
+        return self.value
+
+
+class RecordingBattle:
+    """
+    Forwards to a battle, recording every query's answer per step.
+    """
+
+    def __init__(self, battle):
+        self.battle = battle
+        # One dictionary of (query, arguments) -> answer per step, and the (choices, result) of each step
+        self.frames = [{}]
+        self.steps = []
+
+    def _record(self, key: tuple, value):
+        self.frames[-1][key] = value
+        return value
+
+    def possible_choices(self, player, result) -> list:
+        choices = self.battle.possible_choices(player, result)
+        self._record(("possible_choices", int(player)), [(int(choice.type()), choice.data()) for choice in choices])
+        return choices
+
+    def moves(self, player, slot) -> tuple[str, ...]:
+        return self._record(("moves", int(player), slot), tuple(self.battle.moves(player, slot)))
+
+    def status(self, player, slot):
+        status = self.battle.status(player, slot)
+        self._record(("status", int(player), slot), status.healthy())
+        return status
+
+    def turn(self) -> int:
+        return self._record(("turn",), self.battle.turn())
+
+    def active_pokemon_types(self, player) -> tuple:
+        return self._record(("types", int(player)), tuple(self.battle.active_pokemon_types(player)))
+
+    def current_hp(self, player, slot) -> int:
+        return self._record(("current_hp", int(player), slot), self.battle.current_hp(player, slot))
+
+    def stats(self, player, slot) -> dict:
+        return self._record(("stats", int(player), slot), dict(self.battle.stats(player, slot)))
+
+    def update(self, p1_choice, p2_choice):
+        result, trace = self.battle.update(p1_choice, p2_choice)
+        self.steps.append((_step(p1_choice, p2_choice), int(result.type())))
+        self.frames.append({})
+        return result, trace
+
+
+class RecordingEngine(Engine):
+    """
+    Records every battle played on `backend` (an `Engine` or a spec) for `TraceEngine`.
+    """
+
+    name = "recording"
+
+    def __init__(self, backend: Engine | str = "pykmn"):
+        self.backend = get_engine(backend) if isinstance(backend, str) else backend
+        self.traces: dict[str, tuple[list, list]] = {}
+
+    def version(self) -> str:
+        return self.backend.version()
+
+    def create(self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None) -> RecordingBattle:
+        battle = RecordingBattle(self.backend.create(p1_team, p2_team, seed))
+        # The lists fill in as the battle is played
+        self.traces[trace_key(p1_team, p2_team, seed)] = (battle.frames, battle.steps)
+        return battle
+
+    def pass_choice(self):
+        return self.backend.pass_choice()
+
+    def describe(self, trace, p1_team: list[Pokemon], p2_team: list[Pokemon]) -> list[str]:
+        return self.backend.describe(trace, p1_team, p2_team)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            pickle.dump(self.traces, f)
+
+
+class TraceBattle:
+    """
+    Replays a recorded battle.
+    """
+
+    def __init__(self, frames: list[dict], steps: list):
+        self.frames = frames
+        self.steps = steps
+        self.step = 0
+
+    def _answer(self, *key):
+        try:
+            return self.frames[self.step][key]
+        except KeyError:
+            raise TraceMismatch(f"Step {self.step}: {key} was not queried when recording") from None
+
+    def possible_choices(self, player, result) -> list[ReferenceChoice]:
+        return [ReferenceChoice(ChoiceType(kind), data) for kind, data in self._answer("possible_choices", int(player))]
+
+    def moves(self, player, slot) -> tuple[str, ...]:
+        return self._answer("moves", int(player), slot)
+
+    def status(self, player, slot) -> Healthy:
+        return Healthy(self._answer("status", int(player), slot))
+
+    def turn(self) -> int:
+        return self._answer("turn")
+
+    def active_pokemon_types(self, player) -> tuple:
+        return self._answer("types", int(player))
+
+    def current_hp(self, player, slot) -> int:
+        return self._answer("current_hp", int(player), slot)
+
+    def stats(self, player, slot) -> dict:
+        return self._answer("stats", int(player), slot)
+
+    def update(self, p1_choice, p2_choice) -> tuple[ReferenceResult, list]:
+        if self.step >= len(self.steps):
+            raise TraceMismatch(f"Step {self.step}: the recorded battle had already ended")
+        recorded, result = self.steps[self.step]
+        if _step(p1_choice, p2_choice) != recorded:
+            raise TraceMismatch(f"Step {self.step}: chose {_step(p1_choice, p2_choice)}, recorded {recorded}")
+        self.step += 1
+        return ReferenceResult(ResultType(result)), []
+
+
+class TraceEngine(Engine):
+    """
+    Replays the battles in a file saved by `RecordingEngine.save`.
+    """
+
+    name = "trace"
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, "rb") as f:
+            self.traces = pickle.load(f)
+
+    def version(self) -> str:
+        return f"trace-{self.path}"
+
+    def create(self, p1_team: list[Pokemon], p2_team: list[Pokemon], seed: int | None = None) -> TraceBattle:
+        try:
+            frames, steps = self.traces[trace_key(p1_team, p2_team, seed)]
+        except KeyError:
+            raise TraceMismatch("No recorded battle for these teams and seed") from None
+        return TraceBattle(frames, steps)
+
+    def pass_choice(self) -> ReferenceChoice:
+        return ReferenceChoice(ChoiceType.PASS)
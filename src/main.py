@@ -1,10 +1,48 @@
-from src.sim.run_tournament import run_tournament, run_tournament_cmd
-from src.utils.elo_calculator import elo_calculator, elo_calculator_cmd
-from src.utils.gen_trainer_data import gen_trainer_data, gen_trainer_data_cmd
+import importlib
 import click
 
+# Subcommands are only imported when they run, so `--help` and light commands such as `gen` don't pay for
+# sklearn, NumPy, pykmn, tqdm or the move data loaded by the AI. Name -> (module, command, summary).
+LAZY_COMMANDS = {
+    "gen": ("src.utils.gen_trainer_data", "gen_trainer_data_cmd", "Generates trainer data from the disassembly."),
+    "tourney": ("src.sim.run_tournament", "run_tournament_cmd", "Simulates a double round robin tournament."),
+    "validate": ("src.sim.validation", "validate_cmd", "Checks every team in a trainer data file."),
+    "merge": ("src.sim.shards", "merge_cmd", "Validates and merges sharded tournament segments."),
+    "replay": ("src.sim.run_tournament", "replay_battle_cmd", "Replays a recorded battle with traces."),
+    "elo": ("src.utils.elo_calculator", "elo_calculator_cmd", "Prints the Elo leaderboard for a tournament."),
+    "gauntlet": ("src.sim.gauntlet", "gauntlet_cmd", "Rates a custom team against an existing field."),
+    "optimize": ("src.sim.optimizer", "optimize_cmd", "Searches movesets and party orders for a trainer."),
+    "analytics": ("src.utils.analytics", "analytics_cmd", "Writes W/D/L, head-to-head and turn tables."),
+    "diff": ("src.utils.rating_diff", "diff_cmd", "Compares saved ratings between runs."),
+}
 
-@click.group()
+
+class LazyGroup(click.Group):
+    """
+    Click group that resolves `LAZY_COMMANDS` on first use.
+    """
+
+    def list_commands(self, ctx: click.Context) -> list[str]:
+        return sorted([*super().list_commands(ctx), *LAZY_COMMANDS])
+
+    def get_command(self, ctx: click.Context, cmd_name: str) -> click.Command | None:
+        if cmd_name in LAZY_COMMANDS:
+            module, command, _ = LAZY_COMMANDS[cmd_name]
+            return getattr(importlib.import_module(module), command)
+        return super().get_command(ctx, cmd_name)
+
+    def format_commands(self, ctx: click.Context, formatter: click.HelpFormatter) -> None:
+        # Use the static summaries rather than importing every command to read its docstring
+        rows = [(name, summary) for name, (_, _, summary) in LAZY_COMMANDS.items()]
+        rows += [
+            (name, command.get_short_help_str())
+            for name, command in self.commands.items()
+        ]
+        with formatter.section("Commands"):
+            formatter.write_dl(sorted(rows))
+
+
+@click.group(cls=LazyGroup)
 def cli():
     pass
 
@@ -13,18 +51,48 @@ def cli():
 @click.argument("trainer_data_path")
 @click.argument("battle_results_path")
 @click.option("--set-level", default=None, type=int)
-def e2e(trainer_data_path: str, battle_results_path: str, set_level: int | None = None):
+@click.option("--seed", default=None, type=int, help="Master seed for the tournament.")
+@click.option("--cache", "cache_path", default=None, help="Battle result cache file (SQLite).")
+@click.option("--workers", default=1, type=int, help="Worker processes for the tournament. 0 for the CPU count.")
+@click.option("--save", "save_path", default=None, help="Write the leaderboard with confidence intervals to this .npz file.")
+def e2e(
+    trainer_data_path: str,
+    battle_results_path: str,
+    set_level: int | None = None,
+    seed: int | None = None,
+    cache_path: str | None = None,
+    workers: int = 1,
+    save_path: str | None = None,
+):
     """
     Does an E2E run of the tournament.
+
+    The steps run as one pipeline: the generated roster goes to the tournament in memory, and results are counted
+    for the Elo fit as chunks complete, so the leaderboard follows the last battle without reloading anything.
+    Both data files are still written.
     """
-    gen_trainer_data(trainer_data_path, set_level)
-    run_tournament(trainer_data_path, battle_results_path)
-    elo_calculator(trainer_data_path, battle_results_path)
+    from src.models.results import flatten_trainers
+    from src.sim.run_tournament import run_tournament
+    from src.utils.elo_calculator import LRCounts, print_fit_summary, print_leaderboard, save_ratings
+    from src.utils.gen_trainer_data import gen_trainer_data
 
+    trainer_classes = gen_trainer_data(trainer_data_path, set_level)
+    trainers = flatten_trainers(trainer_classes)
+    counts = LRCounts(len(trainers))
+    run_tournament(
+        trainer_classes,
+        battle_results_path,
+        seed=seed,
+        workers=workers or None,
+        cache_path=cache_path,
+        on_results=counts.update,
+    )
 
-cli.add_command(gen_trainer_data_cmd,"gen")
-cli.add_command(run_tournament_cmd,"tourney")
-cli.add_command(elo_calculator_cmd,"elo")
+    fit = counts.fit(trainers)
+    print_fit_summary(fit, "lbfgs")
+    if save_path:
+        save_ratings(save_path, trainers, fit)
+    print_leaderboard(trainers, fit.elo_scores())
 
 
 if __name__ == "__main__":
@@ -0,0 +1,264 @@
+"""
+Columnar representation of battle results.
+
+Battles are stored as parallel integer arrays indexed by each trainer's position in the flattened roster,
+rather than one dictionary per battle, which is slow to aggregate and to pass between processes.
+
+On disk, a results store is a stream of pickles: a header naming the roster's trainers, followed by any
+number of column chunks. Chunks can be appended as they're produced and read back one at a time.
+Older results files holding a single pickled list of battle dictionaries are still read.
+"""
+
+import os
+import pickle
+import numpy as np
+from pykmn.engine.common import ResultType
+from src.models.pokemon import Trainer, TrainerClass
+
+# Outcome codes, independent of the engine's `ResultType` values
+OUTCOME_P1_WIN = 0
+OUTCOME_P2_WIN = 1
+OUTCOME_TIE = 2
+OUTCOME_ERROR = 3
+
+OUTCOME_CODES = {
+    ResultType.PLAYER_1_WIN: OUTCOME_P1_WIN,
+    ResultType.PLAYER_2_WIN: OUTCOME_P2_WIN,
+    ResultType.TIE: OUTCOME_TIE,
+    ResultType.ERROR: OUTCOME_ERROR,
+}
+OUTCOME_NAMES = {code: result for result, code in OUTCOME_CODES.items()}
+
+# Possible `Choice.data()` values for moves: 0 for moves without a slot, else the slot
+MOVE_CHOICES = 5
+
+# Column name -> dtype. Turns are -1 when the run didn't record them, seeds 0 for unseeded battles.
+# `capped` marks ties that were battles stopped at the turn cap (see `src.sim.turn_cap`).
+# The rest is per-battle telemetry (see `src.sim.telemetry`), zero when not recorded.
+RESULT_COLUMNS = {
+    "player1": np.int32,
+    "player2": np.int32,
+    "outcome": np.int8,
+    "turns": np.int16,
+    "capped": np.bool_,
+    "seed": np.uint64,
+    "p1_remaining": np.uint8,
+    "p2_remaining": np.uint8,
+    "p1_hp": np.float32,
+    "p2_hp": np.float32,
+    "p1_forced_switches": np.uint16,
+    "p2_forced_switches": np.uint16,
+    "p1_move_uses": (np.uint16, (MOVE_CHOICES,)),
+    "p2_move_uses": (np.uint16, (MOVE_CHOICES,)),
+}
+
+RESULTS_FORMAT = "pokered-results/1"
+
+
+def load_battle_results(filename: str) -> list[dict]:
+    """
+    Loads battle result data from a pickle file.
+    Each battle is a dictionary with:
+    - 'player1': "name-location" of player 1
+    - 'player2': "name-location" of player 2
+    - 'outcome': ResultType
+    """
+    with open(filename, "rb") as f:
+        return pickle.load(f)
+
+
+def flatten_trainers(trainer_classes: list[TrainerClass]) -> list[Trainer]:
+    """
+    Flattens trainer classes into the roster order used for trainer indices.
+    """
+    return [
+        trainer for trainer_class in trainer_classes for trainer in trainer_class.trainers
+    ]
+
+
+def trainer_id(trainer: Trainer) -> str:
+    """
+    Identifier used for a trainer in battle results, "name-location".
+    """
+    return f"{trainer.name}-{trainer.location}"
+
+
+def empty_columns(size: int = 0) -> dict[str, np.ndarray]:
+    """
+    `RESULT_COLUMNS` arrays for `size` battles, with turns marked as unrecorded.
+    """
+    columns = {name: np.zeros(size, dtype=dtype) for name, dtype in RESULT_COLUMNS.items()}
+    columns["turns"][:] = -1
+    return columns
+
+
+def concat_columns(chunks: list[dict[str, np.ndarray]]) -> dict[str, np.ndarray]:
+    """
+    Concatenates column chunks.
+    """
+    if not chunks:
+        return empty_columns()
+    return {name: np.concatenate([chunk[name] for chunk in chunks]) for name in chunks[0]}
+
+
+def results_to_columns(
+    battle_results: list[dict] | dict[str, np.ndarray], trainers: list[Trainer]
+) -> dict[str, np.ndarray]:
+    """
+    Converts battle dictionaries into `RESULT_COLUMNS` arrays.
+    Battles between trainers that aren't in `trainers` are dropped with a warning.
+    Results that are already columnar are returned as they are.
+    """
+    if isinstance(battle_results, dict):
+        return battle_results
+
+    lookup = {trainer_id(trainer): idx for idx, trainer in enumerate(trainers)}
+
+    player1, player2, outcome, turns, seed = [], [], [], [], []
+    missing = 0
+    for battle in battle_results:
+        t1_idx = lookup.get(battle["player1"])
+        t2_idx = lookup.get(battle["player2"])
+        if t1_idx is None or t2_idx is None:
+            missing += 1
+            continue
+        player1.append(t1_idx)
+        player2.append(t2_idx)
+        outcome.append(OUTCOME_CODES.get(battle["outcome"], OUTCOME_ERROR))
+        turns.append(battle.get("turns", -1))
+        seed.append(battle.get("seed") or 0)
+
+    if missing:
+        print(f"Dropped {missing} battles with trainers not found in lookup")
+
+    columns = empty_columns(len(outcome))
+    columns["player1"][:] = player1
+    columns["player2"][:] = player2
+    columns["outcome"][:] = outcome
+    columns["turns"][:] = turns
+    columns["seed"][:] = seed
+    return columns
+
+
+class ResultsWriter:
+    """
+    Appends column chunks to a results store.
+
+    The store is written under a `.partial` name and only moved to `path` once closed without an error,
+    so a results file that exists is always complete.
+
+    trainers: The roster, as `Trainer`s or trainer IDs
+    meta: Extra header fields, e.g. which shard of a schedule the store holds
+    """
+
+    def __init__(self, path: str, trainers: list[Trainer] | list[str], meta: dict | None = None):
+        self.path = path
+        self.file = open(f"{path}.partial", "wb")
+        header = {
+            "format": RESULTS_FORMAT,
+            "trainers": [trainer if isinstance(trainer, str) else trainer_id(trainer) for trainer in trainers],
+        }
+        header.update(meta or {})
+        pickle.dump(header, self.file)
+
+    def write(self, columns: dict[str, np.ndarray]) -> None:
+        pickle.dump(
+            {name: np.asarray(columns[name], dtype=np.dtype(dtype).base) for name, dtype in RESULT_COLUMNS.items()},
+            self.file,
+            protocol=pickle.HIGHEST_PROTOCOL,
+        )
+
+    def close(self, complete: bool = True) -> None:
+        self.file.close()
+        if complete:
+            os.replace(f"{self.path}.partial", self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc):
+        self.close(complete=exc_type is None)
+
+
+def read_results_header(path: str) -> dict:
+    """
+    Header of a results store: the format, trainer IDs and any extra fields it was written with.
+    Legacy results files have no header and return `{}`.
+    """
+    with open(path, "rb") as f:
+        header = pickle.load(f)
+    return {} if isinstance(header, list) else header
+
+
+def iter_result_chunks(path: str, trainers: list[Trainer] | None = None):
+    """
+    Yields column chunks from a results store, with trainer indices remapped onto `trainers`.
+    Battles between trainers missing from `trainers` are dropped with a warning.
+
+    Without `trainers`, chunks are yielded as stored, indexed into the header's trainer IDs.
+    """
+    with open(path, "rb") as f:
+        header = pickle.load(f)
+        if isinstance(header, list):
+            # Legacy file: a single list of battle dictionaries
+            if trainers is None:
+                raise ValueError(f"{path} is a legacy results file; trainers are needed to read it")
+            yield results_to_columns(header, trainers)
+            return
+
+        remap = None
+        if trainers is not None:
+            lookup = {trainer_id(trainer): idx for idx, trainer in enumerate(trainers)}
+            remap = np.array([lookup.get(stored, -1) for stored in header["trainers"]] + [-1], dtype=np.int32)
+        while True:
+            try:
+                chunk = pickle.load(f)
+            except EOFError:
+                return
+            # Stores written before a column existed get its defaults
+            if chunk.keys() != RESULT_COLUMNS.keys():
+                chunk = {**empty_columns(len(chunk["outcome"])), **chunk}
+            if remap is None:
+                yield chunk
+                continue
+            player1 = remap[chunk["player1"]]
+            player2 = remap[chunk["player2"]]
+            known = (player1 >= 0) & (player2 >= 0)
+            if not known.all():
+                print(f"Dropped {np.sum(~known)} battles with trainers not found in lookup")
+            chunk["player1"], chunk["player2"] = player1, player2
+            yield {name: column[known] for name, column in chunk.items()}
+
+
+def iter_result_batches(
+    path: str,
+    trainers: list[Trainer] | None = None,
+    batch_size: int = 1 << 20,
+    columns: tuple[str, ...] | None = None,
+):
+    """
+    Re-chunks `iter_result_chunks` into batches of exactly `batch_size` battles (the last may be shorter),
+    however the store was written. Only `columns` are kept if given, so a pass that needs a few columns
+    holds at most one batch of those in memory.
+    """
+    pending = []
+    buffered = 0
+    for chunk in iter_result_chunks(path, trainers):
+        if columns is not None:
+            chunk = {name: chunk[name] for name in columns}
+        pending.append(chunk)
+        buffered += len(next(iter(chunk.values())))
+        while buffered >= batch_size:
+            merged = concat_columns(pending)
+            yield {name: column[:batch_size] for name, column in merged.items()}
+            pending = [{name: column[batch_size:] for name, column in merged.items()}]
+            buffered -= batch_size
+    if buffered:
+        yield concat_columns(pending)
+
+
+def load_result_columns(path: str, trainers: list[Trainer]) -> dict[str, np.ndarray]:
+    """
+    Loads a whole results store (or legacy results file) as columns indexed into `trainers`.
+    """
+    return concat_columns(list(iter_result_chunks(path, trainers)))
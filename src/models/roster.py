@@ -0,0 +1,142 @@
+"""
+Packed, shared-memory roster for worker processes.
+
+`Trainer`/`Pokemon` dataclasses carry a `__dict__`, an `extra` dict and string names per instance, and every
+worker that simulates battles would otherwise need its own copy. `PackedRoster` flattens the roster into one
+fixed-width record per trainer, stored in a single `multiprocessing.shared_memory` block. The parent creates
+it, workers attach read-only by name, and teams are materialized from the arrays only when a battle needs them.
+
+Species and moves are stored as indices into pykmn's `SPECIES` and `MOVES` tables, with -1 for empty slots.
+Names aren't stored, but each record keeps the trainer's `trainer_key`, which battles are seeded from.
+"""
+
+from multiprocessing import shared_memory
+import numpy as np
+from pykmn.data.gen1 import MOVES, SPECIES
+from src.models.pokemon import Pokemon, Trainer
+from src.sim.seeding import trainer_key
+
+PARTY_SIZE = 6
+MOVE_SLOTS = 4
+
+SPECIES_NAMES = list(SPECIES)
+MOVE_NAMES = list(MOVES)
+SPECIES_IDS = {name: idx for idx, name in enumerate(SPECIES_NAMES)}
+MOVE_IDS = {name: idx for idx, name in enumerate(MOVE_NAMES)}
+
+ROSTER_DTYPE = np.dtype(
+    [
+        ("party_size", np.uint8),
+        # Bit k - 1 is set for AI modifier k
+        ("modifiers", np.uint8),
+        ("species", np.int16, (PARTY_SIZE,)),
+        ("level", np.uint8, (PARTY_SIZE,)),
+        ("moves", np.int16, (PARTY_SIZE, MOVE_SLOTS)),
+        # `src.sim.seeding.trainer_key`, so workers seed battles without the trainers' names
+        ("seed_key", np.uint64),
+    ]
+)
+
+
+def pack_trainer(trainer: Trainer, records: np.ndarray, idx: int) -> None:
+    """
+    Writes a trainer into record `idx` of a `ROSTER_DTYPE` array.
+    """
+    records["party_size"][idx] = len(trainer.pokemon)
+    records["modifiers"][idx] = sum(1 << (modifier - 1) for modifier in getattr(trainer, "modifiers", ()))
+    records["species"][idx] = -1
+    records["level"][idx] = 0
+    records["moves"][idx] = -1
+    records["seed_key"][idx] = trainer_key(trainer)
+    for slot, pokemon in enumerate(trainer.pokemon):
+        records["species"][idx, slot] = SPECIES_IDS[pokemon.species]
+        records["level"][idx, slot] = pokemon.extra["level"]
+        for move_slot, move in enumerate(pokemon.moves):
+            records["moves"][idx, slot, move_slot] = MOVE_IDS[move]
+
+
+class PackedRoster:
+    """
+    Roster records in shared memory.
+
+    Create one in the parent with `PackedRoster.create(trainers)`, hand `descriptor` to workers,
+    and have them call `PackedRoster.attach(*descriptor)`.
+    """
+
+    def __init__(self, memory: shared_memory.SharedMemory, count: int, owner: bool):
+        self.memory = memory
+        self.owner = owner
+        self.records = np.ndarray((count,), dtype=ROSTER_DTYPE, buffer=memory.buf)
+        if not owner:
+            self.records.flags.writeable = False
+
+    @classmethod
+    def create(cls, trainers: list[Trainer], records: np.ndarray | None = None) -> "PackedRoster":
+        """
+        Packs `trainers` into a new block, or copies in `records` already packed by `src.sim.validation`.
+        """
+        memory = shared_memory.SharedMemory(
+            create=True, size=max(len(trainers), 1) * ROSTER_DTYPE.itemsize
+        )
+        roster = cls(memory, len(trainers), owner=True)
+        if records is not None:
+            roster.records[:] = records
+        else:
+            for idx, trainer in enumerate(trainers):
+                pack_trainer(trainer, roster.records, idx)
+        return roster
+
+    @classmethod
+    def attach(cls, name: str, count: int) -> "PackedRoster":
+        return cls(shared_memory.SharedMemory(name=name), count, owner=False)
+
+    @property
+    def descriptor(self) -> tuple[str, int]:
+        """
+        What a worker needs to attach: the block name and the number of trainers.
+        """
+        return self.memory.name, len(self.records)
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def modifiers(self, idx: int) -> tuple[int, ...]:
+        mask = int(self.records["modifiers"][idx])
+        return tuple(bit + 1 for bit in range(8) if mask & (1 << bit))
+
+    def team(self, idx: int) -> list[Pokemon]:
+        """
+        Materializes trainer `idx`'s party as the engine's team input.
+        """
+        record = self.records[idx]
+        return [
+            Pokemon(
+                extra={"level": int(record["level"][slot])},
+                species=SPECIES_NAMES[record["species"][slot]],
+                moves=tuple(MOVE_NAMES[move] for move in record["moves"][slot] if move >= 0),
+            )
+            for slot in range(record["party_size"])
+        ]
+
+    def trainer(self, idx: int) -> Trainer:
+        """
+        Materializes a lightweight `Trainer` for `run_battle`. Names aren't stored, so it's labelled by index.
+        """
+        trainer = Trainer(name=f"Trainer #{idx}", location="Roster", pokemon=self.team(idx))
+        trainer.modifiers = self.modifiers(idx)
+        return trainer
+
+    def close(self) -> None:
+        """
+        Detaches from the block; the owner also frees it.
+        """
+        self.records = None
+        self.memory.close()
+        if self.owner:
+            self.memory.unlink()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
@@ -0,0 +1,277 @@
+"""
+Chunked battle pool for tournaments.
+
+A tournament is millions of short battles, so what crosses the process boundary has to stay small next to
+the battles themselves. Work goes out as `int32` arrays of (player 1, player 2, sample) units, from which
+workers derive each battle's seed, and comes back as packed NumPy arrays per chunk rather than one Python
+object per battle. Trainers never cross the boundary at all: workers attach to the `PackedRoster` in shared
+memory once, in the pool initializer.
+
+Chunk sizes are tuned while the tournament runs (see `ChunkSizer`): workers report how long their chunk took,
+and chunks are sized so each one takes about `target_seconds`, which keeps scheduling and pickling overhead to
+a few percent of worker time without leaving workers idle at the end of the schedule.
+"""
+
+import os
+import queue
+import time
+import multiprocessing
+import multiprocessing.pool
+from multiprocessing import util
+from typing import Callable
+import numpy as np
+from tqdm import tqdm
+from pykmn.engine.common import ResultType
+from src.models.pokemon import Trainer
+from src.models.roster import PackedRoster
+from src.engine import current_engine, set_engine
+from src.models.results import OUTCOME_CODES, OUTCOME_ERROR, empty_columns
+from src.sim.cache import BattleCache
+from src.sim.run_tournament import run_battle
+from src.sim.seeding import battle_seed, trainer_keys
+from src.sim.telemetry import BattleTelemetry
+from src.sim.turn_cap import TURN_CAP
+from src.utils import instrumentation
+
+# Per-process state for pool workers, set once by `init_worker` instead of pickled with every task
+worker_state = {}
+
+
+def init_worker(
+    roster: tuple[str, int],
+    master_seed: int,
+    cache_path: str | None,
+    engine: str = "pykmn",
+    turn_cap: int = TURN_CAP,
+    cache_size: int = 1_000_000,
+):
+    set_engine(engine)
+    # The roster lives in shared memory; each worker only attaches to it
+    field = PackedRoster.attach(*roster)
+    util.Finalize(field, field.close, exitpriority=5)
+    worker_state["field"] = field
+    worker_state["master_seed"] = master_seed
+    worker_state["turn_cap"] = turn_cap
+    worker_state["cache"] = None
+    if cache_path:
+        cache = BattleCache(cache_path, cache_size)
+        # Flush pending writes when the worker shuts down
+        util.Finalize(cache, cache.close, exitpriority=10)
+        worker_state["cache"] = cache
+
+
+def battle_pool(
+    roster: PackedRoster,
+    master_seed: int,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int = TURN_CAP,
+    cache_size: int = 1_000_000,
+) -> multiprocessing.pool.Pool:
+    """
+    Worker pool attached to `roster`, playing on this process's engine with `turn_cap`.
+    Only the shared memory name crosses the pool boundary, not the trainers.
+    """
+    return multiprocessing.Pool(
+        workers or os.cpu_count(),
+        initializer=init_worker,
+        initargs=(roster.descriptor, master_seed, cache_path, current_engine().spec, turn_cap, cache_size),
+    )
+
+
+def play_units(
+    trainer_at: Callable[[int], Trainer],
+    keys: np.ndarray,
+    units: np.ndarray,
+    master_seed: int,
+    cache: BattleCache | None = None,
+    turn_cap: int = TURN_CAP,
+) -> tuple[dict[str, np.ndarray], float]:
+    """
+    Plays an `(n, 3)` array of (player 1, player 2, sample) units. `keys` are the trainers' seeding keys
+    (see `src.sim.seeding.trainer_key`), indexed like `trainer_at`.
+
+    Returns results columns (see `src.models.results`), with telemetry, and the seconds spent playing.
+    Battles stopped at the turn cap are counted, with the time they took, in the "battles.capped" and
+    "battles.capped_ns" instrumentation counters.
+    """
+    start = time.perf_counter()
+    columns = empty_columns(len(units))
+    columns["player1"][:] = units[:, 0]
+    columns["player2"][:] = units[:, 1]
+
+    # Schedules are sorted by player 1, so most units in a chunk share trainers
+    trainers = {}
+    for k, (t1_idx, t2_idx, sample) in enumerate(units.tolist()):
+        for idx in (t1_idx, t2_idx):
+            if idx not in trainers:
+                trainers[idx] = trainer_at(idx)
+        trainer1, trainer2 = trainers[t1_idx], trainers[t2_idx]
+
+        seed = battle_seed(master_seed, keys[t1_idx], keys[t2_idx], sample)
+        telemetry = BattleTelemetry()
+        battle_start = time.perf_counter_ns()
+        try:
+            result, _ = run_battle(trainer1, trainer2, False, seed, cache, telemetry, turn_cap)
+        except Exception as e:
+            print(f"Error during battle between {trainer1.name} and {trainer2.name}: {e}")
+            result = ResultType.ERROR
+        if telemetry.capped:
+            instrumentation.increment("battles.capped")
+            instrumentation.increment("battles.capped_ns", time.perf_counter_ns() - battle_start)
+        columns["outcome"][k] = OUTCOME_CODES.get(result, OUTCOME_ERROR)
+        columns["seed"][k] = seed
+        telemetry.store(columns, k)
+
+    return columns, time.perf_counter() - start
+
+
+def _play_units(task: tuple[int, np.ndarray]) -> tuple[int, dict[str, np.ndarray], float, dict[str, int]]:
+    start, units = task
+    field: PackedRoster = worker_state["field"]
+    columns, seconds = play_units(
+        field.trainer,
+        field.records["seed_key"],
+        units,
+        worker_state["master_seed"],
+        worker_state["cache"],
+        worker_state["turn_cap"],
+    )
+    # Counters travel back with the chunk, since the parent can't see the worker's
+    return start, columns, seconds, instrumentation.drain()
+
+
+class ChunkSizer:
+    """
+    Picks chunk sizes from the measured per-battle latency.
+
+    target_seconds: Worker time each chunk should take
+    tail_chunks: Chunks per worker to keep for the end of the schedule, so workers finish together
+    smoothing: Weight of the newest latency measurement in the moving average
+    """
+
+    def __init__(
+        self,
+        workers: int,
+        initial: int = 8,
+        target_seconds: float = 0.5,
+        tail_chunks: int = 4,
+        smoothing: float = 0.2,
+    ):
+        self.workers = workers
+        self.initial = initial
+        self.target_seconds = target_seconds
+        self.tail_chunks = tail_chunks
+        self.smoothing = smoothing
+        self.latency = None
+
+    def observe(self, battles: int, seconds: float) -> None:
+        if battles == 0:
+            return
+        latency = seconds / battles
+        if self.latency is None:
+            self.latency = latency
+        else:
+            self.latency += self.smoothing * (latency - self.latency)
+
+    def next_size(self, remaining: int) -> int:
+        if self.latency is None:
+            size = self.initial
+        else:
+            size = int(self.target_seconds / max(self.latency, 1e-6))
+        size = min(size, remaining // (self.tail_chunks * self.workers))
+        return max(1, min(size, remaining))
+
+
+def play_schedule(
+    units: np.ndarray,
+    master_seed: int,
+    trainers: list[Trainer],
+    on_chunk: Callable[[np.ndarray, dict[str, np.ndarray]], None],
+    workers: int | None = None,
+    cache_path: str | None = None,
+    cache_size: int = 1_000_000,
+    progress: tqdm | None = None,
+    records: np.ndarray | None = None,
+    turn_cap: int = TURN_CAP,
+) -> dict[str, float]:
+    """
+    Plays every (player 1, player 2, sample) row of `units`, in parallel unless `workers` is 1.
+
+    `on_chunk(units, columns)` is called in this process as chunks complete, in completion order.
+    `records` are the trainers' packed records if they were already built by `src.sim.validation`.
+    Battles still running after `turn_cap` choices are stopped as capped ties (see `src.sim.turn_cap`).
+    Returns timing statistics, including the fraction of worker time spent playing battles, and the
+    instrumentation counters of every process that played.
+    """
+    workers = workers or os.cpu_count()
+    sizer = ChunkSizer(workers)
+    start = time.perf_counter()
+    busy = 0.0
+    chunks = 0
+    counters_before = instrumentation.drain()
+
+    def completed(chunk: np.ndarray, columns: dict[str, np.ndarray], seconds: float) -> None:
+        nonlocal busy, chunks
+        busy += seconds
+        chunks += 1
+        sizer.observe(len(chunk), seconds)
+        on_chunk(chunk, columns)
+        if progress is not None:
+            progress.update(len(chunk))
+
+    if workers == 1:
+        cache = BattleCache(cache_path, cache_size) if cache_path else None
+        keys = trainer_keys(trainers)
+        offset = 0
+        while offset < len(units):
+            chunk = units[offset : offset + sizer.next_size(len(units) - offset)]
+            completed(chunk, *play_units(trainers.__getitem__, keys, chunk, master_seed, cache, turn_cap))
+            offset += len(chunk)
+        if cache is not None:
+            print(f"Cache hits: {cache.hits}, misses: {cache.misses}")
+            cache.close()
+    else:
+        # Callbacks run on the pool's result thread; results are handled here
+        done = queue.Queue()
+        with PackedRoster.create(trainers, records) as roster:
+            with battle_pool(roster, master_seed, workers, cache_path, turn_cap, cache_size) as pool:
+                offset = in_flight = 0
+                while offset < len(units) or in_flight:
+                    # Keep two chunks queued per worker so none waits on the parent
+                    while offset < len(units) and in_flight < 2 * workers:
+                        size = sizer.next_size(len(units) - offset)
+                        pool.apply_async(
+                            _play_units,
+                            ((offset, units[offset : offset + size]),),
+                            callback=done.put,
+                            error_callback=done.put,
+                        )
+                        offset += size
+                        in_flight += 1
+
+                    result = done.get()
+                    in_flight -= 1
+                    if isinstance(result, BaseException):
+                        raise result
+                    chunk_start, columns, seconds, counts = result
+                    instrumentation.merge(counts)
+                    completed(units[chunk_start : chunk_start + len(columns["outcome"])], columns, seconds)
+
+                # Let workers exit cleanly so their caches are flushed
+                pool.close()
+                pool.join()
+
+    wall = time.perf_counter() - start
+    counters = instrumentation.drain()
+    instrumentation.merge(counters_before)
+    instrumentation.merge(counters)
+    return {
+        "battles": len(units),
+        "chunks": chunks,
+        "wall_seconds": wall,
+        "worker_seconds": busy,
+        "utilisation": busy / max(wall * workers, 1e-9),
+        "battle_latency": sizer.latency or 0.0,
+        "counters": counters,
+    }
@@ -0,0 +1,197 @@
+"""
+Content-addressed cache of battle results.
+
+A seeded battle is a pure function of both teams, both AIs, the seed and the engine, so its result can be
+stored under a hash of exactly those inputs. Battle seeds come from the players' trainer IDs rather than their
+roster positions (see `src.sim.seeding`), so re-runs and overlapping sweeps with the same master seed only pay
+for lookups on the pairings they share.
+
+The cache is a single SQLite file, safe to share between runs and worker processes, with least-recently-used
+eviction once it holds more than `max_entries` results. Writes are buffered in memory and flushed in one short
+transaction, so workers don't hold the database's write lock between flushes.
+"""
+
+import hashlib
+import sqlite3
+import time
+from pykmn.engine.common import ResultType
+from src.engine import current_engine
+from src.models.pokemon import Trainer
+from src.sim.telemetry import BattleTelemetry
+from src.sim.turn_cap import TURN_CAP
+
+# Bump whenever the AI or the battle loop changes in a way that changes results
+CACHE_VERSION = 2
+
+# Writes are flushed in batches rather than per battle
+COMMIT_EVERY = 1000
+
+
+def engine_version() -> str:
+    """
+    Identifies the simulator so results from a different engine or engine build are never reused.
+    """
+    return f"{current_engine().version()}/v{CACHE_VERSION}"
+
+
+def team_signature(trainer: Trainer) -> tuple:
+    """
+    Everything about a trainer that affects a battle: the party (in order) and the AI modifiers.
+    """
+    return (
+        tuple(
+            (pokemon.species, pokemon.extra.get("level"), tuple(pokemon.moves))
+            for pokemon in trainer.pokemon
+        ),
+        tuple(getattr(trainer, "modifiers", ())),
+    )
+
+
+def battle_key(trainer1: Trainer, trainer2: Trainer, seed: int, version: str) -> str:
+    """
+    Content hash of a battle's inputs.
+    """
+    payload = repr((team_signature(trainer1), team_signature(trainer2), seed, version))
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def capped_result_valid(turns: int, capped: bool, turn_cap: int) -> bool:
+    """
+    Whether a stored battle of `turns` turns, stopped at the cap or not, is what playing it with `turn_cap` gives.
+    """
+    return turns == turn_cap if capped else turns <= turn_cap
+
+
+class BattleCache:
+    """
+    On-disk LRU cache mapping battle keys to `(ResultType, choice count)`, whether the battle was stopped at
+    the turn cap and, when recorded, telemetry.
+
+    The turn cap isn't part of the key: a battle that ended on its own is valid under any cap it fits in, and a
+    capped one under the cap it was stopped at. Anything else is a miss, and is replaced when it's replayed.
+    """
+
+    def __init__(self, path: str, max_entries: int = 1_000_000):
+        self.path = path
+        self.max_entries = max_entries
+        self.version = engine_version()
+        self.hits = 0
+        self.misses = 0
+        # Buffered writes: key -> row for new results, key -> timestamp for hits
+        self.pending_rows = {}
+        self.pending_touches = {}
+
+        self.connection = sqlite3.connect(path, timeout=60)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS battles "
+            "(key TEXT PRIMARY KEY, outcome INTEGER, choices INTEGER, last_used INTEGER, telemetry BLOB, "
+            "capped INTEGER)"
+        )
+        columns = {row[1] for row in self.connection.execute("PRAGMA table_info(battles)")}
+        if "telemetry" not in columns:
+            # Caches from before telemetry was recorded
+            self.connection.execute("ALTER TABLE battles ADD COLUMN telemetry BLOB")
+        if "capped" not in columns:
+            # Caches from before the turn cap was configurable
+            self.connection.execute("ALTER TABLE battles ADD COLUMN capped INTEGER")
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS battles_last_used ON battles (last_used)"
+        )
+        self.connection.commit()
+        (self.size,) = self.connection.execute("SELECT COUNT(*) FROM battles").fetchone()
+
+    def key(self, trainer1: Trainer, trainer2: Trainer, seed: int) -> str:
+        return battle_key(trainer1, trainer2, seed, self.version)
+
+    def get(
+        self, key: str, telemetry: BattleTelemetry | None = None, turn_cap: int = TURN_CAP
+    ) -> tuple[ResultType, int] | None:
+        """
+        Looks up a battle played with `turn_cap`. With `telemetry`, entries stored without telemetry count as
+        misses, and the stored telemetry is copied into it on a hit.
+        """
+        row = self.pending_rows.get(key)
+        if row is None:
+            row = self.connection.execute(
+                "SELECT key, outcome, choices, last_used, telemetry, capped FROM battles WHERE key = ?", (key,)
+            ).fetchone()
+        if (
+            row is None
+            or (telemetry is not None and row[4] is None)
+            or not capped_result_valid(row[2] - 1, bool(row[5]), turn_cap)
+        ):
+            self.misses += 1
+            return None
+        if telemetry is not None:
+            stored = BattleTelemetry.unpack(row[4])
+            for name in BattleTelemetry.__slots__:
+                setattr(telemetry, name, getattr(stored, name))
+
+        self.hits += 1
+        self.pending_touches[key] = time.time_ns()
+        self._written()
+        return ResultType(row[1]), row[2]
+
+    def put(
+        self, key: str, result: ResultType, choices: int, telemetry: BattleTelemetry | None = None
+    ) -> None:
+        """
+        Stores a battle. Without `telemetry`, it is stored as not capped.
+        """
+        self.pending_rows[key] = (
+            key,
+            int(result),
+            choices,
+            time.time_ns(),
+            telemetry.pack() if telemetry is not None else None,
+            int(telemetry is not None and telemetry.capped),
+        )
+        self._written()
+
+    def _written(self) -> None:
+        if len(self.pending_rows) + len(self.pending_touches) >= COMMIT_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        """
+        Writes buffered results and recency updates in a single transaction.
+        """
+        with self.connection:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO battles VALUES (?, ?, ?, ?, ?, ?)", self.pending_rows.values()
+            )
+            self.connection.executemany(
+                "UPDATE battles SET last_used = ? WHERE key = ?",
+                [(last_used, key) for key, last_used in self.pending_touches.items()],
+            )
+        # Other processes sharing the file add rows too, so the size is recounted rather than tracked
+        (self.size,) = self.connection.execute("SELECT COUNT(*) FROM battles").fetchone()
+        self.pending_rows = {}
+        self.pending_touches = {}
+        if self.size > self.max_entries:
+            self.evict()
+
+    def evict(self) -> None:
+        """
+        Drops the least recently used tenth of the cache, so eviction isn't paid on every insert.
+        """
+        keep = self.max_entries - self.max_entries // 10
+        self.connection.execute(
+            "DELETE FROM battles WHERE key IN "
+            "(SELECT key FROM battles ORDER BY last_used ASC LIMIT "
+            "MAX((SELECT COUNT(*) FROM battles) - ?, 0))",
+            (keep,),
+        )
+        self.connection.commit()
+        (self.size,) = self.connection.execute("SELECT COUNT(*) FROM battles").fetchone()
+
+    def close(self) -> None:
+        self.flush()
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
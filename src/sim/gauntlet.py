@@ -0,0 +1,349 @@
+"""
+Gauntlet mode: rate a single custom team against an existing field.
+
+Instead of adding a team to the roster and re-running the whole round robin, the challenger plays every
+trainer in the roster (in both seats, `samples` times each) and is placed on the field's existing Elo scale by
+fitting only its own $\\theta$ with everyone else's ratings frozen.
+
+A team spec is a JSON file:
+
+    {
+        "name": "Custom",
+        "location": "Lab",
+        "modifiers": [1, 3],
+        "pokemon": [{"species": "Mewtwo", "level": 70, "moves": ["Psychic", "Recover", "Amnesia", "Barrier"]}]
+    }
+
+`moves` may be left out, in which case the Pokémon gets the last four moves it learns by its level,
+as trainer Pokémon do.
+"""
+
+import json
+import multiprocessing.pool
+import numpy as np
+import click
+from tqdm import tqdm
+from pykmn.engine.common import ResultType
+from src.models.pokemon import Pokemon, Trainer, deserialize_trainerclasses
+from src.models.roster import PackedRoster
+from src.models.results import (
+    OUTCOME_CODES,
+    OUTCOME_ERROR,
+    OUTCOME_P1_WIN,
+    OUTCOME_P2_WIN,
+    OUTCOME_TIE,
+    flatten_trainers,
+    load_result_columns,
+    read_results_header,
+)
+from src.sim.battle_pool import battle_pool, worker_state
+from src.sim.run_tournament import run_battle
+from src.sim.seeding import battle_seed, new_master_seed, trainer_key
+from src.sim.turn_cap import TURN_CAP
+from src.sim.validation import RosterError, check_roster
+from src.utils.elo_calculator import ELO_BASE, ELO_SCALE, generate_lr_elo
+
+
+def load_team_spec(path: str) -> Trainer:
+    """
+    Builds a `Trainer` from a team spec file.
+    """
+    with open(path) as f:
+        spec = json.load(f)
+
+    levelup_moves = name_map = None
+    pokemon = []
+    for member in spec["pokemon"]:
+        moves = member.get("moves")
+        if moves is None:
+            if levelup_moves is None:
+                from src.utils.gen_trainer_data import learnable_moves, load_move_data
+
+                levelup_moves, name_map, _ = load_move_data()
+            moves = learnable_moves(member["species"], member["level"], levelup_moves, name_map)[-4:]
+        pokemon.append(
+            Pokemon(extra={"level": member["level"]}, species=member["species"], moves=tuple(moves))
+        )
+
+    trainer = Trainer(
+        name=spec.get("name", "Challenger"),
+        location=spec.get("location", "Gauntlet"),
+        pokemon=pokemon,
+    )
+    trainer.modifiers = tuple(spec.get("modifiers", ()))
+    return trainer
+
+
+def trainer_to_spec(trainer: Trainer) -> dict:
+    """
+    Inverse of `load_team_spec`, for writing teams (e.g. from the optimizer) back out.
+    """
+    return {
+        "name": trainer.name,
+        "location": trainer.location,
+        "modifiers": list(getattr(trainer, "modifiers", ())),
+        "pokemon": [
+            {"species": pokemon.species, "level": pokemon.extra["level"], "moves": list(pokemon.moves)}
+            for pokemon in trainer.pokemon
+        ],
+    }
+
+
+def _play_chunk(task: tuple[int, Trainer, list[tuple[int, int, bool]]]) -> tuple[int, list[tuple[int, bool, int]]]:
+    """
+    Plays a challenger against a chunk of (opponent index, sample, challenger is player 1) battles.
+    Battles are seeded from the challenger's trainer ID, as in a tournament, so variants of one team (which
+    keep its name and location) all face the same seeds, and a challenger already in the roster replays its
+    tournament battles.
+    """
+    challenger_idx, challenger, battles = task
+    field: PackedRoster = worker_state["field"]
+    challenger_key = trainer_key(challenger)
+
+    results = []
+    for opponent_idx, sample, challenger_first in battles:
+        opponent = field.trainer(opponent_idx)
+        opponent_key = field.records["seed_key"][opponent_idx]
+        if challenger_first:
+            trainer1, trainer2, seed_pair = challenger, opponent, (challenger_key, opponent_key)
+        else:
+            trainer1, trainer2, seed_pair = opponent, challenger, (opponent_key, challenger_key)
+
+        seed = battle_seed(worker_state["master_seed"], *seed_pair, sample)
+        try:
+            result, _ = run_battle(
+                trainer1, trainer2, False, seed, worker_state["cache"], turn_cap=worker_state["turn_cap"]
+            )
+        except Exception as e:
+            print(f"Error during battle between {trainer1.name} and {trainer2.name}: {e}")
+            result = ResultType.ERROR
+        results.append((opponent_idx, challenger_first, OUTCOME_CODES.get(result, OUTCOME_ERROR)))
+    return challenger_idx, results
+
+
+def gauntlet_pool(
+    field: PackedRoster,
+    master_seed: int,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int = TURN_CAP,
+) -> multiprocessing.pool.Pool:
+    """
+    Worker pool attached to the field, reusable for any number of challengers, playing with `turn_cap`.
+    Only the roster's shared memory name crosses the pool boundary, not the trainers.
+    """
+    return battle_pool(field, master_seed, workers, cache_path, turn_cap)
+
+
+def field_turn_cap(battle_results_path: str) -> int:
+    """
+    The turn cap the field's tournament was played with, so challengers are played under the same one.
+    """
+    return read_results_header(battle_results_path).get("turn_cap", TURN_CAP)
+
+
+def gauntlet_battles(opponents: list[int], samples: int = 1) -> list[tuple[int, int, bool]]:
+    """
+    Every (opponent, sample, challenger is player 1) battle against `opponents`, in both seats.
+    """
+    return [
+        (opponent_idx, sample, challenger_first)
+        for opponent_idx in opponents
+        for sample in range(samples)
+        for challenger_first in (True, False)
+    ]
+
+
+def play_gauntlets(
+    pool: multiprocessing.pool.Pool,
+    challengers: list[Trainer],
+    battles: list[tuple[int, int, bool]],
+    chunk_size: int = 16,
+    progress: bool = True,
+) -> list[dict[str, np.ndarray]]:
+    """
+    Plays every challenger through `battles` on `pool`. Chunks of all challengers are interleaved
+    so a batch of candidates keeps every worker busy.
+
+    Returns, per challenger, columns `opponent`, `challenger_first` and `outcome` (codes from `src.models.results`).
+    """
+    tasks = [
+        (challenger_idx, challenger, battles[start : start + chunk_size])
+        for start in range(0, len(battles), chunk_size)
+        for challenger_idx, challenger in enumerate(challengers)
+    ]
+
+    results = [[] for _ in challengers]
+    with tqdm(total=len(battles) * len(challengers), disable=not progress) as bar:
+        for challenger_idx, chunk in pool.imap_unordered(_play_chunk, tasks):
+            results[challenger_idx].extend(chunk)
+            bar.update(len(chunk))
+
+    columns = []
+    for played in results:
+        opponent, challenger_first, outcome = zip(*played) if played else ((), (), ())
+        columns.append(
+            {
+                "opponent": np.array(opponent, dtype=np.int32),
+                "challenger_first": np.array(challenger_first, dtype=bool),
+                "outcome": np.array(outcome, dtype=np.int8),
+            }
+        )
+    return columns
+
+
+def play_gauntlet(
+    field: list[Trainer],
+    challenger: Trainer,
+    samples: int = 1,
+    master_seed: int | None = None,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    progress: bool = True,
+    turn_cap: int = TURN_CAP,
+) -> dict[str, np.ndarray]:
+    """
+    Plays `challenger` against every trainer in `field`, in both seats, `samples` times each, stopping
+    battles at `turn_cap` choices. See `play_gauntlets` for the returned columns.
+    """
+    if master_seed is None:
+        master_seed = new_master_seed()
+
+    battles = gauntlet_battles(list(range(len(field))), samples)
+    with PackedRoster.create(field) as roster:
+        with gauntlet_pool(roster, master_seed, workers, cache_path, turn_cap) as pool:
+            (columns,) = play_gauntlets(pool, [challenger], battles, progress=progress)
+            # Let workers exit cleanly so their caches are flushed
+            pool.close()
+            pool.join()
+    return columns
+
+
+def fit_challenger_rating(
+    battles: dict[str, np.ndarray],
+    field_theta: np.ndarray,
+    intercept: float,
+    C: float = 1.0,
+    max_iter: int = 50,
+    tol: float = 1e-8,
+) -> tuple[float, float]:
+    """
+    Fits the challenger's $\\theta$ with the field frozen, using the same L2-penalised logistic model as
+    `generate_lr_elo`. Solved by Newton's method since there is a single parameter.
+
+    Returns $\\theta$ and its standard error from the observed information.
+    """
+    outcome = battles["outcome"]
+    keep = outcome != OUTCOME_ERROR
+    outcome = outcome[keep]
+    first = battles["challenger_first"][keep]
+    opponent_theta = field_theta[battles["opponent"][keep]]
+
+    # Rows in the batch model's orientation, $z = \\theta_{P1} - \\theta_{P2} + b$.
+    # As player 1 the challenger's coefficient is +1, as player 2 it's -1.
+    sign = np.where(first, 1.0, -1.0)
+    offset = np.where(first, -opponent_theta, opponent_theta) + intercept
+    # Ties count as one win and one loss
+    positives = ((outcome == OUTCOME_P1_WIN) | (outcome == OUTCOME_TIE)).astype(float)
+    negatives = ((outcome == OUTCOME_P2_WIN) | (outcome == OUTCOME_TIE)).astype(float)
+
+    theta = 0.0
+    information = 1.0 / C
+    for _ in range(max_iter):
+        p = 1.0 / (1.0 + np.exp(-(sign * theta + offset)))
+        gradient = np.sum(sign * (positives - (positives + negatives) * p)) - theta / C
+        information = np.sum((positives + negatives) * p * (1 - p)) + 1.0 / C
+        step = gradient / information
+        theta += step
+        if abs(step) < tol:
+            break
+
+    return theta, 1.0 / np.sqrt(information)
+
+
+def gauntlet(
+    trainer_data_path: str,
+    battle_results_path: str,
+    team_spec_path: str,
+    samples: int = 1,
+    seed: int | None = None,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int | None = None,
+):
+    """
+    Rates a custom team against the trainers in an existing tournament. Battles are stopped at `turn_cap`
+    choices, by default the cap the tournament was played with.
+
+    Pipeline:
+    - Fit the field's ratings from the existing battle results
+    - Play the challenger against the field in parallel
+    - Fit the challenger's rating with the field frozen and print where it lands
+    """
+    field = flatten_trainers(deserialize_trainerclasses(trainer_data_path))
+    challenger = load_team_spec(team_spec_path)
+    # Hand-written specs are where typo'd species and moves come from
+    check_roster([challenger])
+
+    field_elo, intercept = generate_lr_elo(load_result_columns(battle_results_path, field), field)
+    field_theta = (np.array(field_elo) - ELO_BASE) / ELO_SCALE
+
+    if seed is None:
+        seed = new_master_seed()
+    print(f"Master seed: {seed}")
+    if turn_cap is None:
+        turn_cap = field_turn_cap(battle_results_path)
+
+    battles = play_gauntlet(field, challenger, samples, seed, workers, cache_path, turn_cap=turn_cap)
+    theta, standard_error = fit_challenger_rating(battles, field_theta, intercept)
+
+    elo = theta * ELO_SCALE + ELO_BASE
+    rank = int(np.sum(field_theta > theta)) + 1
+    outcome, first = battles["outcome"], battles["challenger_first"]
+    win = np.sum(np.where(first, outcome == OUTCOME_P1_WIN, outcome == OUTCOME_P2_WIN))
+    loss = np.sum(np.where(first, outcome == OUTCOME_P2_WIN, outcome == OUTCOME_P1_WIN))
+    draw = np.sum(outcome == OUTCOME_TIE)
+    print(
+        f"Trainer: {challenger.name} - {challenger.location}, LR Elo: {elo:.2f} "
+        f"(+- {1.96 * standard_error * ELO_SCALE:.2f}), Rank: {rank}/{len(field) + 1}, "
+        f"W: {win}, D: {draw}, L: {loss}"
+    )
+
+
+@click.command()
+@click.argument("trainer_data_path")
+@click.argument("battle_results_path")
+@click.argument("team_spec_path")
+@click.option("--samples", default=1, type=int, help="Battles per opponent and seat.")
+@click.option("--seed", default=None, type=int, help="Master seed. Random (and printed) if not given.")
+@click.option("--workers", default=None, type=int, help="Worker processes. Defaults to the CPU count.")
+@click.option("--cache", "cache_path", default=None, help="Battle result cache file (SQLite).")
+@click.option(
+    "--turn-cap",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Choices before a battle is stopped as a tie. Defaults to the cap the field was played with.",
+)
+def gauntlet_cmd(
+    trainer_data_path: str,
+    battle_results_path: str,
+    team_spec_path: str,
+    samples: int = 1,
+    seed: int | None = None,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int | None = None,
+):
+    """
+    Rates a custom team against an existing field without re-running the tournament.
+    """
+    try:
+        return gauntlet(
+            trainer_data_path, battle_results_path, team_spec_path, samples, seed, workers, cache_path, turn_cap
+        )
+    except RosterError as e:
+        raise click.ClickException(f"{team_spec_path}: {e}")
+
+
+if __name__ == "__main__":
+    gauntlet_cmd()
@@ -0,0 +1,303 @@
+"""
+Team optimizer: searches movesets and party orders that maximise a trainer's Elo against the field.
+
+Starting from a trainer in the roster, each step proposes a batch of neighbouring teams, either one move
+swapped for another the species has legally learned by its level (per the learnset index used by
+`populate_trainer_moves`), or two party members swapped. Candidates are scored by gauntlet runs against the
+field with everyone else's ratings frozen (see `src.sim.gauntlet`), and accepted by simulated annealing
+(a temperature of 0 is plain hill-climbing).
+
+Simulation dominates the search budget, so:
+- All candidates in a batch share one persistent worker pool and face the same seeds, which makes their
+  scores directly comparable.
+- Each candidate is first raced against a subset of the field and dropped if even an optimistic estimate
+  couldn't be accepted.
+- Scores are memoised per team, and battles can go through the on-disk `BattleCache`.
+"""
+
+import copy
+import json
+import math
+import random
+import numpy as np
+import click
+from src.models.pokemon import Trainer, deserialize_trainerclasses
+from src.models.roster import PackedRoster
+from src.models.results import flatten_trainers, load_result_columns, trainer_id
+from src.sim.cache import team_signature
+from src.sim.gauntlet import (
+    field_turn_cap,
+    fit_challenger_rating,
+    gauntlet_battles,
+    gauntlet_pool,
+    play_gauntlets,
+    trainer_to_spec,
+)
+from src.sim.seeding import new_master_seed
+from src.sim.turn_cap import TURN_CAP
+from src.utils.elo_calculator import ELO_BASE, ELO_SCALE, generate_lr_elo
+from src.utils.gen_trainer_data import learnable_moves, load_move_data
+
+# Acceptance probability below which a raced candidate is rejected early
+REJECT_PROBABILITY = 0.01
+
+
+def propose(trainer: Trainer, legal_moves: dict[tuple[str, int], list[str]], rng: random.Random) -> Trainer:
+    """
+    Returns a neighbouring team: one move replaced by another legal move, or two party members swapped.
+    """
+    candidate = copy.deepcopy(trainer)
+    party = candidate.pokemon
+
+    if len(party) > 1 and rng.random() < 0.25:
+        first, second = rng.sample(range(len(party)), 2)
+        party[first], party[second] = party[second], party[first]
+        return candidate
+
+    pokemon = rng.choice(party)
+    options = [
+        move
+        for move in legal_moves[pokemon.species, pokemon.extra["level"]]
+        if move not in pokemon.moves
+    ]
+    if not options:
+        return candidate
+
+    moves = list(pokemon.moves)
+    if len(moves) < 4:
+        moves.append(rng.choice(options))
+    else:
+        moves[rng.randrange(len(moves))] = rng.choice(options)
+    pokemon.moves = tuple(moves)
+    return candidate
+
+
+def optimize_team(
+    field: list[Trainer],
+    field_theta: np.ndarray,
+    intercept: float,
+    start: Trainer,
+    legal_moves: dict[tuple[str, int], list[str]],
+    iterations: int = 50,
+    batch: int = 8,
+    samples: int = 1,
+    temperature: float = 0.1,
+    cooling: float = 0.95,
+    race_fraction: float = 0.25,
+    master_seed: int | None = None,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int = TURN_CAP,
+) -> tuple[Trainer, float]:
+    """
+    Simulated annealing over teams, scored by gauntlet $\\theta$. Returns the best team found and its $\\theta$.
+
+    `temperature` is in $\\theta$ units and decays by `cooling` every iteration. Battles are stopped at
+    `turn_cap` choices, which should be the cap the field was rated with.
+    """
+    if master_seed is None:
+        master_seed = new_master_seed()
+    rng = random.Random(master_seed)
+
+    # Race every candidate against the same subset of the field first
+    opponents = list(range(len(field)))
+    rng.shuffle(opponents)
+    split = max(1, int(len(opponents) * race_fraction))
+    race_battles = gauntlet_battles(opponents[:split], samples)
+    rest_battles = gauntlet_battles(opponents[split:], samples)
+
+    scores = {}
+
+    def combine(first: dict, second: dict) -> dict:
+        return {key: np.concatenate([first[key], second[key]]) for key in first}
+
+    with PackedRoster.create(field) as roster, gauntlet_pool(
+        roster, master_seed, workers, cache_path, turn_cap
+    ) as pool:
+
+        def evaluate(candidates: list[Trainer], threshold: float | None) -> list[float | None]:
+            """
+            Scores candidates, skipping the full gauntlet for those whose raced upper bound is below `threshold`.
+            """
+            unseen = [
+                candidate for candidate in candidates if team_signature(candidate) not in scores
+            ]
+            unseen = list({team_signature(candidate): candidate for candidate in unseen}.values())
+            if unseen:
+                raced = play_gauntlets(pool, unseen, race_battles, progress=False)
+                survivors = []
+                for candidate, battles in zip(unseen, raced):
+                    theta, standard_error = fit_challenger_rating(battles, field_theta, intercept)
+                    if threshold is not None and theta + 2 * standard_error < threshold:
+                        scores[team_signature(candidate)] = None
+                    else:
+                        survivors.append((candidate, battles))
+
+                if survivors and rest_battles:
+                    rest = play_gauntlets(pool, [candidate for candidate, _ in survivors], rest_battles, progress=False)
+                    survivors = [
+                        (candidate, combine(battles, more))
+                        for (candidate, battles), more in zip(survivors, rest)
+                    ]
+                for candidate, battles in survivors:
+                    scores[team_signature(candidate)] = fit_challenger_rating(battles, field_theta, intercept)[0]
+
+            return [scores[team_signature(candidate)] for candidate in candidates]
+
+        (current_theta,) = evaluate([start], None)
+        current = best = start
+        best_theta = current_theta
+        print(f"Start: {current_theta * ELO_SCALE + ELO_BASE:.2f}")
+
+        for iteration in range(iterations):
+            candidates = [propose(current, legal_moves, rng) for _ in range(batch)]
+
+            # Anything whose optimistic score would be accepted with negligible probability is rejected early
+            if temperature > 0:
+                threshold = current_theta + temperature * math.log(REJECT_PROBABILITY)
+            else:
+                threshold = current_theta
+            candidate_thetas = evaluate(candidates, threshold)
+
+            scored = [
+                (theta, candidate)
+                for theta, candidate in zip(candidate_thetas, candidates)
+                if theta is not None
+            ]
+            if scored:
+                theta, candidate = max(scored, key=lambda scored_candidate: scored_candidate[0])
+                delta = theta - current_theta
+                if delta > 0 or (temperature > 0 and rng.random() < math.exp(delta / temperature)):
+                    current, current_theta = candidate, theta
+                    if theta > best_theta:
+                        best, best_theta = candidate, theta
+
+            temperature *= cooling
+            print(
+                f"Iteration {iteration + 1}/{iterations}: current {current_theta * ELO_SCALE + ELO_BASE:.2f}, "
+                f"best {best_theta * ELO_SCALE + ELO_BASE:.2f}, "
+                f"rejected early {sum(theta is None for theta in candidate_thetas)}/{len(candidates)}"
+            )
+
+        pool.close()
+        pool.join()
+
+    return best, best_theta
+
+
+def optimize(
+    trainer_data_path: str,
+    battle_results_path: str,
+    trainer: str,
+    output: str,
+    iterations: int = 50,
+    batch: int = 8,
+    samples: int = 1,
+    temperature: float = 0.1,
+    seed: int | None = None,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int | None = None,
+):
+    """
+    Optimises the team of `trainer` ("name-location") and writes the best team as a gauntlet team spec.
+    Battles are stopped at `turn_cap` choices, by default the cap the field's tournament was played with.
+    """
+    field = flatten_trainers(deserialize_trainerclasses(trainer_data_path))
+    start = next((candidate for candidate in field if trainer_id(candidate) == trainer), None)
+    if start is None:
+        raise click.ClickException(f"unknown trainer {trainer!r}")
+
+    field_elo, intercept = generate_lr_elo(load_result_columns(battle_results_path, field), field)
+    field_theta = (np.array(field_elo) - ELO_BASE) / ELO_SCALE
+
+    levelup_moves, name_map, _ = load_move_data()
+    legal_moves = {
+        (pokemon.species, pokemon.extra["level"]): learnable_moves(
+            pokemon.species, pokemon.extra["level"], levelup_moves, name_map
+        )
+        for pokemon in start.pokemon
+    }
+
+    if seed is None:
+        seed = new_master_seed()
+    print(f"Master seed: {seed}")
+    if turn_cap is None:
+        turn_cap = field_turn_cap(battle_results_path)
+
+    best, best_theta = optimize_team(
+        field,
+        field_theta,
+        intercept,
+        start,
+        legal_moves,
+        iterations=iterations,
+        batch=batch,
+        samples=samples,
+        temperature=temperature,
+        master_seed=seed,
+        workers=workers,
+        cache_path=cache_path,
+        turn_cap=turn_cap,
+    )
+
+    print(f"Best: {best_theta * ELO_SCALE + ELO_BASE:.2f}")
+    for pokemon in best.pokemon:
+        print(f"* {pokemon.species} (L{pokemon.extra['level']}): {', '.join(pokemon.moves)}")
+    with open(output, "w") as f:
+        json.dump(trainer_to_spec(best), f, indent=4)
+
+
+@click.command()
+@click.argument("trainer_data_path")
+@click.argument("battle_results_path")
+@click.argument("trainer")
+@click.argument("output")
+@click.option("--iterations", default=50, type=int)
+@click.option("--batch", default=8, type=int, help="Candidates proposed per iteration.")
+@click.option("--samples", default=1, type=int, help="Battles per opponent and seat.")
+@click.option("--temperature", default=0.1, type=float, help="Starting annealing temperature in theta units. 0 for hill-climbing.")
+@click.option("--seed", default=None, type=int, help="Master seed. Random (and printed) if not given.")
+@click.option("--workers", default=None, type=int, help="Worker processes. Defaults to the CPU count.")
+@click.option("--cache", "cache_path", default=None, help="Battle result cache file (SQLite).")
+@click.option(
+    "--turn-cap",
+    default=None,
+    type=click.IntRange(min=1),
+    help="Choices before a battle is stopped as a tie. Defaults to the cap the field was played with.",
+)
+def optimize_cmd(
+    trainer_data_path: str,
+    battle_results_path: str,
+    trainer: str,
+    output: str,
+    iterations: int = 50,
+    batch: int = 8,
+    samples: int = 1,
+    temperature: float = 0.1,
+    seed: int | None = None,
+    workers: int | None = None,
+    cache_path: str | None = None,
+    turn_cap: int | None = None,
+):
+    """
+    Searches movesets and party orders for TRAINER ("name-location") and writes the best team to OUTPUT.
+    """
+    return optimize(
+        trainer_data_path,
+        battle_results_path,
+        trainer,
+        output,
+        iterations,
+        batch,
+        samples,
+        temperature,
+        seed,
+        workers,
+        cache_path,
+        turn_cap,
+    )
+
+
+if __name__ == "__main__":
+    optimize_cmd()
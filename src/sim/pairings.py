@@ -0,0 +1,107 @@
+"""
+Symmetry-aware pairing generation.
+
+The naive schedule is every ordered pair of trainers, which includes trainers playing themselves and treats
+(A, B) and (B, A) as unrelated. Three reductions are available:
+- Dropping self-matches, which carry no rating information.
+- Playing trainers with identical parties and AI once and sharing the result between all of them.
+- Playing only unordered pairs when the P1/P2 seat doesn't measurably matter (see `measure_order_effect`).
+"""
+
+import itertools
+import math
+import random
+from pykmn.engine.common import ResultType
+from src.models.pokemon import Trainer
+from src.sim.cache import team_signature
+from src.sim.seeding import battle_seed, trainer_keys
+
+
+def canonical_trainers(trainers: list[Trainer]) -> list[int]:
+    """
+    Maps each trainer to the index of the first trainer with the same party and AI.
+    """
+    first_seen = {}
+    return [
+        first_seen.setdefault(team_signature(trainer), idx)
+        for idx, trainer in enumerate(trainers)
+    ]
+
+
+def generate_pairings(
+    trainers: list[Trainer],
+    self_matches: bool = True,
+    dedupe: bool = False,
+    ordered: bool = True,
+) -> dict[tuple[int, int], list[tuple[int, int]]]:
+    """
+    Builds the battles to play.
+
+    Returns a mapping from each pairing to simulate to the (player 1, player 2) pairings that share its result.
+    Without any reductions every pairing only stands for itself.
+    """
+    canonical = canonical_trainers(trainers) if dedupe else list(range(len(trainers)))
+
+    pairings = {}
+    for t1_idx, t2_idx in itertools.product(range(len(trainers)), repeat=2):
+        if not self_matches and t1_idx == t2_idx:
+            continue
+        if not ordered and t1_idx > t2_idx:
+            continue
+
+        # The battle actually played is between the representatives of both trainers
+        key, pairing = (canonical[t1_idx], canonical[t2_idx]), (t1_idx, t2_idx)
+        if not ordered and key[0] > key[1]:
+            # Unordered schedules only play one seat order, so record the pairing that way round
+            key, pairing = key[::-1], pairing[::-1]
+        pairings.setdefault(key, []).append(pairing)
+
+    return pairings
+
+
+def measure_order_effect(
+    trainers: list[Trainer],
+    run_battle,
+    master_seed: int,
+    pairs: int = 200,
+    samples: int = 1,
+) -> dict[str, float]:
+    """
+    Estimates whether the P1/P2 seat changes outcomes.
+
+    Plays a random subset of unordered pairs in both seat orders and compares how often the lower-indexed
+    trainer wins as P1 against how often it wins as P2. `order_matters` is set when the difference is more
+    than two standard errors from zero.
+
+    `run_battle` is called as `run_battle(trainer1, trainer2, seed)` and returns a `ResultType`.
+    """
+    rng = random.Random(master_seed)
+    candidates = list(itertools.combinations(range(len(trainers)), 2))
+    chosen = rng.sample(candidates, min(pairs, len(candidates)))
+    keys = trainer_keys(trainers)
+
+    as_p1, as_p2, played = 0, 0, 0
+    for t1_idx, t2_idx in chosen:
+        for sample in range(samples):
+            forward = run_battle(
+                trainers[t1_idx], trainers[t2_idx], battle_seed(master_seed, keys[t1_idx], keys[t2_idx], sample)
+            )
+            backward = run_battle(
+                trainers[t2_idx], trainers[t1_idx], battle_seed(master_seed, keys[t2_idx], keys[t1_idx], sample)
+            )
+            as_p1 += forward == ResultType.PLAYER_1_WIN
+            as_p2 += backward == ResultType.PLAYER_2_WIN
+            played += 1
+
+    played = max(played, 1)
+    difference = (as_p1 - as_p2) / played
+    p = (as_p1 + as_p2) / (2 * played)
+    standard_error = math.sqrt(max(2 * p * (1 - p) / played, 1e-12))
+    return {
+        "pairs": len(chosen),
+        "p1_seat_win_rate": as_p1 / played,
+        "p2_seat_win_rate": as_p2 / played,
+        "difference": difference,
+        "standard_error": standard_error,
+        "order_matters": abs(difference) > 2 * standard_error,
+    }
@@ -1,66 +1,180 @@
 """Test script."""
 
-from pykmn.engine.gen1 import Battle, Choice, Pokemon
+from typing import Callable
 from tqdm import tqdm
-from pykmn.engine.common import ResultType, Slots
-from pykmn.engine.protocol import parse_protocol
+from pykmn.engine.common import ResultType
 from src.ai.choice import advance_battle
-import pickle
-import itertools
+from src.engine import current_engine, set_engine
+from src.sim.cache import BattleCache
+from src.sim.pairings import generate_pairings, measure_order_effect
+from src.sim.seeding import battle_streams, new_master_seed, trainer_keys
+from src.sim.telemetry import BattleTelemetry
+from src.sim.turn_cap import TURN_CAP, estimate_turn_cap
+from src.utils.instrumentation import hit_rate
+import random
 from src.models.pokemon import deserialize_trainerclasses, Trainer, TrainerClass
+from src.models.results import (
+    OUTCOME_NAMES,
+    ResultsWriter,
+    flatten_trainers,
+    load_result_columns,
+    read_results_header,
+)
+import numpy as np
 import click
 
 def flatten(seq: list) -> list:
     return [element for subseq in seq for element in subseq]
 
 
-def run_battle(trainer1: Trainer, trainer2: Trainer, log=True) -> ResultType:
+def run_battle(
+    trainer1: Trainer,
+    trainer2: Trainer,
+    log=True,
+    seed: int | None = None,
+    cache: BattleCache | None = None,
+    telemetry: BattleTelemetry | None = None,
+    turn_cap: int = TURN_CAP,
+) -> ResultType:
     """Runs a Pokémon battle.
 
     Args:
         log (`bool`, optional): Whether to log protocol traces. Defaults to `True`.
+        seed (`int`, optional): Battle seed for the engine PRNG and AI tie-breaks. Unseeded if `None`.
+        cache (`BattleCache`, optional): Result cache consulted before simulating. Only seeded,
+            unlogged battles are cached since anything else isn't reproducible or needs the traces.
+        telemetry (`BattleTelemetry`, optional): Filled with the battle's telemetry when given.
+        turn_cap (`int`, optional): Choices after the setup turn before the battle is stopped as a tie
+            (see `src.sim.turn_cap`). Defaults to `TURN_CAP`.
     """
+    if cache is None or seed is None or log:
+        return simulate_battle(trainer1, trainer2, log, seed, telemetry, turn_cap)
+
+    key = cache.key(trainer1, trainer2, seed)
+    if (cached := cache.get(key, telemetry, turn_cap)) is not None:
+        return cached
+
+    # The cache needs to know whether the battle was capped, which telemetry records
+    if telemetry is None:
+        telemetry = BattleTelemetry()
+    result, choice = simulate_battle(trainer1, trainer2, log, seed, telemetry, turn_cap)
+    cache.put(key, result, choice, telemetry)
+    return result, choice
+
+
+def simulate_battle(
+    trainer1: Trainer,
+    trainer2: Trainer,
+    log=True,
+    seed: int | None = None,
+    telemetry: BattleTelemetry | None = None,
+    turn_cap: int = TURN_CAP,
+) -> ResultType:
+    """
+    Plays out a battle in the current engine (see `src.engine`). See `run_battle`.
+    """
+    engine = current_engine()
     team1 = trainer1.pokemon
     team2 = trainer2.pokemon
 
-    battle = Battle(
-        p1_team=team1,
-        p2_team=team2,
-    )
-    slots: Slots = Slots(([p.species for p in team1], [p.species for p in team2]))
+    if seed is None:
+        battle = engine.new_battle(team1, team2)
+        rng = random
+    else:
+        engine_seed, rng = battle_streams(seed)
+        battle = engine.new_battle(team1, team2, engine_seed)
 
     # Turn 0
-    (result, trace) = battle.update(Choice.PASS(), Choice.PASS())
+    (result, trace) = battle.update(engine.pass_choice(), engine.pass_choice())
 
     if log:
         print("---------- Battle setup ----------\nTrace: ")
-        for msg in parse_protocol(trace, slots):
+        for msg in engine.describe(trace, team1, team2):
             print(f"* {msg}")
 
     choice = 1
     while result.type() == ResultType.NONE:
+        if choice > turn_cap:  # any stalling = tie
+            break
         if log:
             print(f"\n------------ Choice {choice} ------------")
         choice += 1
 
-        result, trace  = advance_battle(battle, result, trainer1, trainer2)
+        result, trace  = advance_battle(battle, result, trainer1, trainer2, rng, telemetry)
 
         if log:
             print("\nTrace:")
-            for msg in parse_protocol(trace, slots):
+            for msg in engine.describe(trace, team1, team2):
                 print("* " + msg)
-        if choice > 1000:  # any stalling = tie
-            return ResultType.TIE, choice
 
+    capped = result.type() == ResultType.NONE
+    if telemetry is not None:
+        telemetry.finish(battle, (len(team1), len(team2)), choice - 1, capped)
+    if capped:
+        if log:
+            print(f"\nStopped as a tie at the turn cap ({turn_cap})")
+        return ResultType.TIE, choice
     return result.type(), choice
 
 
-def run_tournament(trainer_data: str = "data/trainerclasses_blah.pkl", output: str="data/battle_results_50.pkl"):
+def run_tournament(
+    trainer_data: str | list[TrainerClass] = "data/trainerclasses_blah.pkl",
+    output: str = "data/battle_results_50.pkl",
+    live_elo: bool = False,
+    seed: int | None = None,
+    samples: int = 1,
+    cache_path: str | None = None,
+    cache_size: int = 1_000_000,
+    self_matches: bool = True,
+    dedupe: bool = False,
+    order: str = "ordered",
+    workers: int | None = 1,
+    shard: tuple[int, int] | None = None,
+    engine: str = "pykmn",
+    turn_cap: int | str = TURN_CAP,
+    cap_quantile: float = 0.99,
+    cap_margin: float = 0.5,
+    on_results: Callable[[dict[str, np.ndarray]], None] | None = None,
+):
     '''
-    Simulates a double round robin tournament over all trainers.
+    Simulates a double round robin tournament over all trainers, from a trainer data file or trainer classes
+    already in memory.
+
+    Every (pairing, sample) battle gets its own seed derived from the master `seed`, recorded with its result
+    so that it can be replayed on its own. A fresh master seed is drawn (and printed) if none is given.
+
+    The schedule can be reduced (see `src.sim.pairings`): `self_matches=False` skips trainers playing themselves,
+    `dedupe` plays trainers with identical parties and AI once and shares the result, and `order` is one of
+    "ordered" (both seat orders), "unordered" (one seat order per pair) or "auto" (unordered unless a sample of
+    mirrored battles shows the seat matters).
+
+    Battles are played in chunks by `workers` processes (all CPUs if `None`, in-process if 1), see
+    `src.sim.battle_pool`, and written to `output` as a columnar results store (see `src.models.results`)
+    in the order chunks complete.
+
+    With `shard=(i, N)`, only every N-th unit of the schedule from unit i is played, and `output` is a segment
+    for `merge` (see `src.sim.shards`). Every shard must use the same master seed.
+
+    With `cache_path`, results are looked up in (and added to) a `BattleCache` before simulating.
+
+    With `live_elo`, every chunk is fed to an `OnlineLRElo` and the current leader is shown on the progress bar.
+
+    Battles are played on the `engine` backend (see `src.engine`), which is recorded in the results header.
+
+    Battles still running after `turn_cap` choices are stopped as ties and flagged as capped. With
+    `turn_cap="auto"`, the cap is estimated from a sample of battles first: their `cap_quantile` length plus a
+    `cap_margin` fraction (see `src.sim.turn_cap`). The cap used is recorded in the results header.
+
+    `on_results` is called with the columns of every chunk as it's written, for ratings that are fed while the
+    tournament runs.
     '''
-    trainer_classes: list[TrainerClass] = deserialize_trainerclasses(
-        trainer_data
+    from src.sim.battle_pool import play_schedule
+    from src.sim.validation import check_roster
+
+    set_engine(engine)
+
+    trainer_classes: list[TrainerClass] = (
+        deserialize_trainerclasses(trainer_data) if isinstance(trainer_data, str) else trainer_data
     )
     trainers = [
         trainer
@@ -68,44 +182,242 @@ def run_tournament(trainer_data: str = "data/trainerclasses_blah.pkl", output: s
         for trainer in trainer_class.trainers
     ]
 
-    battles_to_run = list(itertools.product(trainers, trainers))
-    #battles_to_run = list(itertools.combinations(trainers, 2))
+    # Bad teams fail here rather than as errors hours into the run
+    records = check_roster(trainers)
 
-    battle_results = []
-    for trainer, other_trainer in tqdm(battles_to_run):
-        try:
-            result, count = run_battle(trainer, other_trainer, False)
-            battle_results.append(
-                {
-                    "player1": f"{trainer.name}-{trainer.location}",
-                    "player2": f"{other_trainer.name}-{other_trainer.location}",
-                    "outcome": result,
-                }
-            )
-        except Exception as e:
-            print(
-                f"Error during battle between {trainer.name} and {other_trainer.name}: {e}"
-            )
-            battle_results.append(
-                {
-                    "player1": f"{trainer.name}-{trainer.location}",
-                    "player2": f"{other_trainer.name}-{other_trainer.location}",
-                    "outcome": ResultType.ERROR,
-                }
-            )
-
-    with open(output, "wb") as f:
-        pickle.dump(battle_results, f)
+    if seed is None:
+        if shard is not None:
+            raise ValueError("Sharded tournaments need an explicit master seed shared by every shard")
+        seed = new_master_seed()
+    print(f"Master seed: {seed}")
+
+    if turn_cap == "auto":
+        cache = BattleCache(cache_path, cache_size) if cache_path else None
+        estimate = estimate_turn_cap(
+            trainers,
+            lambda trainer1, trainer2, battle_seed, telemetry: run_battle(
+                trainer1, trainer2, False, battle_seed, cache, telemetry
+            ),
+            seed,
+            quantile=cap_quantile,
+            margin=cap_margin,
+        )
+        if cache is not None:
+            cache.close()
+        turn_cap = estimate["turn_cap"]
+        print(
+            f"Turn cap: {turn_cap} ({estimate['quantile']:.1%} of {estimate['battles']} sampled battles took up to "
+            f"{estimate['quantile_turns']:.0f} turns, longest {estimate['max_turns']}, "
+            f"{estimate['capped_fraction']:.1%} would be capped)"
+        )
+
+    if order == "auto":
+        cache = BattleCache(cache_path, cache_size) if cache_path else None
+        order_effect = measure_order_effect(
+            trainers,
+            lambda trainer1, trainer2, battle_seed: run_battle(
+                trainer1, trainer2, False, battle_seed, cache, turn_cap=turn_cap
+            )[0],
+            seed,
+        )
+        if cache is not None:
+            cache.close()
+        print(
+            f"P1 seat win rate: {order_effect['p1_seat_win_rate']:.3f}, "
+            f"P2 seat win rate: {order_effect['p2_seat_win_rate']:.3f} "
+            f"(difference {order_effect['difference']:.3f} +- {order_effect['standard_error']:.3f})"
+        )
+        order = "ordered" if order_effect["order_matters"] else "unordered"
+        print(f"Playing {order} pairs")
+
+    pairings = generate_pairings(trainers, self_matches, dedupe, order == "ordered")
+    # Work units: every played pairing once per sample
+    played = np.array(list(pairings), dtype=np.int32).reshape(-1, 2)
+    units = np.column_stack(
+        [
+            np.repeat(played, samples, axis=0),
+            np.tile(np.arange(samples, dtype=np.int32), len(played)),
+        ]
+    )
+    meta = {"engine": engine, "engine_version": current_engine().version(), "turn_cap": turn_cap}
+    if shard is not None:
+        from src.sim.shards import shard_meta, shard_units
+
+        meta.update(shard_meta(units, trainer_keys(trainers), seed, *shard))
+        units = shard_units(units, *shard)
+        print(f"Shard {shard[0]}/{shard[1]}: {len(units)} of {meta['schedule_units']} battles")
+
+    # Without dedupe every pairing only stands for itself and nothing needs expanding
+    shared = any(len(real) > 1 or real[0] != key for key, real in pairings.items())
+
+    rating = None
+    if live_elo:
+        from src.utils.online_elo import OnlineLRElo
+
+        rating = OnlineLRElo(trainers)
+
+    progress = tqdm(total=len(units))
+    capped = 0
+    with ResultsWriter(output, trainers, meta) as writer:
+
+        def record(chunk: np.ndarray, columns: dict[str, np.ndarray]) -> None:
+            nonlocal capped
+            capped += int(np.count_nonzero(columns["capped"]))
+            if shared:
+                # Duplicate trainers share the result of their representatives' battle
+                rows = [pairings[t1_idx, t2_idx] for t1_idx, t2_idx in chunk[:, :2].tolist()]
+                repeats = np.array([len(real) for real in rows])
+                real = np.array([pairing for real in rows for pairing in real], dtype=np.int32).reshape(-1, 2)
+                columns = {key: np.repeat(column, repeats, axis=0) for key, column in columns.items()}
+                columns["player1"], columns["player2"] = real[:, 0], real[:, 1]
+
+            writer.write(columns)
+            if on_results is not None:
+                on_results(columns)
+            if rating is not None:
+                rating.update_columns(columns)
+                leader, leader_elo = rating.leader()
+                progress.set_postfix_str(f"{leader.name} - {leader.location}: {leader_elo:.0f}")
+
+        stats = play_schedule(
+            units, seed, trainers, record, workers, cache_path, cache_size, progress, records, turn_cap
+        )
+    progress.close()
+
+    print(
+        f"{stats['battles']} battles in {stats['chunks']} chunks, {stats['wall_seconds']:.1f}s "
+        f"({stats['battle_latency'] * 1000:.2f}ms per battle, worker utilisation {stats['utilisation']:.1%})"
+    )
+    # Counted before shared results are expanded, like the worker time
+    capped_seconds = stats["counters"].get("battles.capped_ns", 0) / 1e9
+    print(
+        f"Capped at {turn_cap} turns: {stats['counters'].get('battles.capped', 0)} battles "
+        f"({capped} results), {capped_seconds:.1f}s of {stats['worker_seconds']:.1f}s worker time "
+        f"({capped_seconds / max(stats['worker_seconds'], 1e-9):.1%})"
+    )
+    decision_hit_rate = hit_rate(stats["counters"], "ai.decision_cache")
+    if decision_hit_rate is not None:
+        print(f"AI decision cache hit rate: {decision_hit_rate:.1%}")
+
+
+def replay_battle(trainer_data: str, battle_results_path: str, index: int):
+    '''
+    Re-runs a single recorded battle from its seed, with protocol logging, on the engine and with the turn cap
+    it was played with.
+    '''
+    header = read_results_header(battle_results_path)
+    set_engine(header.get("engine", "pykmn"))
+    trainers = flatten_trainers(deserialize_trainerclasses(trainer_data))
+    columns = load_result_columns(battle_results_path, trainers)
+    seed = int(columns["seed"][index]) or None
+    result, count = run_battle(
+        trainers[columns["player1"][index]],
+        trainers[columns["player2"][index]],
+        True,
+        seed,
+        turn_cap=header.get("turn_cap", TURN_CAP),
+    )
+    recorded = OUTCOME_NAMES[columns["outcome"][index]]
+    if columns["capped"][index]:
+        recorded = f"{recorded} (capped)"
+    print(f"\nRecorded: {recorded}, Replayed: {result}")
 
 
 @click.command()
 @click.argument('trainer_data')
 @click.argument('output')
-def run_tournament_cmd(trainer_data: str = "data/trainerclasses_blah.pkl", output: str="data/battle_results_50.pkl"):
+@click.option("--live-elo", is_flag=True, help="Show the online Elo leader while the tournament runs.")
+@click.option("--seed", default=None, type=int, help="Master seed. Random (and printed) if not given.")
+@click.option("--samples", default=1, type=int, help="Battles per ordered pairing.")
+@click.option("--workers", default=1, type=int, help="Worker processes. 0 for the CPU count.")
+@click.option("--shard", default=None, help="Play only shard i/N (numbered from 0) of the schedule. Needs --seed.")
+@click.option("--cache", "cache_path", default=None, help="Battle result cache file (SQLite).")
+@click.option("--cache-size", default=1_000_000, type=int, help="Maximum cached battles before LRU eviction.")
+@click.option("--no-self-matches", is_flag=True, help="Skip trainers battling themselves.")
+@click.option("--dedupe", is_flag=True, help="Play trainers with identical parties and AI once and share the result.")
+@click.option(
+    "--order",
+    type=click.Choice(["ordered", "unordered", "auto"]),
+    default="ordered",
+    help="Play both seat orders, one per pair, or measure whether the seat matters first.",
+)
+@click.option("--engine", default="pykmn", help="Battle engine: pykmn, reference or trace:<path> (see src.engine).")
+@click.option(
+    "--turn-cap",
+    default=str(TURN_CAP),
+    help="Choices before a battle is stopped as a capped tie, or auto to estimate it from a sample of battles.",
+)
+@click.option("--cap-quantile", default=0.99, type=float, help="Battle length quantile --turn-cap auto starts from.")
+@click.option("--cap-margin", default=0.5, type=float, help="Fraction --turn-cap auto adds to that length.")
+def run_tournament_cmd(
+    trainer_data: str = "data/trainerclasses_blah.pkl",
+    output: str = "data/battle_results_50.pkl",
+    live_elo: bool = False,
+    seed: int | None = None,
+    samples: int = 1,
+    workers: int = 1,
+    shard: str | None = None,
+    cache_path: str | None = None,
+    cache_size: int = 1_000_000,
+    no_self_matches: bool = False,
+    dedupe: bool = False,
+    order: str = "ordered",
+    engine: str = "pykmn",
+    turn_cap: str = str(TURN_CAP),
+    cap_quantile: float = 0.99,
+    cap_margin: float = 0.5,
+):
     '''
     Simulates a double round robin tournament over all trainers.
     '''
-    return run_tournament(trainer_data, output)
+    from src.sim.validation import RosterError
+
+    if turn_cap != "auto":
+        if not turn_cap.isdigit() or int(turn_cap) < 1:
+            raise click.BadParameter("expected a positive number of choices or auto", param_hint="--turn-cap")
+        turn_cap = int(turn_cap)
+
+    if shard is not None:
+        from src.sim.shards import parse_shard
+
+        if seed is None:
+            raise click.UsageError("--shard needs --seed so every shard plays the same schedule")
+        try:
+            shard = parse_shard(shard)
+        except ValueError as e:
+            raise click.BadParameter(str(e), param_hint="--shard")
+    try:
+        return run_tournament(
+            trainer_data,
+            output,
+            live_elo,
+            seed,
+            samples,
+            cache_path,
+            cache_size,
+            not no_self_matches,
+            dedupe,
+            order,
+            workers or None,
+            shard,
+            engine,
+            turn_cap,
+            cap_quantile,
+            cap_margin,
+        )
+    except RosterError as e:
+        raise click.ClickException(f"{e} (run `validate` for the full list)")
+
+
+@click.command()
+@click.argument('trainer_data')
+@click.argument('battle_results_path')
+@click.argument('index', type=int)
+def replay_battle_cmd(trainer_data: str, battle_results_path: str, index: int):
+    '''
+    Replays battle number INDEX from a results file with full protocol traces.
+    '''
+    return replay_battle(trainer_data, battle_results_path, index)
 
 
 if __name__ == "__main__":
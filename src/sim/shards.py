@@ -0,0 +1,150 @@
+"""
+Sharded tournaments across machines that only share a filesystem.
+
+`tourney --shard i/N` plays every N-th work unit of the schedule, starting at unit i, and writes its own
+results segment. The schedule only depends on the roster, the master seed and the schedule flags, so every
+shard derives the same one independently and no coordinator process or queue is needed: a finished segment
+is its own record of completion (`ResultsWriter` only moves it into place once it is closed cleanly).
+
+Each segment's header records the shard, the shard count, the master seed, a fingerprint of the whole
+schedule and one of the battle seeds the shard should play. `merge` checks that every shard of the same
+schedule is present exactly once and holds exactly its own battles before concatenating the segments into
+one results store.
+"""
+
+import hashlib
+import numpy as np
+import click
+from src.models.results import ResultsWriter, iter_result_chunks, read_results_header
+from src.sim.seeding import battle_seed
+
+
+def parse_shard(shard: str) -> tuple[int, int]:
+    """
+    Parses "i/N" into (i, N), with shards numbered from 0.
+    """
+    try:
+        index, count = (int(part) for part in shard.split("/"))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {shard!r}")
+    if count < 1 or not 0 <= index < count:
+        raise ValueError(f"Shard index must be in [0, {count}), got {index}")
+    return index, count
+
+
+def schedule_fingerprint(units: np.ndarray, master_seed: int) -> str:
+    """
+    Identifies a full schedule, so segments of different schedules can't be merged together.
+    """
+    digest = hashlib.sha256(np.ascontiguousarray(units, dtype=np.int32).tobytes())
+    digest.update(str(master_seed).encode())
+    return digest.hexdigest()[:16]
+
+
+def shard_units(units: np.ndarray, index: int, count: int) -> np.ndarray:
+    """
+    Shard `index` of `count`: every `count`-th unit. Striding rather than splitting into blocks spreads each
+    trainer's battles (and so their cost) evenly across shards.
+    """
+    return units[index::count]
+
+
+def seeds_fingerprint(seeds: np.ndarray) -> str:
+    """
+    Identifies a set of battle seeds, regardless of order or repeats.
+    """
+    return hashlib.sha256(np.unique(seeds).astype("<u8").tobytes()).hexdigest()[:16]
+
+
+def shard_meta(units: np.ndarray, keys: np.ndarray, master_seed: int, index: int, count: int) -> dict:
+    """
+    Header fields written with a shard's results segment. `keys` are the roster's `trainer_keys`.
+    """
+    own = shard_units(units, index, count)
+    seeds = [battle_seed(master_seed, keys[t1_idx], keys[t2_idx], sample) for t1_idx, t2_idx, sample in own.tolist()]
+    return {
+        "master_seed": master_seed,
+        "schedule": schedule_fingerprint(units, master_seed),
+        "schedule_units": len(units),
+        "shard": index,
+        "shards": count,
+        "shard_units": len(own),
+        "shard_seeds": seeds_fingerprint(np.array(seeds, dtype=np.uint64)),
+    }
+
+
+def merge_segments(paths: list[str], output: str) -> dict[str, int]:
+    """
+    Validates and concatenates shard segments into one results store.
+
+    Raises `ValueError` if segments come from different schedules, rosters, engines or turn caps, a shard is
+    missing or duplicated, a segment holds other battles than its shard's, or a battle appears in more than
+    one segment. Battles are identified by their seed, which is unique per (pairing, sample) unit.
+    """
+    headers = [read_results_header(path) for path in paths]
+    for path, header in zip(paths, headers):
+        if "shard" not in header:
+            raise ValueError(f"{path} is not a shard segment")
+
+    first = headers[0]
+    for path, header in zip(paths, headers):
+        for key in ("schedule", "shards", "master_seed", "engine", "turn_cap"):
+            if header.get(key) != first.get(key):
+                raise ValueError(f"{path} has {key} {header.get(key)}, expected {first.get(key)} (from {paths[0]})")
+        if header["trainers"] != first["trainers"]:
+            raise ValueError(f"{path} was played on a different roster than {paths[0]}")
+
+    shards = [header["shard"] for header in headers]
+    duplicated = sorted({shard for shard in shards if shards.count(shard) > 1})
+    missing = sorted(set(range(first["shards"])) - set(shards))
+    if duplicated:
+        raise ValueError(f"Shards given more than once: {duplicated}")
+    if missing:
+        raise ValueError(f"Missing shards: {missing}")
+
+    seen = []
+    for path, header in zip(paths, headers):
+        seeds = np.concatenate([chunk["seed"] for chunk in iter_result_chunks(path)] or [np.array([], np.uint64)])
+        # Deduplicated trainers share a unit's seed, so count units rather than rows
+        units = np.unique(seeds)
+        if len(units) != header["shard_units"]:
+            raise ValueError(
+                f"{path} holds {len(units)} battles, shard {header['shard']} should have {header['shard_units']}"
+            )
+        # Segments from before the seeds were fingerprinted can only be checked by count
+        if "shard_seeds" in header and seeds_fingerprint(units) != header["shard_seeds"]:
+            raise ValueError(f"{path} holds different battles than shard {header['shard']} of the schedule")
+        seen.append(units)
+
+    seen = np.concatenate(seen)
+    if len(np.unique(seen)) != len(seen):
+        raise ValueError(f"{len(seen) - len(np.unique(seen))} battles were played in more than one segment")
+
+    rows = 0
+    carried = ("master_seed", "schedule", "engine", "engine_version", "turn_cap")
+    meta = {key: first[key] for key in carried if key in first}
+    with ResultsWriter(output, first["trainers"], meta) as writer:
+        for path in paths:
+            for chunk in iter_result_chunks(path):
+                writer.write(chunk)
+                rows += len(chunk["outcome"])
+
+    return {"segments": len(paths), "battles": len(seen), "rows": rows}
+
+
+@click.command()
+@click.argument("output")
+@click.argument("segments", nargs=-1, required=True)
+def merge_cmd(output: str, segments: tuple[str, ...]):
+    """
+    Validates shard SEGMENTS from `tourney --shard` and merges them into OUTPUT.
+    """
+    try:
+        report = merge_segments(list(segments), output)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    print(f"Merged {report['segments']} segments: {report['battles']} battles, {report['rows']} results")
+
+
+if __name__ == "__main__":
+    merge_cmd()
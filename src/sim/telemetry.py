@@ -0,0 +1,95 @@
+"""
+Per-battle telemetry.
+
+Everything here is counted from the choices the AI makes and read off the engine once the battle ends,
+so recording it costs a few integer increments per turn rather than protocol traces.
+
+- Turns: decision rounds after the setup turn, and whether the battle was stopped at the turn cap.
+- Pokémon remaining and the fraction of the party's total max HP remaining, per side.
+- Forced switches per side. The AI never switches voluntarily, so every switch it picks is forced.
+- Move usage per side, by `Choice` data: 0 for moves without a slot (Struggle, locked-in moves), else the slot.
+"""
+
+import struct
+import numpy as np
+from pykmn.engine.gen1 import Battle, Choice, ChoiceType
+from src.models.results import MOVE_CHOICES
+
+# turns, capped, remaining x2, hp fraction x2, forced switches x2, move uses x2
+_PACKED = struct.Struct(f"<h?2B2f2H{2 * MOVE_CHOICES}H")
+
+
+def party_hp(battle: Battle, player: int, party_size: int) -> list[tuple[int, int]]:
+    """
+    (current HP, max HP) of every Pokémon in `player`'s party.
+    """
+    return [
+        (battle.current_hp(player, slot), battle.stats(player, slot)["hp"])
+        for slot in range(1, party_size + 1)
+    ]
+
+
+class BattleTelemetry:
+    """
+    Counters for one battle. Fill with `record_choice` every turn and `finish` at the end.
+    """
+
+    __slots__ = ("turns", "capped", "remaining", "hp", "forced_switches", "move_uses")
+
+    def __init__(self):
+        self.turns = -1
+        self.capped = False
+        self.remaining = [0, 0]
+        self.hp = [0.0, 0.0]
+        self.forced_switches = [0, 0]
+        self.move_uses = [[0] * MOVE_CHOICES, [0] * MOVE_CHOICES]
+
+    def record_choice(self, player: int, choice: Choice) -> None:
+        kind = choice.type()
+        if kind == ChoiceType.MOVE:
+            self.move_uses[player][choice.data()] += 1
+        elif kind == ChoiceType.SWITCH:
+            self.forced_switches[player] += 1
+
+    def finish(self, battle: Battle, party_sizes: tuple[int, int], turns: int, capped: bool = False) -> None:
+        self.turns = turns
+        self.capped = capped
+        for player, party_size in enumerate(party_sizes):
+            party = party_hp(battle, player, party_size)
+            self.remaining[player] = sum(hp > 0 for hp, _ in party)
+            self.hp[player] = sum(hp for hp, _ in party) / max(sum(max_hp for _, max_hp in party), 1)
+
+    def pack(self) -> bytes:
+        return _PACKED.pack(
+            self.turns,
+            self.capped,
+            *self.remaining,
+            *self.hp,
+            *self.forced_switches,
+            *self.move_uses[0],
+            *self.move_uses[1],
+        )
+
+    @classmethod
+    def unpack(cls, data: bytes) -> "BattleTelemetry":
+        values = _PACKED.unpack(data)
+        telemetry = cls()
+        telemetry.turns = values[0]
+        telemetry.capped = values[1]
+        telemetry.remaining = list(values[2:4])
+        telemetry.hp = list(values[4:6])
+        telemetry.forced_switches = list(values[6:8])
+        telemetry.move_uses = [list(values[8 : 8 + MOVE_CHOICES]), list(values[8 + MOVE_CHOICES :])]
+        return telemetry
+
+    def store(self, columns: dict[str, np.ndarray], row: int) -> None:
+        """
+        Writes this battle into row `row` of results columns.
+        """
+        columns["turns"][row] = self.turns
+        columns["capped"][row] = self.capped
+        for player, prefix in enumerate(("p1", "p2")):
+            columns[f"{prefix}_remaining"][row] = self.remaining[player]
+            columns[f"{prefix}_hp"][row] = self.hp[player]
+            columns[f"{prefix}_forced_switches"][row] = self.forced_switches[player]
+            columns[f"{prefix}_move_uses"][row] = self.move_uses[player]
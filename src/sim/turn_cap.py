@@ -0,0 +1,64 @@
+"""
+Turn budget for battles.
+
+Two AIs that can't damage each other (or that heal as fast as they're hurt) would battle forever, so every
+battle is stopped as a tie after at most a fixed number of choices. A battle stopped this way is "capped":
+it is recorded with a tie outcome and the `capped` flag, so it can be told apart from a natural tie.
+
+Stall battles are rare but run for the whole budget, so they can take a large share of a tournament's time.
+`estimate_turn_cap` picks a tighter cap for a roster from a seeded sample of battles: a high quantile of
+their lengths plus a margin, so that only battles far longer than anything natural are cut short.
+"""
+
+import math
+import random
+import numpy as np
+from src.models.pokemon import Trainer
+from src.sim.seeding import battle_seed, trainer_keys
+from src.sim.telemetry import BattleTelemetry
+
+# Choices after the setup turn before a battle is stopped as a tie
+TURN_CAP = 1000
+
+
+def estimate_turn_cap(
+    trainers: list[Trainer],
+    run_battle,
+    master_seed: int,
+    battles: int = 500,
+    quantile: float = 0.99,
+    margin: float = 0.5,
+    limit: int = TURN_CAP,
+    floor: int = 50,
+) -> dict[str, float]:
+    """
+    Turn cap from the lengths of `battles` random pairings played with the `limit` cap.
+
+    The cap is the `quantile` of the sampled lengths, times `1 + margin`, kept within [`floor`, `limit`].
+    Battles are seeded as sample 0 of the tournament with `master_seed`, so with a cache they aren't replayed.
+
+    `run_battle` is called as `run_battle(trainer1, trainer2, seed, telemetry)` and fills `telemetry`.
+    """
+    rng = random.Random(master_seed)
+    keys = trainer_keys(trainers)
+    turns = np.empty(battles, dtype=np.int64)
+    capped = np.zeros(battles, dtype=bool)
+    for k in range(battles):
+        t1_idx, t2_idx = rng.randrange(len(trainers)), rng.randrange(len(trainers))
+        telemetry = BattleTelemetry()
+        seed = battle_seed(master_seed, keys[t1_idx], keys[t2_idx], 0)
+        run_battle(trainers[t1_idx], trainers[t2_idx], seed, telemetry)
+        turns[k] = telemetry.turns
+        capped[k] = telemetry.capped
+
+    observed = float(np.quantile(turns, quantile))
+    cap = min(limit, max(floor, math.ceil(observed * (1 + margin))))
+    return {
+        "turn_cap": cap,
+        "battles": battles,
+        "quantile": quantile,
+        "quantile_turns": observed,
+        "max_turns": int(turns.max()),
+        "limit_hits": int(np.sum(capped)),
+        "capped_fraction": float(np.mean(turns >= cap)),
+    }
@@ -0,0 +1,237 @@
+"""
+Roster validation before simulation.
+
+A bad team (a species or move the engine doesn't know, an impossible level, an oversized party) otherwise only
+shows up when `run_battle` throws mid-tournament, as a `ResultType.ERROR` hours into a run. `validate_roster`
+checks every team at once, with the roster encoded into integer arrays so each check is a vectorized
+comparison rather than a loop over Pokémon:
+
+Errors (the roster can't be simulated):
+- species and moves missing from pykmn's `SPECIES`/`MOVES` tables
+- levels outside 1-100, parties outside 1-6 Pokémon, movesets outside 1-4 moves
+- AI modifiers without an implementation
+- trainers sharing a "name-location" ID, which results are keyed by
+
+Warnings:
+- repeated moves in a moveset, which the engine plays but a Pokémon can't learn in the game
+- moves the species can't have learned by levelling up to its level, when learnsets are given
+
+The same arrays are the `PackedRoster` records (move IDs, levels and the AI modifier bitmask), so a validated
+roster goes to the workers without being packed again.
+"""
+
+from dataclasses import dataclass
+import numpy as np
+import click
+from src.ai.modifiers import IMPLEMENTED_MODIFIERS
+from src.models.pokemon import Trainer, deserialize_trainerclasses
+from src.models.results import flatten_trainers, trainer_id
+from src.models.roster import MOVE_IDS, MOVE_SLOTS, PARTY_SIZE, ROSTER_DTYPE, SPECIES_IDS
+from src.sim.seeding import trainer_keys
+
+LEVEL_RANGE = (1, 100)
+
+# Encoded value for a species or move name the engine doesn't know. Empty slots are -1.
+UNKNOWN = -2
+
+# Level for moves a species never learns by levelling up
+NEVER = np.iinfo(np.int16).max
+
+
+@dataclass
+class RosterIssue:
+    trainer: str
+    message: str
+    error: bool = True
+
+
+class RosterError(ValueError):
+    """
+    Raised when a roster has errors that would make battles fail.
+    """
+
+    def __init__(self, issues: list[RosterIssue]):
+        self.issues = issues
+        errors = [issue for issue in issues if issue.error]
+        super().__init__(
+            f"{len(errors)} roster errors, e.g. {errors[0].trainer}: {errors[0].message}" if errors else "Invalid roster"
+        )
+
+
+def encode_roster(trainers: list[Trainer]) -> dict[str, np.ndarray]:
+    """
+    Encodes every team as integer arrays: `party_size` (N), `species` and `level` (N, 6),
+    `moves` (N, 6, 4), `move_count` (N, 6) and the `modifiers` bitmask (N). Parties and movesets
+    are truncated to the slot counts, but `party_size` and `move_count` keep the real sizes.
+    """
+    N = len(trainers)
+    arrays = {
+        "party_size": np.zeros(N, dtype=np.int32),
+        "species": np.full((N, PARTY_SIZE), -1, dtype=np.int32),
+        "level": np.zeros((N, PARTY_SIZE), dtype=np.int32),
+        "moves": np.full((N, PARTY_SIZE, MOVE_SLOTS), -1, dtype=np.int32),
+        "move_count": np.zeros((N, PARTY_SIZE), dtype=np.int32),
+        "modifiers": np.zeros(N, dtype=np.int64),
+    }
+    for idx, trainer in enumerate(trainers):
+        arrays["party_size"][idx] = len(trainer.pokemon)
+        # Modifiers that can't be a bit of the mask get the top bit, which is never a known modifier
+        arrays["modifiers"][idx] = sum(
+            1 << (modifier - 1) if 1 <= modifier <= 62 else 1 << 62 for modifier in getattr(trainer, "modifiers", ())
+        )
+        for slot, pokemon in enumerate(trainer.pokemon[:PARTY_SIZE]):
+            arrays["species"][idx, slot] = SPECIES_IDS.get(pokemon.species, UNKNOWN)
+            arrays["level"][idx, slot] = pokemon.extra.get("level", 0)
+            arrays["move_count"][idx, slot] = len(pokemon.moves)
+            arrays["moves"][idx, slot, : len(pokemon.moves[:MOVE_SLOTS])] = [
+                MOVE_IDS.get(move, UNKNOWN) for move in pokemon.moves[:MOVE_SLOTS]
+            ]
+    return arrays
+
+
+def learnset_levels(levelup_moves: dict, name_map: dict) -> np.ndarray:
+    """
+    (species ID, move ID) -> level the species learns the move by levelling up, `NEVER` if it doesn't.
+    Built from `load_move_data` in `src.utils.gen_trainer_data`.
+    """
+    from src.utils.gen_trainer_data import correct_pokemon_name
+
+    levels = np.full((len(SPECIES_IDS), len(MOVE_IDS)), NEVER, dtype=np.int16)
+    for dex_name, engine_name in name_map.items():
+        species = SPECIES_IDS[engine_name]
+        for level, move in levelup_moves.get(correct_pokemon_name(dex_name.capitalize()), []):
+            levels[species, MOVE_IDS[move]] = min(levels[species, MOVE_IDS[move]], level)
+    return levels
+
+
+def validate_roster(
+    trainers: list[Trainer], learnsets: np.ndarray | None = None
+) -> tuple[np.ndarray | None, list[RosterIssue]]:
+    """
+    Checks every team. Returns the `ROSTER_DTYPE` records (`None` if there are errors) and the issues found.
+    Move legality is only checked when `learnsets` (from `learnset_levels`) is given.
+    """
+    arrays = encode_roster(trainers)
+    species, level, moves = arrays["species"], arrays["level"], arrays["moves"]
+    occupied = species != -1
+    issues = []
+
+    def report(mask: np.ndarray, message, error: bool = True) -> None:
+        for position in zip(*np.nonzero(mask)):
+            issues.append(RosterIssue(trainer_id(trainers[position[0]]), message(*position), error))
+
+    def pokemon(idx: int, slot: int) -> str:
+        return f"slot {slot + 1} ({trainers[idx].pokemon[slot].species})"
+
+    report(species == UNKNOWN, lambda idx, slot: f"{pokemon(idx, slot)}: unknown species")
+    report(
+        moves == UNKNOWN,
+        lambda idx, slot, move_slot: f"{pokemon(idx, slot)}: unknown move {trainers[idx].pokemon[slot].moves[move_slot]!r}",
+    )
+    report(
+        occupied & ((level < LEVEL_RANGE[0]) | (level > LEVEL_RANGE[1])),
+        lambda idx, slot: f"{pokemon(idx, slot)}: level {level[idx, slot]} outside {LEVEL_RANGE[0]}-{LEVEL_RANGE[1]}",
+    )
+    party_size = arrays["party_size"]
+    report(
+        (party_size < 1) | (party_size > PARTY_SIZE),
+        lambda idx: f"party of {party_size[idx]}, expected 1-{PARTY_SIZE}",
+    )
+    move_count = arrays["move_count"]
+    report(
+        occupied & ((move_count < 1) | (move_count > MOVE_SLOTS)),
+        lambda idx, slot: f"{pokemon(idx, slot)}: {move_count[idx, slot]} moves, expected 1-{MOVE_SLOTS}",
+    )
+
+    # Repeated moves: any two filled slots of the same moveset with the same move
+    ordered = np.sort(moves, axis=-1)
+    repeated = ((ordered[..., 1:] == ordered[..., :-1]) & (ordered[..., 1:] >= 0)).any(axis=-1)
+    report(repeated, lambda idx, slot: f"{pokemon(idx, slot)}: repeated move", error=False)
+
+    known = sum(1 << (modifier - 1) for modifier in IMPLEMENTED_MODIFIERS)
+    report(
+        (arrays["modifiers"] & ~known) != 0,
+        lambda idx: f"AI modifiers {tuple(trainers[idx].modifiers)} include unimplemented ones",
+    )
+
+    _, shared_id, counts = np.unique(
+        np.array([trainer_id(trainer) for trainer in trainers]), return_inverse=True, return_counts=True
+    )
+    report(counts[shared_id] > 1, lambda idx: "trainer ID shared with another trainer")
+
+    if learnsets is not None:
+        # Index 0 is a real species and move (Bulbasaur, Pound); only negative IDs are empty or unknown
+        valid_species = np.where(species >= 0, species, 0)
+        valid_moves = np.where(moves >= 0, moves, 0)
+        learned_at = learnsets[valid_species[..., None], valid_moves]
+        illegal = (moves >= 0) & (species[..., None] >= 0) & (learned_at > level[..., None])
+        report(
+            illegal,
+            lambda idx, slot, move_slot: (
+                f"{pokemon(idx, slot)}: can't have learned {trainers[idx].pokemon[slot].moves[move_slot]} "
+                f"by level {level[idx, slot]}"
+            ),
+            error=False,
+        )
+
+    if any(issue.error for issue in issues):
+        return None, issues
+
+    records = np.zeros(len(trainers), dtype=ROSTER_DTYPE)
+    records["party_size"] = party_size
+    records["modifiers"] = arrays["modifiers"]
+    records["species"] = species
+    records["level"] = level
+    records["moves"] = moves
+    records["seed_key"] = trainer_keys(trainers)
+    return records, issues
+
+
+def check_roster(trainers: list[Trainer], learnsets: np.ndarray | None = None) -> np.ndarray:
+    """
+    Validates `trainers`, printing warnings, and returns their records. Raises `RosterError` on errors.
+    """
+    records, issues = validate_roster(trainers, learnsets)
+    for issue in issues:
+        if not issue.error:
+            print(f"Warning: {issue.trainer}: {issue.message}")
+    if records is None:
+        raise RosterError(issues)
+    return records
+
+
+def validate(trainer_data_path: str, legality: bool = True) -> list[RosterIssue]:
+    """
+    Validates a trainer data file and prints every issue. Move legality needs the disassembly in `asm/`.
+    """
+    trainers = flatten_trainers(deserialize_trainerclasses(trainer_data_path))
+
+    learnsets = None
+    if legality:
+        from src.utils.gen_trainer_data import load_move_data
+
+        levelup_moves, name_map, _ = load_move_data()
+        learnsets = learnset_levels(levelup_moves, name_map)
+
+    _, issues = validate_roster(trainers, learnsets)
+    for issue in issues:
+        print(f"{'Error' if issue.error else 'Warning'}: {issue.trainer}: {issue.message}")
+    errors = sum(issue.error for issue in issues)
+    print(f"{len(trainers)} trainers, {errors} errors, {len(issues) - errors} warnings")
+    return issues
+
+
+@click.command()
+@click.argument("trainer_data_path")
+@click.option("--no-legality", is_flag=True, help="Skip the learnset check (needs the disassembly in asm/).")
+def validate_cmd(trainer_data_path: str, no_legality: bool = False):
+    """
+    Checks every team in a trainer data file before simulating it.
+    """
+    issues = validate(trainer_data_path, not no_legality)
+    if any(issue.error for issue in issues):
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    validate_cmd()
@@ -0,0 +1,206 @@
+"""
+## Tournament analytics
+
+Aggregates over battle results, computed with NumPy group-bys on the columnar results
+(see `src.models.results`) so that millions of battles take seconds rather than minutes.
+
+Every table is a dictionary of equal-length columns, which `export_table` writes as CSV or `.npz`.
+"""
+
+import csv
+import os
+import numpy as np
+import click
+from src.models.pokemon import deserialize_trainerclasses, Trainer, TrainerClass
+from src.models.results import (
+    OUTCOME_P1_WIN,
+    OUTCOME_P2_WIN,
+    OUTCOME_TIE,
+    OUTCOME_ERROR,
+    flatten_trainers,
+    load_result_columns,
+    trainer_id,
+)
+
+
+def valid_battles(columns: dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Mask of battles that finished (no engine error).
+    """
+    return columns["outcome"] != OUTCOME_ERROR
+
+
+def win_draw_loss(columns: dict[str, np.ndarray], N: int) -> dict[str, np.ndarray]:
+    """
+    Per-trainer win/draw/loss counts, counting both the P1 and P2 seat.
+    """
+    p1, p2, outcome = columns["player1"], columns["player2"], columns["outcome"]
+    p1_win = outcome == OUTCOME_P1_WIN
+    p2_win = outcome == OUTCOME_P2_WIN
+    tie = outcome == OUTCOME_TIE
+
+    win = np.bincount(p1[p1_win], minlength=N) + np.bincount(p2[p2_win], minlength=N)
+    loss = np.bincount(p2[p1_win], minlength=N) + np.bincount(p1[p2_win], minlength=N)
+    draw = np.bincount(p1[tie], minlength=N) + np.bincount(p2[tie], minlength=N)
+    return {"win": win, "draw": draw, "loss": loss}
+
+
+def head_to_head(columns: dict[str, np.ndarray], N: int) -> dict[str, np.ndarray]:
+    """
+    N x N matrices where `wins[i, j]` is how often trainer i beat trainer j (in either seat)
+    and `draws[i, j]` how often they tied. `draws` is symmetric.
+    """
+    p1, p2, outcome = columns["player1"], columns["player2"], columns["outcome"]
+    p1_win = outcome == OUTCOME_P1_WIN
+    p2_win = outcome == OUTCOME_P2_WIN
+    tie = outcome == OUTCOME_TIE
+
+    winner = np.concatenate([p1[p1_win], p2[p2_win]]).astype(np.int64)
+    loser = np.concatenate([p2[p1_win], p1[p2_win]]).astype(np.int64)
+    wins = np.bincount(winner * N + loser, minlength=N * N).reshape(N, N)
+
+    tied = p1[tie].astype(np.int64) * N + p2[tie]
+    draws = np.bincount(tied, minlength=N * N).reshape(N, N)
+    draws = draws + draws.T - np.diag(np.diag(draws))
+    return {"wins": wins, "draws": draws}
+
+
+def group_aggregates(
+    columns: dict[str, np.ndarray], group_of: np.ndarray, labels: list[str]
+) -> dict[str, np.ndarray]:
+    """
+    Sums per-trainer W/D/L into groups, where `group_of[i]` is trainer i's group index into `labels`.
+    """
+    wdl = win_draw_loss(columns, len(group_of))
+    G = len(labels)
+    table = {
+        "group": np.array(labels),
+        "trainers": np.bincount(group_of, minlength=G),
+    }
+    for key, counts in wdl.items():
+        table[key] = np.bincount(group_of, weights=counts, minlength=G).astype(np.int64)
+
+    played = table["win"] + table["draw"] + table["loss"]
+    with np.errstate(invalid="ignore", divide="ignore"):
+        table["win_rate"] = np.where(played > 0, table["win"] / played, np.nan)
+    return table
+
+
+def class_aggregates(
+    columns: dict[str, np.ndarray], trainer_classes: list[TrainerClass]
+) -> dict[str, np.ndarray]:
+    """
+    W/D/L per `TrainerClass`.
+    """
+    group_of = np.array(
+        [
+            class_idx
+            for class_idx, trainer_class in enumerate(trainer_classes)
+            for _ in trainer_class.trainers
+        ],
+        dtype=np.int64,
+    )
+    return group_aggregates(
+        columns, group_of, [trainer_class.name for trainer_class in trainer_classes]
+    )
+
+
+def location_aggregates(
+    columns: dict[str, np.ndarray], trainers: list[Trainer]
+) -> dict[str, np.ndarray]:
+    """
+    W/D/L per in-game location, merging the "-A", "-B", ... suffixes added by `parse_trainer_data`.
+    """
+    locations = np.array([trainer.location.rsplit("-", 1)[0] for trainer in trainers])
+    labels, group_of = np.unique(locations, return_inverse=True)
+    return group_aggregates(columns, group_of, list(labels))
+
+
+def first_mover_advantage(columns: dict[str, np.ndarray]) -> dict[str, float]:
+    """
+    Win rates by seat. A P1 win rate well above the P2 win rate means battle order matters.
+    """
+    outcome = columns["outcome"][valid_battles(columns)]
+    played = max(len(outcome), 1)
+    counts = np.bincount(outcome, minlength=3)
+    return {
+        "battles": len(outcome),
+        "p1_win_rate": counts[OUTCOME_P1_WIN] / played,
+        "p2_win_rate": counts[OUTCOME_P2_WIN] / played,
+        "tie_rate": counts[OUTCOME_TIE] / played,
+    }
+
+
+def turn_distribution(columns: dict[str, np.ndarray]) -> dict[str, np.ndarray]:
+    """
+    Histogram of battle lengths, for results that recorded turn counts, with how many were stopped at the turn cap.
+    """
+    recorded = valid_battles(columns) & (columns["turns"] >= 0)
+    turns = columns["turns"][recorded]
+    counts = np.bincount(turns)
+    capped = np.bincount(turns[columns["capped"][recorded]], minlength=len(counts))
+    nonzero = np.flatnonzero(counts)
+    return {"turns": nonzero, "battles": counts[nonzero], "capped": capped[nonzero]}
+
+
+def trainer_table(
+    columns: dict[str, np.ndarray], trainers: list[Trainer]
+) -> dict[str, np.ndarray]:
+    """
+    Per-trainer W/D/L with trainer identifiers.
+    """
+    table = {"trainer": np.array([trainer_id(trainer) for trainer in trainers])}
+    table.update(win_draw_loss(columns, len(trainers)))
+    return table
+
+
+def export_table(table: dict[str, np.ndarray], path: str) -> None:
+    """
+    Writes a table of equal-length columns. `.csv` paths get CSV, anything else a columnar `.npz`.
+    """
+    if path.endswith(".csv"):
+        with open(path, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(table.keys())
+            writer.writerows(zip(*(column.tolist() for column in table.values())))
+    else:
+        np.savez(path, **table)
+
+
+def analytics(trainer_data_path: str, battle_results_path: str, output_dir: str):
+    """
+    Computes all tables for a tournament and writes them to `output_dir`.
+    """
+    trainer_classes = deserialize_trainerclasses(trainer_data_path)
+    trainers = flatten_trainers(trainer_classes)
+    columns = load_result_columns(battle_results_path, trainers)
+
+    os.makedirs(output_dir, exist_ok=True)
+    export_table(trainer_table(columns, trainers), os.path.join(output_dir, "trainers.csv"))
+    export_table(class_aggregates(columns, trainer_classes), os.path.join(output_dir, "classes.csv"))
+    export_table(location_aggregates(columns, trainers), os.path.join(output_dir, "locations.csv"))
+    export_table(turn_distribution(columns), os.path.join(output_dir, "turns.csv"))
+    np.savez(
+        os.path.join(output_dir, "head_to_head.npz"),
+        trainer=np.array([trainer_id(trainer) for trainer in trainers]),
+        **head_to_head(columns, len(trainers)),
+    )
+
+    first_mover = first_mover_advantage(columns)
+    print(
+        f"Battles: {first_mover['battles']}, P1 win rate: {first_mover['p1_win_rate']:.3f}, "
+        f"P2 win rate: {first_mover['p2_win_rate']:.3f}, Tie rate: {first_mover['tie_rate']:.3f} "
+        f"({np.count_nonzero(columns['capped'])} capped)"
+    )
+
+
+@click.command()
+@click.argument("trainer_data_path")
+@click.argument("battle_results_path")
+@click.argument("output_dir")
+def analytics_cmd(trainer_data_path: str, battle_results_path: str, output_dir: str):
+    return analytics(trainer_data_path, battle_results_path, output_dir)
+
+
+if __name__ == "__main__":
+    analytics_cmd()
@@ -0,0 +1,107 @@
+"""
+## Trainer-class Elo for the Pokémon Red Tournament
+
+`generate_lr_elo` gives every trainer an independent $\\theta$ shrunk towards 0, so a trainer's rating only
+settles once they have played enough battles on their own. Trainers of a `TrainerClass` share an AI
+(`modifiers`) and usually similar teams, so this module partially pools them instead:
+
+$$\\theta_i = \\mu_{c(i)} + u_i$$
+
+where $\\mu_c$ is the strength of class $c$ and $u_i$ is trainer $i$'s deviation from it. Both are L2
+penalised, the class means more weakly (by `class_scale`), so a trainer with little data is pulled
+towards their class rather than towards the average trainer, and $\\mu_c$ answers questions like
+"how strong is the Cooltrainer AI" directly.
+
+The model is still a logistic regression: the design matrix gets one extra column per class,
+$x_{c(i)} = s$ and $x_{c(j)} = -s$, with the class coefficient $v_c = \\mu_c / s$. Penalising $v$ like
+every other coefficient puts a prior $N(0, s^2)$ on $\\mu$ relative to $N(0, 1)$ on $u$. The rows are the
+aggregated ones from `lr_rows` over a sparse design, so the fit scales with pairings rather than battles.
+"""
+
+import numpy as np
+from scipy import sparse
+from src.models.pokemon import TrainerClass
+from src.models.results import flatten_trainers, results_to_columns
+from src.utils.analytics import win_draw_loss
+from src.utils.elo_calculator import (
+    ELO_BASE,
+    ELO_SCALE,
+    LRFit,
+    fit_design,
+    lr_design,
+    lr_rows,
+    set_win_draw_loss,
+)
+
+
+def class_membership(trainer_classes: list[TrainerClass]) -> np.ndarray:
+    """
+    Class index of every trainer, in `flatten_trainers` order.
+    """
+    return np.array(
+        [
+            class_idx
+            for class_idx, trainer_class in enumerate(trainer_classes)
+            for _ in trainer_class.trainers
+        ],
+        dtype=np.int64,
+    )
+
+
+def fit_class_elo(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainer_classes: list[TrainerClass],
+    C: float = 1.0,
+    class_scale: float = 2.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+) -> tuple[LRFit, np.ndarray]:
+    """
+    Fits the partially pooled model. Self-matches are skipped, as in `generate_lr_elo`.
+
+    Returns the fit, whose `theta` (and `covariance`) is every trainer's total $\\theta_i = \\mu_{c(i)} + u_i$,
+    and the class strengths $\\mu$.
+    """
+    trainers = flatten_trainers(trainer_classes)
+    N, G = len(trainers), len(trainer_classes)
+    group_of = class_membership(trainer_classes)
+    columns = results_to_columns(battle_results, trainers)
+
+    not_self = columns["player1"] != columns["player2"]
+    set_win_draw_loss(trainers, win_draw_loss({key: column[not_self] for key, column in columns.items()}, N))
+
+    t1_idx, t2_idx, y, weights = lr_rows(columns, N)
+    # Battles within a class cancel out of the class columns, and so say nothing about $\\mu$
+    X = sparse.hstack(
+        [lr_design(t1_idx, t2_idx, N), class_scale * lr_design(group_of[t1_idx], group_of[t2_idx], G)],
+        format="csr",
+    )
+    fit = fit_design(X, y, weights, C, solver, tol, max_iter)
+
+    deviation, class_theta = fit.theta[:N], class_scale * fit.theta[N:]
+    fit.theta = class_theta[group_of] + deviation
+    # $\theta = A (u, v)$ with $A = [I, s M]$ for the membership matrix $M$
+    total = sparse.hstack(
+        [sparse.identity(N), class_scale * sparse.csr_matrix((np.ones(N), (np.arange(N), group_of)), shape=(N, G))],
+        format="csr",
+    )
+    fit.covariance = total @ (total @ fit.covariance).T
+    return fit, class_theta
+
+
+def generate_class_elo(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainer_classes: list[TrainerClass],
+    C: float = 1.0,
+    class_scale: float = 2.0,
+):
+    """
+    Class-pooled counterpart of `generate_lr_elo`.
+
+    Returns trainer and class Elo scores on the usual $\\text{ELO} = 173 \\cdot \\theta + 1500$ scale.
+    """
+    fit, class_theta = fit_class_elo(battle_results, trainer_classes, C, class_scale)
+    if not fit.converged:
+        print("Warning: class model did not converge")
+    return fit.elo_scores(), list(class_theta * ELO_SCALE + ELO_BASE)
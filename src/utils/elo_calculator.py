@@ -4,27 +4,27 @@
 All we'll need is `sklearn.linear_model.LogisticRegression`, and our data from the battle.
 """
 
-import pickle
 import numpy as np
-from sklearn import linear_model
 import click
 from dataclasses import dataclass, field
-from pykmn.engine.common import ResultType
 from src.models.pokemon import deserialize_trainerclasses, Trainer
+from src.models.results import (
+    OUTCOME_P1_WIN,
+    OUTCOME_P2_WIN,
+    OUTCOME_TIE,
+    iter_result_batches,
+    load_result_columns,
+    results_to_columns,
+    trainer_id,
+)
+from src.utils.analytics import win_draw_loss
 
+# $\text{ELO} = 173 \cdot \theta + 1500$
+ELO_SCALE = 173
+ELO_BASE = 1500
 
-
-
-def load_battle_results(filename: str) -> list[dict]:
-    """
-    Loads battle result data from a pickle file.
-    Each battle is a dictionary with:
-    - 'player1': "name-location" of player 1
-    - 'player2': "name-location" of player 2
-    - 'outcome': ResultType
-    """
-    with open(filename, "rb") as f:
-        return pickle.load(f)
+# Normal quantile for the 95% confidence intervals in leaderboards
+CI_Z = 1.96
 
 
 def build_trainer_lookup(trainers: list[Trainer]) -> dict[str, int]:
@@ -42,7 +42,243 @@ def build_trainer_lookup(trainers: list[Trainer]) -> dict[str, int]:
 
 
 
-def generate_lr_elo(battle_results: list[dict], trainers: list[Trainer]):
+LR_SOLVERS = ("lbfgs", "newton-cg", "newton-cholesky", "liblinear", "sag", "saga")
+
+
+@dataclass
+class LRFit:
+    """
+    A fitted logistic regression Elo, with the solver's diagnostics.
+
+    log_likelihood: Log-likelihood of the training rows (ties count as two rows), without the penalty
+    covariance: Covariance of `theta` from the penalised observed information, if computed
+    """
+
+    theta: np.ndarray
+    intercept: float
+    C: float
+    converged: bool
+    iterations: int
+    log_likelihood: float
+    rows: int = 0
+    warm_started: bool = field(default=False)
+    covariance: np.ndarray | None = field(default=None, repr=False)
+
+    def elo_scores(self) -> list[float]:
+        """
+        $\\text{ELO} = 173 \\cdot \\theta + 1500$
+        """
+        return list(self.theta * ELO_SCALE + ELO_BASE)
+
+    def standard_errors(self) -> np.ndarray:
+        """
+        Standard error of every $\\theta$, NaN if the covariance wasn't computed.
+        """
+        if self.covariance is None:
+            return np.full(len(self.theta), np.nan)
+        return np.sqrt(np.diag(self.covariance))
+
+
+def lr_rows(columns: dict[str, np.ndarray], N: int) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Reduces battles to weighted logistic regression rows: player 1 index, player 2 index, label and the number
+    of battles with that label for the pair. The fit only depends on these counts, so it costs
+    $O(\\text{pairings})$ rather than $O(\\text{battles})$.
+
+    Self-matches are skipped, as a trainer battling themselves would get +1 and -1 on the same entry,
+    which says nothing about strength.
+    """
+    keys, weights = np.unique(lr_keys(columns, N), return_counts=True)
+    return _decode_rows(keys, weights, N)
+
+
+def lr_keys(columns: dict[str, np.ndarray], N: int) -> np.ndarray:
+    """
+    One key in $[0, 2N^2)$ per logistic regression row of `columns`, encoding (player 1, player 2, label).
+    """
+    not_self = columns["player1"] != columns["player2"]
+    p1 = columns["player1"][not_self].astype(np.int64)
+    p2 = columns["player2"][not_self].astype(np.int64)
+    outcome = columns["outcome"][not_self]
+
+    # What are the conditions for a tie? Well, in Pokemon, we consider a tie a battle that has gone on forever.
+    # Stall battles are usually battles that take too long, as we track PP usage so battles don't go forever, though there
+    # are some trainer setups (namely Lorelei's Dewgong) that can stall forever. See [this video by Pikasprey](https://www.youtube.com/watch?v=CClsivwN8aw) for
+    # more information on that.
+    # Ties appear twice, once with each label
+    positive = (outcome == OUTCOME_P1_WIN) | (outcome == OUTCOME_TIE)
+    negative = (outcome == OUTCOME_P2_WIN) | (outcome == OUTCOME_TIE)
+    return np.concatenate(
+        [(p1[positive] * N + p2[positive]) * 2 + 1, (p1[negative] * N + p2[negative]) * 2]
+    )
+
+
+def _decode_rows(keys: np.ndarray, weights: np.ndarray, N: int):
+    return keys // 2 // N, keys // 2 % N, (keys % 2).astype(float), weights.astype(float)
+
+
+def set_win_draw_loss(trainers: list[Trainer], wdl: dict[str, np.ndarray]) -> None:
+    """
+    Stores W/D/L tallies from `win_draw_loss` on the trainers, for the leaderboard.
+    """
+    for idx, trainer in enumerate(trainers):
+        trainer.win = int(wdl["win"][idx])
+        trainer.draw = int(wdl["draw"][idx])
+        trainer.loss = int(wdl["loss"][idx])
+
+
+class LRCounts:
+    """
+    `lr_rows` and W/D/L accumulated over column batches as they arrive, in $O(N^2)$ memory however many
+    battles there are. Self-matches are skipped, as in `fit_lr_elo`.
+    """
+
+    def __init__(self, N: int):
+        self.N = N
+        self.counts = np.zeros(2 * N * N, dtype=np.int64)
+        self.wdl = {key: np.zeros(N, dtype=np.int64) for key in ("win", "draw", "loss")}
+
+    def update(self, columns: dict[str, np.ndarray]) -> None:
+        self.counts += np.bincount(lr_keys(columns, self.N), minlength=len(self.counts))
+        not_self = columns["player1"] != columns["player2"]
+        for key, tally in win_draw_loss({key: column[not_self] for key, column in columns.items()}, self.N).items():
+            self.wdl[key] += tally
+
+    def rows(self) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+        keys = np.flatnonzero(self.counts)
+        return _decode_rows(keys, self.counts[keys], self.N)
+
+    def fit(
+        self,
+        trainers: list[Trainer],
+        C: float = 1.0,
+        solver: str = "lbfgs",
+        tol: float = 1e-4,
+        max_iter: int = 100,
+        prior: tuple[np.ndarray, float] | None = None,
+    ) -> LRFit:
+        """
+        Fits $\\theta$ to the counts so far, like `fit_lr_elo`, and sets W/D/L on `trainers`.
+        """
+        set_win_draw_loss(trainers, self.wdl)
+
+        theta, intercept = prior if prior is not None else (None, 0.0)
+        return fit_lr(*self.rows(), self.N, C, solver, tol, max_iter, theta, intercept)
+
+
+def lr_design(t1_idx: np.ndarray, t2_idx: np.ndarray, N: int):
+    """
+    Sparse design matrix for rows from `lr_rows`: +1 for player 1, -1 for player 2.
+    """
+    from scipy import sparse
+
+    rows = np.arange(len(t1_idx))
+    return sparse.csr_matrix(
+        (
+            np.concatenate([np.ones(len(rows)), -np.ones(len(rows))]),
+            (np.concatenate([rows, rows]), np.concatenate([t1_idx, t2_idx])),
+        ),
+        shape=(len(rows), N),
+    )
+
+
+def fit_design(
+    X,
+    y: np.ndarray,
+    weights: np.ndarray,
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    coef: np.ndarray | None = None,
+    intercept: float = 0.0,
+    covariance: bool = True,
+) -> LRFit:
+    """
+    Fits an L2 logistic regression over any design matrix, warm-started from `coef`/`intercept` if given.
+    `theta` in the returned fit holds every coefficient. `liblinear` can't be warm-started and, unlike the
+    other solvers, also penalises the intercept.
+
+    With `covariance`, the coefficients' covariance is the inverse of the penalised observed information,
+    $X^\\top S X + I / C$ with $S$ the weighted $p (1 - p)$ of each row, intercept included. That is one dense
+    solve in the number of coefficients, not rows.
+    """
+    # sklearn is slow to import, so only pay for it here
+    import warnings
+    from sklearn import linear_model
+    from sklearn.exceptions import ConvergenceWarning
+
+    warm_started = coef is not None and solver != "liblinear"
+    clf = linear_model.LogisticRegression(C=C, solver=solver, tol=tol, max_iter=max_iter, warm_start=warm_started)
+    if warm_started:
+        clf.coef_ = np.asarray(coef, dtype=float).reshape(1, -1).copy()
+        clf.intercept_ = np.array([intercept], dtype=float)
+
+    with warnings.catch_warnings(record=True) as caught:
+        warnings.simplefilter("always", ConvergenceWarning)
+        clf.fit(X, y, sample_weight=weights)
+
+    z = clf.decision_function(X)
+    log_likelihood = -np.sum(weights * np.where(y == 1, np.logaddexp(0, -z), np.logaddexp(0, z)))
+    return LRFit(
+        covariance=coefficient_covariance(X, z, weights, C, solver == "liblinear") if covariance else None,
+        theta=clf.coef_[0].copy(),
+        intercept=float(clf.intercept_[0]),
+        C=C,
+        converged=not any(issubclass(warning.category, ConvergenceWarning) for warning in caught),
+        iterations=int(np.max(clf.n_iter_)),
+        log_likelihood=float(log_likelihood),
+        rows=int(weights.sum()),
+        warm_started=warm_started,
+    )
+
+
+def coefficient_covariance(X, z: np.ndarray, weights: np.ndarray, C: float, penalised_intercept: bool) -> np.ndarray:
+    """
+    Covariance of the coefficients of a fit with decision values `z`, marginalised over the intercept.
+    """
+    from scipy import sparse
+
+    p = 1.0 / (1.0 + np.exp(-z))
+    design = sparse.hstack([sparse.csr_matrix(X), np.ones((len(z), 1))], format="csr")
+    information = (design.T @ design.multiply((weights * p * (1 - p))[:, None])).toarray()
+    penalty = np.full(design.shape[1], 1.0 / C)
+    penalty[-1] = 1.0 / C if penalised_intercept else 0.0
+    information[np.diag_indices_from(information)] += penalty
+    return np.linalg.inv(information)[:-1, :-1]
+
+
+def fit_lr(
+    t1_idx: np.ndarray,
+    t2_idx: np.ndarray,
+    y: np.ndarray,
+    weights: np.ndarray,
+    N: int,
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    theta: np.ndarray | None = None,
+    intercept: float = 0.0,
+    covariance: bool = True,
+) -> LRFit:
+    """
+    Fits $\\theta$ to rows from `lr_rows`, warm-started from a previous `theta`/`intercept` if given.
+    """
+    return fit_design(
+        lr_design(t1_idx, t2_idx, N), y, weights, C, solver, tol, max_iter, theta, intercept, covariance
+    )
+
+
+def fit_lr_elo(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainers: list[Trainer],
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    prior: tuple[np.ndarray, float] | None = None,
+) -> LRFit:
     """
     Solves the logistic regression problem to find trainer Elo scores.
 
@@ -53,82 +289,227 @@ def generate_lr_elo(battle_results: list[dict], trainers: list[Trainer]):
 
     For ties:
     - We add both $(x,1)$ and $(x,0)$ to our dataset.
+
+    Self-matches are skipped. Results may be battle dictionaries or columns from `load_result_columns`.
+    `prior` is a previous $(\\theta, \\text{intercept})$ to warm-start from, e.g. from `load_ratings`.
     """
     # Number of trainers in generation 1 (includes unused trainers such as Professor Oak)
     N = len(trainers)
 
-    # Build a fast lookup from trainer ID to index
-    trainer_lookup, struct_lookup = build_trainer_lookup(trainers)
-
-    # Design matrix $X$: stores all match vectors
-    X = []
-
-    # Outcome vector $Y$: stores match outcomes
-    Y = []
-
-    # Iterate over all recorded battles
-    for battle in battle_results:
-        try:
-            # Resolve trainer indices from IDs
-            t1_id = battle["player1"]
-            t2_id = battle["player2"]
-            t1_idx = trainer_lookup[t1_id]
-            t2_idx = trainer_lookup[t2_id]
-            outcome = battle["outcome"]
-
-            # Create feature vector: +1 for player 1, -1 for player 2
-            v = np.zeros(N)
-            v[t1_idx] = 1
-            v[t2_idx] = -1
-
-            # Add $x$ to $X$
-            X.append(v)
-
-            # Determine outcome label
-            if outcome == ResultType.PLAYER_1_WIN:
-                Y.append(1)
-                struct_lookup[t1_idx].win += 1
-                struct_lookup[t2_idx].loss += 1
-            elif outcome == ResultType.PLAYER_2_WIN:
-                Y.append(0)
-                struct_lookup[t1_idx].loss += 1
-                struct_lookup[t2_idx].win += 1
-            # What are the conditions for a tie? Well, in Pokemon, we consider a tie a battle that has gone on forever.
-            # Stall battles are usually battles that take too long, as we track PP usage so battles don't go forever, though there
-            # are some trainer setups (namely Lorelei's Dewgong) that can stall forever. See [this video by Pikasprey](https://www.youtube.com/watch?v=CClsivwN8aw) for
-            # more information on that.
-            elif outcome == ResultType.TIE:
-                Y.append(1)
-                Y.append(0)
-                X.append(v)
-                struct_lookup[t1_idx].draw += 1
-                struct_lookup[t2_idx].draw += 1
-        except KeyError:
-            # If trainer not found, skip and warn
-            print(f"Trainer not found in lookup: {battle}")
-            continue
-
-    # Fit logistic regression to the match data
-    clf = linear_model.LogisticRegression()
-    clf.fit(X, Y)
-
-    # Extract rankings $\theta$ and map to $\text{ELO} = 173 \cdot \theta + 1500$
-    elo_scores = list(clf.coef_[0] * 173 + 1500)
-
-    # Return Elo scores and intercept (for inspection)
-    return elo_scores, clf.intercept_[0]
-
-
-def elo_calculator(trainer_data_path: str, battle_results_path: str):
+    # Resolve trainer indices and outcomes into integer columns
+    columns = results_to_columns(battle_results, trainers)
+
+    # Win/draw/loss tallies for the leaderboard
+    not_self = columns["player1"] != columns["player2"]
+    set_win_draw_loss(trainers, win_draw_loss({key: column[not_self] for key, column in columns.items()}, N))
+
+    theta, intercept = prior if prior is not None else (None, 0.0)
+    return fit_lr(*lr_rows(columns, N), N, C, solver, tol, max_iter, theta, intercept)
+
+
+def stream_lr_elo(
+    battle_results_path: str,
+    trainers: list[Trainer],
+    batch_size: int = 1 << 20,
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    prior: tuple[np.ndarray, float] | None = None,
+) -> LRFit:
+    """
+    `fit_lr_elo` straight from a results store, reading `batch_size` battles at a time. The fit only needs
+    the pairwise counts, so the result is the same as loading every battle, with memory bounded by the
+    batch size and the roster.
+    """
+    counts = LRCounts(len(trainers))
+    for batch in iter_result_batches(battle_results_path, trainers, batch_size, ("player1", "player2", "outcome")):
+        counts.update(batch)
+    return counts.fit(trainers, C, solver, tol, max_iter, prior)
+
+
+def generate_lr_elo(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainers: list[Trainer],
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    prior: tuple[np.ndarray, float] | None = None,
+):
+    """
+    `fit_lr_elo`, returning the Elo scores on the $\\text{ELO} = 173 \\cdot \\theta + 1500$ scale
+    and the intercept (for inspection).
+    """
+    fit = fit_lr_elo(battle_results, trainers, C, solver, tol, max_iter, prior)
+    return fit.elo_scores(), fit.intercept
+
+
+def _cv_fold(task: tuple) -> np.ndarray:
+    """
+    Fits one fold along the whole `Cs` path, each fit warm-started from the last,
+    and returns the held-out log-likelihood per C.
+    """
+    train, test, N, Cs, solver, tol, max_iter = task
+    held_out = np.empty(len(Cs))
+    theta, intercept = None, 0.0
+    for k, C in enumerate(Cs):
+        fit = fit_lr(*train, N, C, solver, tol, max_iter, theta, intercept, covariance=False)
+        theta, intercept = fit.theta, fit.intercept
+        t1_idx, t2_idx, y, weights = test
+        z = theta[t1_idx] - theta[t2_idx] + intercept
+        held_out[k] = -np.sum(weights * np.where(y == 1, np.logaddexp(0, -z), np.logaddexp(0, z)))
+    return held_out
+
+
+def cross_validate_C(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainers: list[Trainer],
+    Cs: tuple[float, ...] = tuple(np.logspace(-2, 2, 9)),
+    folds: int = 5,
+    seed: int = 0,
+    workers: int | None = None,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+) -> tuple[float, np.ndarray]:
+    """
+    Picks the regularisation strength `C` by k-fold cross-validation over battles, with the folds fitted in
+    parallel over `workers` processes (the CPU count if `None`, in-process if 1).
+
+    Returns the best C and the mean held-out log-likelihood per row for every C in `Cs`.
+    """
+    if folds < 2:
+        # With one fold there is nothing to train on
+        raise ValueError(f"Cross-validation needs at least 2 folds, got {folds}")
+    N = len(trainers)
+    columns = results_to_columns(battle_results, trainers)
+    Cs = np.sort(np.asarray(Cs, dtype=float))
+
+    fold = np.random.default_rng(seed).integers(folds, size=len(columns["outcome"]))
+    tasks = []
+    for k in range(folds):
+        train = lr_rows({key: column[fold != k] for key, column in columns.items()}, N)
+        test = lr_rows({key: column[fold == k] for key, column in columns.items()}, N)
+        tasks.append((train, test, N, Cs, solver, tol, max_iter))
+
+    if workers == 1:
+        held_out = [_cv_fold(task) for task in tasks]
+    else:
+        import multiprocessing
+
+        with multiprocessing.Pool(min(workers or multiprocessing.cpu_count(), folds)) as pool:
+            held_out = pool.map(_cv_fold, tasks)
+
+    # Every battle is held out exactly once, so this is the per-row log-likelihood over all battles
+    rows = sum(task[1][3].sum() for task in tasks)
+    scores = np.sum(held_out, axis=0) / max(rows, 1)
+    return float(Cs[np.argmax(scores)]), scores
+
+
+def ranks(elo: np.ndarray) -> np.ndarray:
+    """
+    Rank of every rating, 1 for the highest.
+    """
+    rank = np.empty(len(elo), dtype=np.int64)
+    rank[np.argsort(-elo, kind="stable")] = np.arange(1, len(elo) + 1)
+    return rank
+
+
+def leaderboard_table(trainers: list[Trainer], fit: LRFit, z: float = CI_Z) -> dict[str, np.ndarray]:
+    """
+    The leaderboard as columns: trainer ID, rank (1 is the highest Elo), $\\theta$ and its standard error,
+    Elo with a `z` standard error confidence interval, and the trainers' W/D/L.
+    """
+    elo = np.array(fit.elo_scores())
+    standard_error = fit.standard_errors()
+    return {
+        "trainer": np.array([trainer_id(trainer) for trainer in trainers]),
+        "rank": ranks(elo),
+        "theta": fit.theta,
+        "standard_error": standard_error,
+        "elo": elo,
+        "elo_low": elo - z * ELO_SCALE * standard_error,
+        "elo_high": elo + z * ELO_SCALE * standard_error,
+        "win": np.array([trainer.win for trainer in trainers], dtype=np.int64),
+        "draw": np.array([trainer.draw for trainer in trainers], dtype=np.int64),
+        "loss": np.array([trainer.loss for trainer in trainers], dtype=np.int64),
+    }
+
+
+def save_ratings(path: str, trainers: list[Trainer], fit: LRFit) -> None:
+    """
+    Writes a fit's `leaderboard_table`, with its intercept and C, as a `.npz` keyed by trainer ID. `load_ratings`
+    warm-starts a later fit from it and `diff` compares runs (see `src.utils.rating_diff`).
+    """
+    np.savez(path, **leaderboard_table(trainers, fit), intercept=fit.intercept, C=fit.C)
+
+
+def load_ratings(path: str, trainers: list[Trainer]) -> tuple[np.ndarray, float]:
+    """
+    Reads $(\\theta, \\text{intercept})$ saved by `save_ratings`, matched to `trainers` by ID.
+    Trainers the file doesn't know start at $\\theta = 0$, so a prior from a different roster still works.
+    """
+    with np.load(path) as ratings:
+        known = dict(zip(ratings["trainer"].tolist(), ratings["theta"]))
+        intercept = float(ratings["intercept"])
+    theta = np.array([known.get(trainer_id(trainer), 0.0) for trainer in trainers])
+    return theta, intercept
+
+
+def print_fit_summary(fit: LRFit, solver: str) -> None:
+    print(
+        f"{solver} {'converged' if fit.converged else 'did not converge'} in {fit.iterations} iterations"
+        f"{' (warm start)' if fit.warm_started else ''}, C = {fit.C:.3g}, "
+        f"log-likelihood {fit.log_likelihood:.1f} ({fit.log_likelihood / max(fit.rows, 1):.5f} per row)"
+    )
+
+
+def print_leaderboard(trainers: list[Trainer], elo: list[float]) -> None:
+    """
+    Assigns `elo` to the trainers and prints them from lowest to highest.
+    """
+    # Assign computed Elo back to trainer objects
+    for i, trainer in enumerate(trainers):
+        trainer.lr_elo = elo[i]
+
+    # Print leaderboard, sorted by Elo
+    for trainer in sorted(trainers, key=lambda t: t.lr_elo):
+        print(
+            f"Trainer: {trainer.name} - {trainer.location}, LR Elo: {trainer.lr_elo:.2f}, W: {trainer.win}, D: {trainer.draw}, L: {trainer.loss}"
+        )
+
+
+def elo_calculator(
+    trainer_data_path: str,
+    battle_results_path: str,
+    online: bool = False,
+    margin: bool = False,
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    prior_path: str | None = None,
+    save_path: str | None = None,
+    cv_folds: int = 0,
+    workers: int | None = None,
+    classes: bool = False,
+    class_scale: float = 2.0,
+    stream: bool = False,
+    batch_size: int = 1 << 20,
+):
     """
     Prints the ELO of trainers from a set of battles.
 
     Pipeline:
     - Load trainer data
-    - Load battle results
-    - Fit LR Elo
-    - Assign scores to trainers
-    - Print sorted leaderboard
+    - Load battle results (or, with `stream`, read them `batch_size` battles at a time while fitting)
+    - Pick C by `cv_folds`-fold cross-validation, if asked
+    - Fit LR Elo, warm-started from `prior_path` if given (or stream the results through the online rating
+      when `online` is set, fit the margin-aware model when `margin` is set, or pool trainers by class
+      when `classes` is set)
+    - Assign scores to trainers, saving them to `save_path` if given
+    - Print sorted leaderboard (and class strengths)
     """
     # Load all trainers grouped by class
     trainers = deserialize_trainerclasses(trainer_data_path)
@@ -138,31 +519,138 @@ def elo_calculator(trainer_data_path: str, battle_results_path: str):
         trainer for trainer_class in trainers for trainer in trainer_class.trainers
     ]
 
-    # Load all recorded battle results
-    battle_results = load_battle_results(battle_results_path)
-
-    # Compute logistic regression-based Elo scores
-    regression_elo, _ = generate_lr_elo(battle_results, trainers_flat)
-
-    # Assign computed Elo back to trainer objects
-    for i, trainer in enumerate(trainers_flat):
-        trainer.lr_elo = regression_elo[i]
+    if stream and (margin or classes or cv_folds):
+        raise ValueError("Streaming only supports the plain and online fits")
+    if classes and (online or margin or prior_path):
+        raise ValueError("The class model is its own batch fit, without a warm start")
+    if (online or margin) and (prior_path or save_path):
+        raise ValueError("Only the batch LR fit can be warm-started or saved")
 
-    # Sort trainers by Elo for leaderboard
-    trainers_flat.sort(key=lambda t: t.lr_elo)
+    # Load all recorded battle results
+    battle_results = None if stream else load_result_columns(battle_results_path, trainers_flat)
 
-    # Print leaderboard
-    for trainer in trainers_flat:
-        print(
-            f"Trainer: {trainer.name} - {trainer.location}, LR Elo: {trainer.lr_elo:.2f}, W: {trainer.win}, D: {trainer.draw}, L: {trainer.loss}"
+    if cv_folds:
+        Cs = tuple(np.logspace(-2, 2, 9))
+        C, scores = cross_validate_C(
+            battle_results, trainers_flat, Cs, cv_folds, workers=workers, solver=solver, tol=tol, max_iter=max_iter
         )
+        for candidate, score in zip(Cs, scores):
+            print(f"C = {candidate:.3g}: held-out log-likelihood {score:.5f} per row")
+        print(f"Selected C = {C:.3g}")
+
+    # Compute logistic regression-based Elo scores
+    if online and stream:
+        from src.utils.online_elo import stream_online_elo
+
+        regression_elo, _ = stream_online_elo(battle_results_path, trainers_flat, batch_size)
+    elif online:
+        from src.utils.online_elo import generate_online_elo
+
+        regression_elo, _ = generate_online_elo(battle_results, trainers_flat)
+    elif margin:
+        from src.utils.margin_elo import generate_margin_elo
+
+        regression_elo, _ = generate_margin_elo(battle_results, trainers_flat, C=C)
+    else:
+        if classes:
+            from src.utils.class_elo import fit_class_elo
+
+            fit, class_theta = fit_class_elo(battle_results, trainers, C, class_scale, solver, tol, max_iter)
+        else:
+            prior = load_ratings(prior_path, trainers_flat) if prior_path else None
+            if stream:
+                fit = stream_lr_elo(battle_results_path, trainers_flat, batch_size, C, solver, tol, max_iter, prior)
+            else:
+                fit = fit_lr_elo(battle_results, trainers_flat, C, solver, tol, max_iter, prior)
+        print_fit_summary(fit, solver)
+        if save_path:
+            save_ratings(save_path, trainers_flat, fit)
+        regression_elo = fit.elo_scores()
+
+    print_leaderboard(trainers_flat, regression_elo)
+
+    if classes:
+        for class_idx in np.argsort(class_theta):
+            print(
+                f"Class: {trainers[class_idx].name}, Elo: {class_theta[class_idx] * ELO_SCALE + ELO_BASE:.2f}, "
+                f"Trainers: {len(trainers[class_idx].trainers)}"
+            )
 
 
 @click.command()
 @click.argument('trainer_data_path')
 @click.argument('battle_results_path')
-def elo_calculator_cmd(trainer_data_path: str, battle_results_path: str):
-    return elo_calculator(trainer_data_path, battle_results_path)
+@click.option("--online", is_flag=True, help="Rate incrementally with a warm-started refit instead of a full batch fit.")
+@click.option("--margin", is_flag=True, help="Use the margin-aware ordinal model, which also uses remaining HP.")
+@click.option("-C", "C", default=1.0, type=float, help="Inverse regularisation strength.")
+@click.option("--solver", default="lbfgs", type=click.Choice(LR_SOLVERS), help="sklearn LogisticRegression solver.")
+@click.option("--tol", default=1e-4, type=float, help="Solver tolerance.")
+@click.option("--max-iter", default=100, type=int, help="Solver iteration cap.")
+@click.option("--prior", "prior_path", default=None, help="Ratings file (from --save) to warm-start from.")
+@click.option("--save", "save_path", default=None, help="Write the leaderboard with confidence intervals to this .npz file.")
+@click.option("--cv-folds", default=0, type=int, help="Pick C by k-fold cross-validation (0 to use -C).")
+@click.option("--workers", default=None, type=int, help="Processes for the cross-validation folds. Defaults to the CPU count.")
+@click.option("--classes", is_flag=True, help="Pool trainers towards their class's strength and print class ratings.")
+@click.option("--class-scale", default=2.0, type=float, help="Prior scale of class strengths relative to trainer deviations.")
+@click.option("--stream", is_flag=True, help="Fit from the results file in batches instead of loading it whole.")
+@click.option("--batch-size", default=1 << 20, type=int, help="Battles per batch with --stream.")
+def elo_calculator_cmd(
+    trainer_data_path: str,
+    battle_results_path: str,
+    online: bool = False,
+    margin: bool = False,
+    C: float = 1.0,
+    solver: str = "lbfgs",
+    tol: float = 1e-4,
+    max_iter: int = 100,
+    prior_path: str | None = None,
+    save_path: str | None = None,
+    cv_folds: int = 0,
+    workers: int | None = None,
+    classes: bool = False,
+    class_scale: float = 2.0,
+    stream: bool = False,
+    batch_size: int = 1 << 20,
+):
+    if stream and (margin or classes or cv_folds):
+        raise click.UsageError("--stream can't be combined with --margin, --classes or --cv-folds")
+    if classes and (online or margin or prior_path):
+        raise click.UsageError("--classes can't be combined with --online, --margin or --prior")
+    if cv_folds < 0 or cv_folds == 1:
+        raise click.BadParameter("expected 0, or at least 2 folds", param_hint="--cv-folds")
+    if online or margin:
+        # Only the batch LR fit takes these; the other models would silently ignore them
+        ignored = {
+            "--solver": solver != "lbfgs",
+            "--tol": tol != 1e-4,
+            "--max-iter": max_iter != 100,
+            "--prior": prior_path,
+            "--save": save_path,
+        }
+        if online:
+            ignored.update({"-C": C != 1.0, "--cv-folds": cv_folds})
+        used = [option for option, value in ignored.items() if value]
+        if used:
+            model = "--online" if online else "--margin"
+            raise click.UsageError(f"{model} can't be combined with {', '.join(used)}")
+    return elo_calculator(
+        trainer_data_path,
+        battle_results_path,
+        online,
+        margin,
+        C,
+        solver,
+        tol,
+        max_iter,
+        prior_path,
+        save_path,
+        cv_folds,
+        workers,
+        classes,
+        class_scale,
+        stream,
+        batch_size,
+    )
 
 
 
@@ -341,16 +341,21 @@ def parse_moves(data: str):
 
 def populate_trainer_moves(
     trainer_classes: List[TrainerClass], levelup_moves: dict, name_map: dict
-) -> None:
+) -> list[str]:
     """
     Populates the move sets for Pokémon in each trainer class based on their level and level-up moves.
+    Species without a level-up learnset are left as they are, and a warning is printed for them.
 
     Args:
         trainer_classes (List[TrainerClass]): A list of TrainerClass objects that contain trainers and Pokémon.
         levelup_moves (dict): A dictionary where keys are Pokémon names and values are lists of tuples
                                (level, move) representing the level at which a Pokémon learns a move.
         name_map (dict): Mapping of gen 1 names (UPPER CASE) to engine names
+
+    Returns:
+        list[str]: The species that were skipped, which `validate` will then flag.
     """
+    skipped = []
     # Iterate through each trainer class
     for trainer_class in trainer_classes:
         # Iterate through each trainer in the class
@@ -360,14 +365,20 @@ def populate_trainer_moves(
                 if (
                     pokemon_species := correct_pokemon_name(pokemon.species)
                 ) not in levelup_moves:
-                    continue  # Skip if there's no level-up learnset for this species
-
-                # Extract the moves that the Pokémon would have learned at or before the given level
-                pokemon_moves = [
-                    move
-                    for move_level, move in levelup_moves[pokemon_species]
-                    if move_level <= pokemon.extra["level"]
-                ]
+                    # No level-up learnset for this species
+                    if pokemon.species not in skipped:
+                        skipped.append(pokemon.species)
+                    continue
+
+                # Extract the moves that the Pokémon would have learned at or before the given level.
+                # Moves in both the level 1 and level-up learnsets are skipped the second time, as in the game
+                pokemon_moves = list(
+                    dict.fromkeys(
+                        move
+                        for move_level, move in levelup_moves[pokemon_species]
+                        if move_level <= pokemon.extra["level"]
+                    )
+                )
 
                 # Get the last 4 moves learned
                 pokemon_moves = pokemon_moves[-4:]  # Keep only the last 4 moves
@@ -376,19 +387,20 @@ def populate_trainer_moves(
                 pokemon.moves = tuple(pokemon_moves)
                 pokemon.species = name_map[pokemon.species.upper()]
 
+    if skipped:
+        print(f"Warning: no level-up learnset for {', '.join(skipped)}, their moves were not populated")
+    return skipped
 
-def gen_trainer_data(output_path: str, set_level: int | None = None):
-    """
-    Generates trainer data, optionally fixing the level of all pokemon.
-    Load party data (without levels)
-    Load learnset moves
-    Then patch last four learned moves in and save
 
-    TODO: Patch E4 + Gym moves
+def load_move_data() -> tuple[dict, dict, dict]:
     """
+    Parses learnsets and move data from the disassembly.
 
-    with open("asm/parties.asm", "r") as f:
-        trainer_class_data = f.read()
+    Returns:
+        tuple: `levelup_moves` (Pokémon name -> [(level, engine move name)], level 1 moves first),
+               `name_map` (gen 1 names in UPPER CASE -> engine names) and
+               `moves_data` (engine move name -> power, accuracy and type).
+    """
     with open("asm/evos_moves.asm", "r") as f:
         learnset_asm = f.read()
     with open("asm/dex.asm", "r") as f:
@@ -397,19 +409,6 @@ def gen_trainer_data(output_path: str, set_level: int | None = None):
         moves_asm = f.read()
     base_stats_folder = "asm/base_stats"
 
-    with open("asm/move_choices.asm", "r") as f:
-        move_choices_asm = (
-            f.read()
-        )  # Assume stability of dict as we only use the values
-    move_choices = list(parse_move_choices(move_choices_asm).values())
-
-    # Grab trainer data
-    trainer_classes = parse_trainer_data(trainer_class_data, set_level)[1:] # Specify level here
-    for idx, trainer_class in enumerate(trainer_classes):
-        trainer_class.modifiers = move_choices[idx]
-        for trainer in trainer_class.trainers:
-            trainer.modifiers = move_choices[idx]
-
     # Step 1: Parse learnset data
     learnset_moves = parse_learnset_moves(learnset_asm)
 
@@ -431,20 +430,72 @@ def gen_trainer_data(output_path: str, set_level: int | None = None):
         pokemon: [(level, moves_map[move]) for level, move in moves]
         for pokemon, moves in _levelup_moves.items()
     }
+    return levelup_moves, name_map, moves_data
+
+
+def learnable_moves(species: str, level: int, levelup_moves: dict, name_map: dict) -> list[str]:
+    """
+    Moves an engine species has learned by `level`, in the order it first learns them.
+    The last four are what `populate_trainer_moves` gives trainer Pokémon.
+    """
+    dex_names = {engine_name: dex_name for dex_name, engine_name in name_map.items()}
+    learnset = levelup_moves.get(correct_pokemon_name(dex_names[species].capitalize()), [])
+    return list(dict.fromkeys(move for move_level, move in learnset if move_level <= level))
+
+
+def gen_trainer_data(output_path: str, set_level: int | None = None) -> list[TrainerClass]:
+    """
+    Generates trainer data, optionally fixing the level of all pokemon, and returns it.
+    Load party data (without levels)
+    Load learnset moves
+    Then patch last four learned moves in and save
+
+    TODO: Patch E4 + Gym moves
+    """
+
+    with open("asm/parties.asm", "r") as f:
+        trainer_class_data = f.read()
+
+    with open("asm/move_choices.asm", "r") as f:
+        move_choices_asm = (
+            f.read()
+        )  # Assume stability of dict as we only use the values
+    move_choices = list(parse_move_choices(move_choices_asm).values())
+
+    # Grab trainer data
+    trainer_classes = parse_trainer_data(trainer_class_data, set_level)[1:] # Specify level here
+    for idx, trainer_class in enumerate(trainer_classes):
+        trainer_class.modifiers = move_choices[idx]
+        for trainer in trainer_class.trainers:
+            trainer.modifiers = move_choices[idx]
+
+    levelup_moves, name_map, moves_data = load_move_data()
 
     # Add in moves
     populate_trainer_moves(trainer_classes, levelup_moves, name_map)
 
-    # Dump data, don't include 0th trainer which is empty
-    serialize_trainerclasses(trainer_classes, output_path)
-    
     # Need moves for ai modifier
     with open("data/moves.json", "w") as f:
         json.dump(moves_data, f)
 
+    # Report bad teams now rather than when a tournament runs them
+    from src.sim.validation import learnset_levels, validate_roster
+
+    _, issues = validate_roster(
+        [trainer for trainer_class in trainer_classes for trainer in trainer_class.trainers],
+        learnset_levels(levelup_moves, name_map),
+    )
+    for issue in issues:
+        print(f"{'Error' if issue.error else 'Warning'}: {issue.trainer}: {issue.message}")
+
+    # Dump data, don't include 0th trainer which is empty
+    serialize_trainerclasses(trainer_classes, output_path)
+
+    return trainer_classes
+
 @click.command()
 @click.argument("output_path")
-@click.option("--set-level", default=None)
+@click.option("--set-level", default=None, type=click.IntRange(1, 100), help="Level for every Pokémon.")
 def gen_trainer_data_cmd(output_path: str, set_level: int | None = None):
     return gen_trainer_data(output_path, set_level)
 
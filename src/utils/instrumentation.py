@@ -0,0 +1,44 @@
+"""
+Lightweight counters for hot paths.
+
+Instrumented code calls `increment`, which is a single dictionary update. Counters are per process: pool
+workers `drain` theirs after every chunk and send them back with the results, and the parent `merge`s them.
+"""
+
+from collections import defaultdict
+
+_counters: defaultdict[str, int] = defaultdict(int)
+
+
+def increment(name: str, amount: int = 1) -> None:
+    _counters[name] += amount
+
+
+def snapshot() -> dict[str, int]:
+    return dict(_counters)
+
+
+def drain() -> dict[str, int]:
+    """
+    Returns the counters and resets them.
+    """
+    counts = dict(_counters)
+    _counters.clear()
+    return counts
+
+
+def merge(counts: dict[str, int]) -> None:
+    """
+    Adds counters drained from another process.
+    """
+    for name, amount in counts.items():
+        _counters[name] += amount
+
+
+def hit_rate(counts: dict[str, int], name: str) -> float | None:
+    """
+    Hit rate of a cache counted as `<name>.hits` and `<name>.misses`, or `None` if it was never used.
+    """
+    hits = counts.get(f"{name}.hits", 0)
+    lookups = hits + counts.get(f"{name}.misses", 0)
+    return hits / lookups if lookups else None
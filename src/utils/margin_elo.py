@@ -0,0 +1,164 @@
+"""
+## Margin-aware Elo for the Pokémon Red Tournament
+
+`generate_lr_elo` only sees who won, so a 6-0 sweep and a last-Pokémon squeaker are the same data point.
+This module fits an ordinal (cumulative logit) model instead, where each battle falls into a margin category
+ordered from a dominant player 2 win, through a tie, to a dominant player 1 win.
+
+For player 1 with index $i$ against player 2 with index $j$, with $\\eta = \\theta_i - \\theta_j$ and
+increasing thresholds $c_0 < \\dots < c_{K-2}$:
+
+$$P(Y \\le k) = \\sigma(c_k - \\eta)$$
+
+The margin of a win is the winner's fraction of total party HP remaining (see `src.sim.telemetry`), binned by
+`margin_bins`. Ties are their own category rather than a duplicated win and loss, and the thresholds absorb
+the first-mover advantage that the intercept models in `generate_lr_elo`. With binary outcomes only
+(no telemetry), this reduces to an ordinal model over loss/draw/win.
+
+Battles are first reduced to counts per (player 1, player 2, category), and the penalised likelihood is
+minimised with L-BFGS over a sparse $\\pm 1$ design matrix, so the cost scales with the number of distinct
+pairings rather than battles.
+"""
+
+import numpy as np
+from scipy import optimize, sparse
+from src.models.pokemon import Trainer
+from src.models.results import OUTCOME_P1_WIN, OUTCOME_P2_WIN, OUTCOME_TIE, results_to_columns
+from src.utils.analytics import win_draw_loss
+from src.utils.elo_calculator import ELO_BASE, ELO_SCALE, set_win_draw_loss
+
+
+def margin_categories(columns: dict[str, np.ndarray], margin_bins: tuple[float, ...] = (0.5,)) -> np.ndarray:
+    """
+    Ordinal category of every battle: `len(margin_bins) + 1` player 2 win categories (most dominant first),
+    a tie, then the player 1 win categories (most dominant last). Errors get -1.
+    """
+    outcome = columns["outcome"]
+    bins = np.asarray(margin_bins)
+    wins = len(bins) + 1
+
+    p1_margin = np.digitize(columns["p1_hp"], bins)
+    p2_margin = np.digitize(columns["p2_hp"], bins)
+
+    categories = np.full(len(outcome), -1, dtype=np.int64)
+    categories[outcome == OUTCOME_P2_WIN] = wins - 1 - p2_margin[outcome == OUTCOME_P2_WIN]
+    categories[outcome == OUTCOME_TIE] = wins
+    categories[outcome == OUTCOME_P1_WIN] = wins + 1 + p1_margin[outcome == OUTCOME_P1_WIN]
+    return categories
+
+
+def _thresholds(params: np.ndarray) -> np.ndarray:
+    # $c_0$ is free and every later threshold adds a positive step, which keeps them ordered
+    return params[0] + np.concatenate([[0.0], np.cumsum(np.exp(params[1:]))])
+
+
+def fit_ordinal(
+    t1_idx: np.ndarray,
+    t2_idx: np.ndarray,
+    categories: np.ndarray,
+    counts: np.ndarray,
+    N: int,
+    C: float = 1.0,
+    max_iter: int = 500,
+    tol: float = 1e-6,
+) -> tuple[np.ndarray, np.ndarray, bool]:
+    """
+    Fits the cumulative logit model to aggregated rows with an L2 penalty $\\frac{1}{2}\\|\\theta\\|^2$,
+    weighting the negative log-likelihood by `C` as sklearn does. Categories must be numbered $0..K-1$.
+
+    Returns $\\theta$, the thresholds and whether L-BFGS converged.
+    """
+    K = int(categories.max()) + 1
+    if K < 2:
+        # Every battle landed in one category, which says nothing about relative strength
+        return np.zeros(N), np.array([]), True
+
+    rows = np.arange(len(t1_idx))
+    design = sparse.csr_matrix(
+        (
+            np.concatenate([np.ones(len(rows)), -np.ones(len(rows))]),
+            (np.concatenate([rows, rows]), np.concatenate([t1_idx, t2_idx])),
+        ),
+        shape=(len(rows), N),
+    )
+    upper = categories < K - 1
+    lower = categories > 0
+
+    def objective(params: np.ndarray) -> tuple[float, np.ndarray]:
+        theta, threshold_params = params[:N], params[N:]
+        thresholds = _thresholds(threshold_params)
+        eta = design @ theta
+
+        # $F_k = \\sigma(c_k - \\eta)$ at the category's upper and lower bounds, with $F = 1$ / $F = 0$ at the ends
+        upper_cdf = np.ones(len(eta))
+        lower_cdf = np.zeros(len(eta))
+        upper_cdf[upper] = 1.0 / (1.0 + np.exp(eta[upper] - thresholds[categories[upper]]))
+        lower_cdf[lower] = 1.0 / (1.0 + np.exp(eta[lower] - thresholds[categories[lower] - 1]))
+        probability = np.maximum(upper_cdf - lower_cdf, 1e-300)
+
+        upper_density = upper_cdf * (1.0 - upper_cdf)
+        lower_density = lower_cdf * (1.0 - lower_cdf)
+
+        # Gradients of the weighted negative log-likelihood
+        grad_eta = counts * (upper_density - lower_density) / probability
+        grad_thresholds = np.zeros(K - 1)
+        np.add.at(grad_thresholds, categories[upper], -counts[upper] * upper_density[upper] / probability[upper])
+        np.add.at(grad_thresholds, categories[lower] - 1, counts[lower] * lower_density[lower] / probability[lower])
+
+        # Chain rule through the ordered parametrisation: $c_k$ depends on every step up to $k$
+        grad_params = np.empty_like(threshold_params)
+        grad_params[0] = grad_thresholds.sum()
+        grad_params[1:] = np.exp(threshold_params[1:]) * np.cumsum(grad_thresholds[::-1])[::-1][1:]
+
+        loss = C * -(counts * np.log(probability)).sum() + 0.5 * theta @ theta
+        gradient = np.concatenate([C * (design.T @ grad_eta) + theta, C * grad_params])
+        return loss, gradient
+
+    # Start the thresholds at the empirical cumulative logits with everyone rated equally
+    cumulative = np.cumsum(np.bincount(categories, weights=counts, minlength=K))[:-1] / counts.sum()
+    cumulative = np.clip(cumulative, 1e-3, 1 - 1e-3)
+    start_thresholds = np.maximum.accumulate(np.log(cumulative / (1 - cumulative)))
+    steps = np.log(np.maximum(np.diff(start_thresholds), 1e-3))
+    start = np.concatenate([np.zeros(N), [start_thresholds[0]], steps])
+
+    solution = optimize.minimize(
+        objective, start, jac=True, method="L-BFGS-B", options={"maxiter": max_iter, "gtol": tol}
+    )
+    return solution.x[:N], _thresholds(solution.x[N:]), solution.success
+
+
+def generate_margin_elo(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainers: list[Trainer],
+    margin_bins: tuple[float, ...] = (0.5,),
+    C: float = 1.0,
+):
+    """
+    Margin-aware counterpart of `generate_lr_elo`. Self-matches and errors are skipped.
+
+    Returns Elo scores on the usual $\\text{ELO} = 173 \\cdot \\theta + 1500$ scale and the fitted thresholds.
+    """
+    N = len(trainers)
+    columns = results_to_columns(battle_results, trainers)
+
+    # Win/draw/loss tallies for the leaderboard, without self-matches as in `fit_lr_elo`
+    not_self = columns["player1"] != columns["player2"]
+    set_win_draw_loss(trainers, win_draw_loss({key: column[not_self] for key, column in columns.items()}, N))
+
+    categories = margin_categories(columns, margin_bins)
+    keep = not_self & (categories >= 0)
+
+    # Sufficient statistics: battles per (player 1, player 2, category)
+    rows, counts = np.unique(
+        np.column_stack([columns["player1"][keep], columns["player2"][keep], categories[keep]]),
+        axis=0,
+        return_counts=True,
+    )
+    # Categories nobody landed in (e.g. dominant wins without telemetry) carry no thresholds
+    _, categories = np.unique(rows[:, 2], return_inverse=True)
+
+    theta, thresholds, converged = fit_ordinal(rows[:, 0], rows[:, 1], categories, counts.astype(float), N, C)
+    if not converged:
+        print("Warning: margin model did not converge")
+
+    return list(theta * ELO_SCALE + ELO_BASE), thresholds
@@ -0,0 +1,225 @@
+"""
+## Online Elo for the Pokémon Red Tournament
+
+`generate_lr_elo` refits a logistic regression over every battle once the tournament is done.
+This module keeps an incremental rating that consumes battles one at a time (or in mini-batches)
+as they come off the results stream.
+
+Two things are tracked per battle, both $O(1)$:
+- A stochastic gradient step on $\\theta$ for the same logistic objective, used for live standings.
+- The pairwise label counts, which are sufficient statistics for the batch objective.
+
+Because the features of a battle only depend on who played whom, the batch log-likelihood only depends
+on how many $y=1$ and $y=0$ rows each ordered pair $(i, j)$ produced. `refit` runs a warm-started
+L-BFGS over those counts, which reproduces `generate_lr_elo` (sklearn's default L2 penalty, $C=1$) at
+a cost of $O(N^2)$ instead of $O(\\text{battles})$.
+"""
+
+import numpy as np
+from scipy import optimize
+from pykmn.engine.common import ResultType
+from src.models.pokemon import Trainer
+from src.models.results import (
+    OUTCOME_P1_WIN,
+    OUTCOME_P2_WIN,
+    OUTCOME_TIE,
+    iter_result_batches,
+    results_to_columns,
+)
+from src.utils.elo_calculator import ELO_BASE, ELO_SCALE, build_trainer_lookup
+
+
+class OnlineLRElo:
+    """
+    Incremental logistic regression Elo.
+
+    trainers: Trainers being rated, in the same order as `generate_lr_elo` expects
+    learning_rate: SGD step size in $\\theta$ units (0.1 is roughly a K-factor of 17 Elo)
+    C: Inverse regularisation strength, matching `sklearn.linear_model.LogisticRegression`
+    """
+
+    def __init__(
+        self,
+        trainers: list[Trainer],
+        learning_rate: float = 0.1,
+        C: float = 1.0,
+        theta: np.ndarray | None = None,
+        intercept: float = 0.0,
+    ):
+        self.trainers = trainers
+        self.trainer_lookup, _ = build_trainer_lookup(trainers)
+        self.learning_rate = learning_rate
+        self.C = C
+
+        N = len(trainers)
+        # Warm start from a previous fit if we have one
+        self.theta = np.zeros(N) if theta is None else np.array(theta, dtype=float)
+        self.intercept = intercept
+
+        # Sufficient statistics: number of $y=1$ / $y=0$ rows for each ordered pair
+        self.positives = np.zeros((N, N))
+        self.negatives = np.zeros((N, N))
+        self.battles_seen = 0
+
+    def _labels(self, outcome: ResultType) -> tuple[int, int]:
+        """
+        Maps an outcome to the number of (positive, negative) rows it contributes.
+        Ties contribute one of each, mirroring `generate_lr_elo`.
+        """
+        if outcome == ResultType.PLAYER_1_WIN:
+            return 1, 0
+        if outcome == ResultType.PLAYER_2_WIN:
+            return 0, 1
+        if outcome == ResultType.TIE:
+            return 1, 1
+        return 0, 0
+
+    def update(self, t1_idx: int, t2_idx: int, outcome: ResultType) -> None:
+        """
+        Consumes a single battle result. $O(1)$.
+        """
+        positive, negative = self._labels(outcome)
+        # Self-matches carry no information about relative strength
+        if t1_idx == t2_idx or positive + negative == 0:
+            return
+
+        self.positives[t1_idx, t2_idx] += positive
+        self.negatives[t1_idx, t2_idx] += negative
+        self.battles_seen += 1
+
+        # One SGD step on the log-loss of this battle's rows
+        p = 1.0 / (1.0 + np.exp(-(self.theta[t1_idx] - self.theta[t2_idx] + self.intercept)))
+        gradient = positive - (positive + negative) * p
+        self.theta[t1_idx] += self.learning_rate * gradient
+        self.theta[t2_idx] -= self.learning_rate * gradient
+        self.intercept += self.learning_rate * gradient / len(self.theta)
+
+    def update_batch(
+        self, t1_idx: np.ndarray, t2_idx: np.ndarray, outcomes: list[ResultType]
+    ) -> None:
+        """
+        Consumes a mini-batch of battles with a single averaged SGD step.
+        """
+        labels = np.array([self._labels(outcome) for outcome in outcomes], dtype=float).reshape(-1, 2)
+        self._step(np.asarray(t1_idx), np.asarray(t2_idx), labels[:, 0], labels[:, 1])
+
+    def update_columns(self, columns: dict[str, np.ndarray]) -> None:
+        """
+        Consumes a chunk of columnar results (see `src.models.results`) as one mini-batch.
+        """
+        outcome = columns["outcome"]
+        positive = ((outcome == OUTCOME_P1_WIN) | (outcome == OUTCOME_TIE)).astype(float)
+        negative = ((outcome == OUTCOME_P2_WIN) | (outcome == OUTCOME_TIE)).astype(float)
+        self._step(columns["player1"], columns["player2"], positive, negative)
+
+    def _step(self, t1_idx: np.ndarray, t2_idx: np.ndarray, positive: np.ndarray, negative: np.ndarray) -> None:
+        """
+        Adds a mini-batch's label counts and takes one averaged SGD step on it.
+        """
+        keep = (t1_idx != t2_idx) & (positive + negative > 0)
+        t1_idx, t2_idx, positive, negative = t1_idx[keep], t2_idx[keep], positive[keep], negative[keep]
+        if len(t1_idx) == 0:
+            return
+
+        np.add.at(self.positives, (t1_idx, t2_idx), positive)
+        np.add.at(self.negatives, (t1_idx, t2_idx), negative)
+        self.battles_seen += len(t1_idx)
+
+        p = 1.0 / (1.0 + np.exp(-(self.theta[t1_idx] - self.theta[t2_idx] + self.intercept)))
+        gradient = positive - (positive + negative) * p
+        step = np.zeros_like(self.theta)
+        np.add.at(step, t1_idx, gradient)
+        np.add.at(step, t2_idx, -gradient)
+        self.theta += self.learning_rate * step / len(t1_idx)
+        self.intercept += self.learning_rate * gradient.mean() / len(self.theta)
+
+    def update_result(self, battle: dict) -> None:
+        """
+        Consumes a battle in the format written by `run_tournament`.
+        """
+        try:
+            t1_idx = self.trainer_lookup[battle["player1"]]
+            t2_idx = self.trainer_lookup[battle["player2"]]
+        except KeyError:
+            print(f"Trainer not found in lookup: {battle}")
+            return
+        self.update(t1_idx, t2_idx, battle["outcome"])
+
+    def _objective(self, params: np.ndarray) -> tuple[float, np.ndarray]:
+        """
+        sklearn's L2 logistic objective $\\frac{1}{2}\\|\\theta\\|^2 + C\\sum \\ell$ over the pairwise counts.
+        The intercept is not penalised.
+        """
+        theta, intercept = params[:-1], params[-1]
+        z = theta[:, None] - theta[None, :] + intercept
+        # $\\log(1 + e^{-z})$ and $\\log(1 + e^{z})$, computed stably
+        loss = self.positives * np.logaddexp(0, -z) + self.negatives * np.logaddexp(0, z)
+        p = 1.0 / (1.0 + np.exp(-z))
+        residual = (self.positives + self.negatives) * p - self.positives
+
+        gradient = np.empty_like(params)
+        gradient[:-1] = self.C * (residual.sum(axis=1) - residual.sum(axis=0)) + theta
+        gradient[-1] = self.C * residual.sum()
+        return self.C * loss.sum() + 0.5 * theta @ theta, gradient
+
+    def refit(self, max_iter: int = 200, tol: float = 1e-6) -> bool:
+        """
+        Solves the batch objective over everything seen so far, warm-started from the current $\\theta$.
+        Returns whether the solver converged.
+        """
+        solution = optimize.minimize(
+            self._objective,
+            np.append(self.theta, self.intercept),
+            jac=True,
+            method="L-BFGS-B",
+            options={"maxiter": max_iter, "gtol": tol},
+        )
+        self.theta = solution.x[:-1]
+        self.intercept = solution.x[-1]
+        return solution.success
+
+    def elo_scores(self) -> list[float]:
+        """
+        Current ratings on the usual $\\text{ELO} = 173 \\cdot \\theta + 1500$ scale.
+        """
+        return list(self.theta * ELO_SCALE + ELO_BASE)
+
+    def leader(self) -> tuple[Trainer, float]:
+        """
+        Current top trainer and their Elo, for live standings.
+        """
+        idx = int(np.argmax(self.theta))
+        return self.trainers[idx], self.theta[idx] * ELO_SCALE + ELO_BASE
+
+
+def generate_online_elo(
+    battle_results: list[dict] | dict[str, np.ndarray],
+    trainers: list[Trainer],
+    refit: bool = True,
+    batch_size: int = 1,
+):
+    """
+    Streams `battle_results` through `OnlineLRElo` in mini-batches of `batch_size`, optionally finishing
+    with a warm-started batch refit. Same return shape as `generate_lr_elo`.
+    """
+    rating = OnlineLRElo(trainers)
+    columns = results_to_columns(battle_results, trainers)
+    for start in range(0, len(columns["outcome"]), batch_size):
+        rating.update_columns({key: column[start : start + batch_size] for key, column in columns.items()})
+
+    if refit:
+        rating.refit()
+
+    return rating.elo_scores(), rating.intercept
+
+
+def stream_online_elo(battle_results_path: str, trainers: list[Trainer], batch_size: int = 1 << 20):
+    """
+    `generate_online_elo` straight from a results store, one SGD step per batch of `batch_size` battles.
+    The steps are coarse, but the final refit only depends on the pairwise counts, so it is the same fit.
+    """
+    rating = OnlineLRElo(trainers)
+    for batch in iter_result_batches(battle_results_path, trainers, batch_size, ("player1", "player2", "outcome")):
+        rating.update_columns(batch)
+    rating.refit()
+    return rating.elo_scores(), rating.intercept
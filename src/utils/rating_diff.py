@@ -0,0 +1,119 @@
+"""
+## Comparing rating runs
+
+Joins leaderboards saved by `elo --save` (see `save_ratings`) on trainer ID and reports how the ratings moved:
+before and after an AI change, across set levels, or over any number of runs against a baseline.
+
+A trainer is a significant mover when its change in $\\theta$ is more than `z` standard errors of the
+difference, $\\sqrt{\\sigma_a^2 + \\sigma_b^2}$, treating the runs as independent. Ranks are recomputed over
+the trainers both runs share, so trainers added or dropped between runs don't shift everyone else.
+"""
+
+import numpy as np
+import click
+from src.utils.analytics import export_table
+from src.utils.elo_calculator import CI_Z, ELO_SCALE, ranks
+
+
+def load_leaderboard(path: str) -> dict[str, np.ndarray]:
+    """
+    The per-trainer columns of a ratings file. Files saved before standard errors were recorded get NaN ones.
+    """
+    with np.load(path) as ratings:
+        table = {name: ratings[name] for name in ratings.files if ratings[name].ndim == 1}
+    if "standard_error" not in table:
+        table["standard_error"] = np.full(len(table["theta"]), np.nan)
+    return table
+
+
+def diff_leaderboards(
+    before: dict[str, np.ndarray], after: dict[str, np.ndarray], z: float = CI_Z
+) -> tuple[dict[str, np.ndarray], dict[str, float]]:
+    """
+    Joins two leaderboards on trainer ID.
+
+    Returns the joined table, with per-trainer rank change (positive is up), Elo change and its z-score, and
+    summary statistics: trainers joined and unmatched, Spearman correlation of the ranks, mean and largest
+    absolute Elo change, the mean shift, and how many trainers moved significantly.
+    """
+    trainers, a, b = np.intersect1d(before["trainer"], after["trainer"], return_indices=True)
+    theta_a, theta_b = before["theta"][a], after["theta"][b]
+    rank_a, rank_b = ranks(theta_a), ranks(theta_b)
+    delta = (theta_b - theta_a) * ELO_SCALE
+    z_score = (theta_b - theta_a) / np.sqrt(before["standard_error"][a] ** 2 + after["standard_error"][b] ** 2)
+
+    table = {
+        "trainer": trainers,
+        "rank_before": rank_a,
+        "rank_after": rank_b,
+        "rank_change": rank_a - rank_b,
+        "elo_before": before["elo"][a],
+        "elo_after": after["elo"][b],
+        "elo_change": delta,
+        "z": z_score,
+        "significant": np.abs(z_score) > z,
+    }
+
+    n = len(trainers)
+    # Ranks are a permutation, so Spearman's rho has the closed form
+    spearman = 1 - 6 * np.sum((rank_a - rank_b) ** 2) / (n * (n**2 - 1)) if n > 1 else np.nan
+    summary = {
+        "trainers": n,
+        "only_before": len(before["trainer"]) - n,
+        "only_after": len(after["trainer"]) - n,
+        "spearman": float(spearman),
+        "mean_abs_elo_change": float(np.mean(np.abs(delta))) if n else np.nan,
+        "max_abs_elo_change": float(np.max(np.abs(delta))) if n else np.nan,
+        "mean_elo_shift": float(np.mean(delta)) if n else np.nan,
+        "significant": int(np.sum(table["significant"])),
+    }
+    return table, summary
+
+
+def diff(paths: list[str], top: int = 10, z: float = CI_Z, output: str | None = None):
+    """
+    Compares every run in `paths` against the first and prints the summary and the `top` movers by z-score
+    (by Elo change for files without standard errors). With `output`, the joined tables are written there,
+    one per later run, with a `run` column holding the run's position in `paths`.
+    """
+    baseline = load_leaderboard(paths[0])
+    tables = []
+    for run, path in enumerate(paths[1:], start=1):
+        table, summary = diff_leaderboards(baseline, load_leaderboard(path), z)
+        print(
+            f"{paths[0]} -> {path}: {summary['trainers']} trainers "
+            f"({summary['only_before']} dropped, {summary['only_after']} added), "
+            f"rank correlation {summary['spearman']:.3f}, mean |change| {summary['mean_abs_elo_change']:.1f} Elo "
+            f"(largest {summary['max_abs_elo_change']:.1f}, mean shift {summary['mean_elo_shift']:+.1f}), "
+            f"{summary['significant']} significant at z > {z:g}"
+        )
+
+        strength = np.where(np.isnan(table["z"]), np.abs(table["elo_change"]), np.abs(table["z"]))
+        for idx in np.argsort(-strength, kind="stable")[:top]:
+            print(
+                f"  {table['trainer'][idx]}: {table['elo_before'][idx]:.1f} -> {table['elo_after'][idx]:.1f} "
+                f"({table['elo_change'][idx]:+.1f}, z {table['z'][idx]:+.2f}), "
+                f"rank {table['rank_before'][idx]} -> {table['rank_after'][idx]}"
+                f"{' *' if table['significant'][idx] else ''}"
+            )
+        tables.append({"run": np.full(len(table["trainer"]), run, dtype=np.int32), **table})
+
+    if output:
+        export_table({name: np.concatenate([table[name] for table in tables]) for name in tables[0]}, output)
+
+
+@click.command()
+@click.argument("baseline")
+@click.argument("runs", nargs=-1, required=True)
+@click.option("--top", default=10, type=int, help="Movers to list per run.")
+@click.option("-z", "z", default=CI_Z, type=float, help="z-score beyond which a change counts as significant.")
+@click.option("--output", default=None, help="Write the joined tables to a .csv or .npz file.")
+def diff_cmd(baseline: str, runs: tuple[str, ...], top: int = 10, z: float = CI_Z, output: str | None = None):
+    """
+    Compares ratings saved with `elo --save`: every RUNS file against BASELINE.
+    """
+    return diff([baseline, *runs], top, z, output)
+
+
+if __name__ == "__main__":
+    diff_cmd()
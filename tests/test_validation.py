@@ -0,0 +1,37 @@
+import os
+import pytest
+
+pytest.importorskip("pykmn")
+
+from src.models.pokemon import Pokemon, Trainer
+from src.models.results import flatten_trainers
+from src.sim.validation import learnset_levels, validate_roster
+from src.utils.gen_trainer_data import gen_trainer_data, load_move_data
+
+REPO = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.fixture
+def in_repo(monkeypatch):
+    # The disassembly and data/ are read relative to the repository root
+    monkeypatch.chdir(REPO)
+
+
+def test_generated_roster_validates(in_repo, tmp_path):
+    trainers = flatten_trainers(gen_trainer_data(str(tmp_path / "trainers.pkl")))
+    levelup_moves, name_map, _ = load_move_data()
+    records, issues = validate_roster(trainers, learnset_levels(levelup_moves, name_map))
+    assert [issue for issue in issues if issue.error] == []
+    assert len(records) == len(trainers)
+
+
+def test_first_table_entries_and_repeated_moves_are_not_errors():
+    trainer = Trainer(
+        name="Test",
+        location="Lab-A",
+        pokemon=[Pokemon(extra={"level": 10}, species="Bulbasaur", moves=("Pound", "Pound"))],
+    )
+    trainer.modifiers = ()
+    records, issues = validate_roster([trainer])
+    assert records is not None
+    assert [issue.message for issue in issues] == ["slot 1 (Bulbasaur): repeated move"]